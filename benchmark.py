@@ -0,0 +1,534 @@
+"""
+Benchmarks de rendimiento del inventario.
+
+Mide con datos sintéticos y una base SQLite temporal (no toca inventario.db
+ni los reportes reales):
+- render de una etiqueta y de un separador (`generate_barcode`)
+- modo de 1 bit: tiempo, tamaño del PNG y diferencia de píxeles contra el modo
+  de grises (si supera LIMITE_DIFERENCIA_1BIT el script falla)
+- ensamblado de una página del PDF con etiquetas ya renderizadas
+- etiquetas/s de punta a punta (`generate_barcodes_pdf`)
+- salida ZPL para impresoras térmicas: etiquetas/s, bytes por etiqueta y el
+  envío por TCP a una impresora simulada en localhost (si llega distinto a lo
+  enviado el script falla)
+- ingesta de filas/s (`load_excel_to_db`) y, aparte, el tiempo de su reporte consolidado
+- si pyarrow está instalado, que el reporte en Parquet tenga las mismas filas
+  que en CSV (si no, el script falla)
+- análisis de duplicados (`verificar_duplicados_db`)
+- servicio de etiquetas por HTTP en localhost (`servicio_etiquetas.py`, puerto
+  libre y la BD temporal): POST duplicado -> mismo id, spec inválida -> 400,
+  PDF antes de terminar -> 409, descarga del PDF y aciertos de caché al repetir
+  un trabajo (si algo falla el script falla)
+- latencia de búsqueda (`buscar_bienes`, la consulta del buscador de la UI) y,
+  con una descripción de 4500 caracteres, su latencia y la memoria que toma
+  armar el índice de búsqueda de esa columna
+
+Los resultados se guardan en JSON y se comparan contra una línea base; si
+alguna métrica empeora más que el umbral el script termina con código 1.
+
+Uso:
+    python benchmark.py                        # ejecuta y compara con la línea base
+    python benchmark.py --guardar              # guarda el resultado como nueva línea base
+    python benchmark.py --filas 5000 --oficinas 30 --largo-nombre 60 --umbral 0.2
+    python benchmark.py --perfil               # además, tiempos por etapa del PDF
+"""
+
+import argparse
+import contextlib
+import glob
+import importlib.util
+import io
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime
+
+import pandas as pd
+
+import db.database as database
+from db.database import buscar_bienes, create_table
+from db.instantanea import obtener_instantanea
+from utils import perfil
+from data.load_excel import load_excel_to_db
+from data.verificar_duplicados import verificar_duplicados_db
+from servicio_etiquetas import crear_servidor
+from utils.barcode_generator import (OFFICE_KEYS, _generate_separator_image, diferencia_pixeles,
+                                     generate_barcode, generate_barcodes_pdf)
+from utils.termica import ImpresoraSimulada, enviar, generar_comandos
+
+_BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE = os.path.join(_BASE_DIR, "benchmark_baseline.json")
+HOJA = "Inventario Completo"
+TITULO = "INVENTARIO DRE HUÁNUCO - 2025"
+ETIQUETAS_POR_PAGINA = 35  # 5 columnas x 7 filas
+LIMITE_DIFERENCIA_1BIT = 0.01  # fracción máxima de píxeles distintos entre "L" y "1"
+COLUMNAS_BUSQUEDA = ("codigo_completo", "codigo_patrimonial", "codigo_interno", "detalle_bien",
+                     "descripcion", "oficina", "responsable", "fuente", "tipo_registro")
+
+_PALABRAS = ("SILLA", "MESA", "ESCRITORIO", "COMPUTADORA", "IMPRESORA", "ARMARIO", "ESTANTE",
+             "METALICO", "MADERA", "GIRATORIA", "PERSONAL", "LASER", "MONITOR", "TECLADO",
+             "VENTILADOR", "PIZARRA", "ACRILICA", "FOTOCOPIADORA", "ARCHIVADOR", "MODULO")
+
+
+# ----------------- DATOS SINTÉTICOS -----------------
+def generar_oficinas(cantidad, semilla=0):
+    """Nombres de oficina: primero las conocidas de OFFICE_KEYS, luego sintéticas."""
+    conocidas = sorted(set(OFFICE_KEYS))
+    random.Random(semilla).shuffle(conocidas)
+    oficinas = conocidas[:cantidad]
+    for i in range(len(oficinas), cantidad):
+        oficinas.append(f"OFICINA SINTETICA {i:03d}")
+    return oficinas
+
+
+def generar_inventario(filas=1000, oficinas=10, largo_nombre=40, duplicados=0.02, semilla=0):
+    """
+    Genera un inventario sintético con las columnas del Excel unificado.
+
+    Args:
+        filas: Cantidad de filas
+        oficinas: Cantidad de oficinas distintas
+        largo_nombre: Largo aproximado del detalle del bien (caracteres)
+        duplicados: Fracción de filas que repiten un código ya usado
+        semilla: Semilla para que los datos sean reproducibles
+    """
+    rnd = random.Random(semilla)
+    nombres_oficina = generar_oficinas(oficinas, semilla)
+
+    registros = []
+    for i in range(filas):
+        if registros and rnd.random() < duplicados:
+            base = rnd.choice(registros)
+            codigo_bien, codigo_interno = base["CODIGO_BIEN"], base["CODIGO_INTERNO"]
+        else:
+            codigo_bien = str(740000000000 + i * 7919 % 10000000)
+            codigo_interno = f"{rnd.randint(1, 9999):04d}"
+
+        detalle = []
+        while len(" ".join(detalle)) < largo_nombre:
+            detalle.append(rnd.choice(_PALABRAS))
+
+        registros.append({
+            "CODIGO_BIEN": codigo_bien,
+            "CODIGO_INTERNO": codigo_interno,
+            "DETALLE_BIEN": " ".join(detalle)[:largo_nombre],
+            "CARACTERISTICAS": f"MARCA {rnd.choice(_PALABRAS)} SERIE {rnd.randint(1000, 99999)}",
+            "OFICINA": rnd.choice(nombres_oficina),
+            "TIPO_REGISTRO": "SOBRANTE" if rnd.random() < 0.15 else "SIGA",
+            "ESTADO": rnd.choice(("B", "R", "M")),
+            "RESPONSABLE": f"RESPONSABLE {rnd.randint(1, 80):02d}",
+        })
+    return pd.DataFrame(registros)
+
+
+def registros_etiquetas(df, cantidad):
+    """Tuplas (codigo, detalle, tipo, oficina) ordenadas por oficina, como en la UI."""
+    df = df.head(cantidad).sort_values("OFICINA")
+    return list(zip(df["CODIGO_BIEN"] + df["CODIGO_INTERNO"], df["DETALLE_BIEN"],
+                    df["TIPO_REGISTRO"], df["OFICINA"]))
+
+
+# ----------------- MEDICIÓN -----------------
+def medir(funcion, repeticiones=5):
+    """Ejecuta `funcion` varias veces (con la salida silenciada) y retorna los segundos de cada una."""
+    tiempos = []
+    for _ in range(repeticiones):
+        with contextlib.redirect_stdout(io.StringIO()):
+            inicio = time.perf_counter()
+            funcion()
+            tiempos.append(time.perf_counter() - inicio)
+    return tiempos
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+def metrica(valor, unidad, mayor_es_mejor=False):
+    return {"valor": valor, "unidad": unidad, "mayor_es_mejor": mayor_es_mejor}
+
+
+def _nueva_bd():
+    if os.path.exists(database._DB_PATH):
+        os.remove(database._DB_PATH)
+    create_table()
+
+
+# ----------------- BENCHMARKS -----------------
+def bench_etiquetas(registros, repeticiones):
+    codigo, detalle, tipo, oficina = registros[0]
+    etiqueta = medir(lambda: generate_barcode(codigo, title=TITULO, detalle_bien=detalle,
+                                              tipo_registro=tipo, oficina=oficina), repeticiones)
+    separador = medir(lambda: _generate_separator_image(oficina), repeticiones)
+    return {
+        "etiqueta_p50": metrica(statistics.median(etiqueta), "s"),
+        "etiqueta_p95": metrica(percentil(etiqueta, 95), "s"),
+        "separador_p50": metrica(statistics.median(separador), "s"),
+    }
+
+
+def bench_1bit(registros, repeticiones):
+    from PIL import Image
+
+    def render(codigo, detalle, tipo, oficina, modo):
+        return generate_barcode(codigo, title=TITULO, detalle_bien=detalle, tipo_registro=tipo,
+                                oficina=oficina, modo=modo).fp.getvalue()
+
+    codigo, detalle, tipo, oficina = registros[0]
+    tiempos = medir(lambda: render(codigo, detalle, tipo, oficina, "1"), repeticiones)
+
+    # Diferencia visual y tamaño contra el modo de grises en una muestra de etiquetas
+    diferencias, tam_gris, tam_1bit = [], 0, 0
+    for record in registros[:10]:
+        gris, bilevel = render(*record, "L"), render(*record, "1")
+        tam_gris += len(gris)
+        tam_1bit += len(bilevel)
+        diferencias.append(diferencia_pixeles(Image.open(io.BytesIO(gris)), Image.open(io.BytesIO(bilevel))))
+    return {
+        "etiqueta_1bit_p50": metrica(statistics.median(tiempos), "s"),
+        "png_1bit_vs_gris": metrica(tam_1bit / tam_gris, "fracción"),
+        "diferencia_1bit_max": metrica(max(diferencias), "fracción"),
+    }
+
+
+def bench_pdf(registros, repeticiones):
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.pdfgen import canvas
+
+    # Ensamblado: solo drawImage de una página con etiquetas ya renderizadas
+    imagenes = [generate_barcode(codigo, title=TITULO, detalle_bien=detalle,
+                                 tipo_registro=tipo, oficina=oficina)
+                for codigo, detalle, tipo, oficina in registros[:ETIQUETAS_POR_PAGINA]]
+    ancho, alto = landscape(A4)
+
+    def ensamblar_pagina():
+        pdf = canvas.Canvas(os.path.join("reportes", "bench_pagina.pdf"), pagesize=(ancho, alto))
+        for i, img in enumerate(imagenes):
+            fila, columna = divmod(i % ETIQUETAS_POR_PAGINA, 5)
+            pdf.drawImage(img, columna * ancho / 5, alto - (fila + 1) * alto / 7,
+                          width=ancho / 5, height=alto / 7)
+        pdf.save()
+
+    os.makedirs("reportes", exist_ok=True)
+    pagina = medir(ensamblar_pagina, repeticiones)
+
+    # Punta a punta: render + separadores + PDF completo
+    total = medir(lambda: generate_barcodes_pdf(registros, output_pdf="reportes/",
+                                                selected_office="BENCH"), 1)[0]
+    return {
+        "pagina_pdf_ensamblado": metrica(statistics.median(pagina), "s"),
+        "etiquetas_por_segundo": metrica(len(registros) / total, "etiquetas/s", mayor_es_mejor=True),
+    }
+
+
+def bench_termica(registros, repeticiones):
+    tiempos = medir(lambda: generar_comandos(registros, formato="zpl"), repeticiones)
+    datos = generar_comandos(registros, formato="zpl")
+
+    # Envío por red contra una impresora simulada: debe llegar byte por byte lo generado
+    with ImpresoraSimulada() as impresora:
+        inicio = time.perf_counter()
+        enviar(datos, impresora.destino)
+        recibido = impresora.recibido(len(datos))
+        envio = time.perf_counter() - inicio
+    return {
+        "zpl_etiquetas_por_segundo": metrica(len(registros) / statistics.median(tiempos), "etiquetas/s",
+                                             mayor_es_mejor=True),
+        "zpl_bytes_por_etiqueta": metrica(len(datos) / len(registros), "bytes"),
+        "zpl_envio_tcp": metrica(envio, "s"),
+        "zpl_envio_tcp_integro": metrica(float(recibido == datos), "ok", mayor_es_mejor=True),
+    }
+
+
+def bench_ingesta(df, repeticiones):
+    ruta = os.path.abspath("inventario_sintetico.xlsx")
+    df.to_excel(ruta, sheet_name=HOJA, index=False)
+
+    reportes = []
+
+    def cargar():
+        _nueva_bd()
+        reportes.append(load_excel_to_db(ruta, sheet_name=HOJA, header=0)["segundos_reporte"])
+
+    tiempos = medir(cargar, repeticiones)
+    return {"ingesta_filas_por_segundo": metrica(len(df) / statistics.median(tiempos), "filas/s",
+                                                  mayor_es_mejor=True),
+            "reporte_carga": metrica(statistics.median(reportes), "s")}
+
+
+def bench_reporte_parquet():
+    # Usa el Excel que dejó la ingesta; el reporte Parquet debe leerse igual que el CSV
+    if importlib.util.find_spec("pyarrow") is None:
+        print("ℹ️ pyarrow no está instalado: se omite la prueba del reporte Parquet")
+        return {}
+    ruta = os.path.abspath("inventario_sintetico.xlsx")
+    for formato in ("csv", "parquet"):
+        _nueva_bd()
+        with contextlib.redirect_stdout(io.StringIO()):
+            load_excel_to_db(ruta, sheet_name=HOJA, header=0,
+                             reporte=os.path.join("reportes", f"formato.{formato}"))
+    integro = True
+    for archivo in glob.glob(os.path.join("reportes", "formato_*.csv")):
+        esperado = pd.read_csv(archivo, dtype=str, keep_default_na=False)
+        leido = pd.read_parquet(archivo[:-len("csv")] + "parquet").fillna("")
+        integro &= list(esperado.columns) == list(leido.columns) and esperado.equals(leido)
+    return {"reporte_parquet_integro": metrica(float(integro), "ok", mayor_es_mejor=True)}
+
+
+def bench_duplicados(repeticiones):
+    # Usa la BD que dejó la ingesta
+    tiempos = medir(verificar_duplicados_db, repeticiones)
+    return {"duplicados_bd": metrica(statistics.median(tiempos), "s")}
+
+
+def _http(url, spec=None):
+    """(código HTTP, cuerpo) de un GET, o de un POST con `spec` como JSON."""
+    datos = None if spec is None else json.dumps(spec).encode("utf-8")
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, data=datos), timeout=30) as respuesta:
+            return respuesta.status, respuesta.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+
+def bench_servicio(df):
+    """Prueba el servicio de etiquetas de punta a punta por HTTP en localhost (usa la BD de la ingesta)."""
+    codigos = (df["CODIGO_BIEN"] + df["CODIGO_INTERNO"]).drop_duplicates().tolist()
+    fallas = []
+
+    def comprobar(condicion, descripcion):
+        if not condicion:
+            fallas.append(descripcion)
+
+    def esperar(base, trabajo_id):
+        while True:
+            trabajo = json.loads(_http(f"{base}/trabajos/{trabajo_id}")[1])
+            if trabajo["estado"] not in ("en_cola", "procesando"):
+                return trabajo
+            time.sleep(0.05)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        servidor = crear_servidor(puerto=0, workers=1, salida=os.path.join("reportes", "servicio"))
+        hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+        hilo.start()
+        base = f"http://127.0.0.1:{servidor.server_address[1]}"
+        try:
+            # Con un solo worker ocupado en el primero, el segundo trabajo sigue en cola
+            _http(f"{base}/trabajos", {"codigos": codigos[:40]})
+            spec = {"codigos": codigos[40:60], "registrar": False}
+            codigo, cuerpo = _http(f"{base}/trabajos", spec)
+            primero = json.loads(cuerpo)
+            comprobar(codigo == 202, f"POST /trabajos respondió {codigo}")
+            segundo = json.loads(_http(f"{base}/trabajos", spec)[1])
+            comprobar(segundo["id"] == primero["id"] and segundo["duplicado"],
+                      "un POST duplicado no devolvió el mismo trabajo")
+            comprobar(_http(f"{base}/trabajos", {"copias": "2"})[0] == 400,
+                      "una spec inválida no respondió 400")
+            comprobar(_http(f"{base}/trabajos/{primero['id']}/pdf")[0] == 409,
+                      "el PDF de un trabajo sin terminar no respondió 409")
+
+            inicio = time.perf_counter()
+            trabajo = esperar(base, primero["id"])
+            segundos = time.perf_counter() - inicio
+            codigo, pdf = _http(f"{base}/trabajos/{primero['id']}/pdf")
+            comprobar(trabajo["estado"] == "listo" and codigo == 200 and pdf.startswith(b"%PDF"),
+                      f"no se pudo descargar el PDF ({trabajo['estado']}: {trabajo['error']})")
+
+            # Repetido después de terminar: es un trabajo nuevo, pero sin volver a dibujar etiquetas
+            aciertos = json.loads(_http(f"{base}/salud")[1])["cache"]["aciertos"]
+            repetido = esperar(base, json.loads(_http(f"{base}/trabajos", spec)[1])["id"])
+            nuevos = json.loads(_http(f"{base}/salud")[1])["cache"]["aciertos"] - aciertos
+            comprobar(repetido["estado"] == "listo" and nuevos >= repetido["registros"],
+                      f"el trabajo repetido tuvo {nuevos} aciertos de caché para "
+                      f"{repetido['registros']} etiquetas")
+        finally:
+            servidor.shutdown()
+            servidor.server_close()
+
+    for falla in fallas:
+        print(f"❌ Servicio de etiquetas: {falla}")
+    return {
+        "servicio_trabajo": metrica(segundos, "s"),
+        "servicio_local_ok": metrica(float(not fallas), "ok", mayor_es_mejor=True),
+    }
+
+
+def bench_busqueda(df, repeticiones):
+    terminos = [df["CODIGO_BIEN"].iloc[0], "silla", df["OFICINA"].iloc[0].lower(),
+                "responsable 07", "no-existe-xyz"]
+    latencias = []
+    for termino in terminos:
+        latencias.extend(medir(lambda: buscar_bienes(termino, COLUMNAS_BUSQUEDA), repeticiones))
+    return {
+        "busqueda_p50": metrica(statistics.median(latencias), "s"),
+        "busqueda_p95": metrica(percentil(latencias, 95), "s"),
+    }
+
+
+def bench_busqueda_larga(repeticiones):
+    # Una sola descripción muy larga no debe inflar el índice de búsqueda de toda la columna
+    import tracemalloc
+
+    conn = database.create_connection()
+    conn.execute("UPDATE bienes SET descripcion = ? WHERE id = (SELECT MIN(id) FROM bienes)",
+                 ("DESCRIPCION LARGA " * 250,))
+    conn.commit()
+    conn.close()
+    obtener_instantanea()  # recarga fuera de la medición de memoria
+    tracemalloc.start()
+    try:
+        buscar_bienes("serie", ("descripcion",))
+        pico = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    latencias = medir(lambda: buscar_bienes("descripcion larga", COLUMNAS_BUSQUEDA), repeticiones)
+    return {
+        "busqueda_larga_p50": metrica(statistics.median(latencias), "s"),
+        "busqueda_larga_memoria": metrica(pico / 1e6, "MB"),
+    }
+
+
+def ejecutar(filas, oficinas, largo_nombre, etiquetas, repeticiones, semilla=0):
+    """Ejecuta todos los benchmarks en un directorio temporal y retorna las métricas."""
+    df = generar_inventario(filas, oficinas, largo_nombre, semilla=semilla)
+    registros = registros_etiquetas(df, etiquetas)
+
+    directorio_original = os.getcwd()
+    db_original = database._DB_PATH
+    with tempfile.TemporaryDirectory() as tmp:
+        os.makedirs(os.path.join(tmp, "utils"))
+        shutil.copy(os.path.join(_BASE_DIR, "utils", "logo.png"), os.path.join(tmp, "utils"))
+        os.chdir(tmp)
+        database._DB_PATH = os.path.join(tmp, "inventario.db")
+        try:
+            metricas = {}
+            for nombre, funcion in (("etiquetas", lambda: bench_etiquetas(registros, repeticiones)),
+                                    ("1bit", lambda: bench_1bit(registros, repeticiones)),
+                                    ("pdf", lambda: bench_pdf(registros, repeticiones)),
+                                    ("termica", lambda: bench_termica(registros, repeticiones)),
+                                    ("ingesta", lambda: bench_ingesta(df, repeticiones)),
+                                    ("parquet", bench_reporte_parquet),
+                                    ("duplicados", lambda: bench_duplicados(repeticiones)),
+                                    ("servicio", lambda: bench_servicio(df)),
+                                    ("busqueda", lambda: bench_busqueda(df, repeticiones)),
+                                    ("busqueda_larga", lambda: bench_busqueda_larga(repeticiones))):
+                inicio = time.perf_counter()
+                metricas.update(funcion())
+                print(f"⏱️  {nombre:<12} {time.perf_counter() - inicio:.2f}s")
+        finally:
+            os.chdir(directorio_original)
+            database._DB_PATH = db_original
+    return metricas
+
+
+# ----------------- LÍNEA BASE -----------------
+def comparar(actual, base, umbral):
+    """
+    Compara métricas contra la línea base.
+    Retorna la lista de métricas que empeoraron más que `umbral` (fracción).
+    """
+    regresiones = []
+    print(f"\n{'métrica':<26} {'base':>12} {'actual':>12} {'cambio':>9}")
+    for nombre, datos in actual.items():
+        if nombre not in base:
+            print(f"{nombre:<26} {'-':>12} {datos['valor']:>12.4f}  (nueva)")
+            continue
+        previo, valor = base[nombre]["valor"], datos["valor"]
+        cambio = (valor - previo) / previo if previo else 0.0
+        # Un cambio positivo siempre significa "peor"
+        empeora = -cambio if datos["mayor_es_mejor"] else cambio
+        estado = "❌" if empeora > umbral else "✅"
+        if empeora > umbral:
+            regresiones.append(nombre)
+        print(f"{nombre:<26} {previo:>12.4f} {valor:>12.4f} {cambio:>+8.1%} {estado} {datos['unidad']}")
+    return regresiones
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks de etiquetas, PDF, ingesta y búsqueda")
+    parser.add_argument("--filas", type=int, default=2000)
+    parser.add_argument("--oficinas", type=int, default=15)
+    parser.add_argument("--largo-nombre", type=int, default=40)
+    parser.add_argument("--etiquetas", type=int, default=70, help="etiquetas del PDF punta a punta")
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--baseline", default=BASELINE, help="archivo JSON de la línea base")
+    parser.add_argument("--salida", help="guardar también el resultado en este JSON")
+    parser.add_argument("--guardar", action="store_true", help="guardar el resultado como línea base")
+    parser.add_argument("--perfil", action="store_true",
+                        help="mostrar el perfil por etapa del PDF punta a punta")
+    parser.add_argument("--umbral", type=float, default=0.15,
+                        help="empeoramiento tolerado antes de marcar regresión (0.15 = 15%%)")
+    args = parser.parse_args(argv)
+    if args.perfil:
+        perfil.activar()
+
+    parametros = {"filas": args.filas, "oficinas": args.oficinas, "largo_nombre": args.largo_nombre,
+                  "etiquetas": args.etiquetas, "repeticiones": args.repeticiones}
+    print(f"📊 Benchmark con {parametros}")
+    resultado = {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "parametros": parametros,
+        "metricas": ejecutar(args.filas, args.oficinas, args.largo_nombre,
+                             args.etiquetas, args.repeticiones),
+    }
+
+    if args.perfil:
+        perfil.imprimir_reporte("Perfil por etapa (PDF punta a punta)",
+                                perfil.ultimo_trabajo("generate_barcodes_pdf"))
+
+    diferencia = resultado["metricas"]["diferencia_1bit_max"]["valor"]
+    if diferencia > LIMITE_DIFERENCIA_1BIT:
+        print(f"❌ El modo de 1 bit cambia {diferencia:.2%} de los píxeles "
+              f"(límite {LIMITE_DIFERENCIA_1BIT:.0%})")
+        return 1
+    if not resultado["metricas"]["zpl_envio_tcp_integro"]["valor"]:
+        print("❌ La impresora simulada no recibió exactamente el flujo ZPL enviado")
+        return 1
+    parquet = resultado["metricas"].get("reporte_parquet_integro")
+    if parquet is not None and not parquet["valor"]:
+        print("❌ El reporte en Parquet no coincide con el mismo reporte en CSV")
+        return 1
+    if not resultado["metricas"]["servicio_local_ok"]["valor"]:
+        print("❌ El servicio de etiquetas no pasó la prueba en localhost")
+        return 1
+
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+        print(f"📂 Resultado guardado en '{args.salida}'")
+
+    if args.guardar:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+        print(f"✅ Línea base guardada en '{args.baseline}'")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"⚠️ No hay línea base en '{args.baseline}'; ejecuta con --guardar para crearla.")
+        comparar(resultado["metricas"], {}, args.umbral)
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        base = json.load(f)
+    if base.get("parametros") != parametros:
+        print(f"⚠️ La línea base se midió con otros parámetros: {base.get('parametros')}")
+
+    regresiones = comparar(resultado["metricas"], base["metricas"], args.umbral)
+    if regresiones:
+        print(f"\n❌ Regresiones por encima del {args.umbral:.0%}: {', '.join(regresiones)}")
+        return 1
+    print("\n✅ Sin regresiones")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
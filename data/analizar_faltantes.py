@@ -4,8 +4,84 @@ Script para analizar los registros que no se están insertando en la base de dat
 
 import pandas as pd
 from db.database import create_connection
+from data.columnas import ColumnaAmbiguaError
+from data.excel_reader import leer_excel_columnas
 import os
 
+
+# Campos que se leen del Excel (ver data/columnas.py)
+CAMPOS = ("codigo_patrimonial", "codigo_interno", "detalle_bien", "oficina", "tipo_registro")
+
+
+def _vacio_a_null(columna):
+    """
+    Expresión SQL que trata como NULL una celda vacía: load_excel guarda las
+    celdas vacías como el texto 'nan' y el Excel las trae como NaN (NULL).
+    """
+    return f"NULLIF(NULLIF(TRIM({columna}), ''), 'nan')"
+
+
+def conciliar_con_bd(conn, df_claves):
+    """
+    Concilia las claves del Excel contra la tabla 'bienes' con anti-joins en SQLite.
+
+    Las claves se cargan en una tabla temporal indexada, así cada cruce es
+    lineal en lugar de comparar código por código.
+
+    Args:
+        conn: Conexión abierta a la base de datos
+        df_claves: DataFrame con columnas codigo_completo, detalle_bien, oficina
+            (una fila por código; se conserva la primera si hay repetidos)
+
+    Returns:
+        dict con DataFrames 'solo_excel', 'solo_bd' y 'cambiados'
+    """
+    claves = df_claves.drop_duplicates('codigo_completo', keep='first')
+    cursor = conn.cursor()
+    cursor.execute("DROP TABLE IF EXISTS temp.excel_claves")
+    cursor.execute("""
+        CREATE TEMP TABLE excel_claves (
+            codigo_completo TEXT PRIMARY KEY,
+            detalle_bien TEXT,
+            oficina TEXT
+        )
+    """)
+    cursor.executemany(
+        "INSERT INTO excel_claves VALUES (?, ?, ?)",
+        claves[['codigo_completo', 'detalle_bien', 'oficina']].itertuples(index=False, name=None)
+    )
+
+    solo_excel = pd.read_sql_query("""
+        SELECT e.codigo_completo, e.detalle_bien, e.oficina
+        FROM excel_claves e
+        LEFT JOIN bienes b ON b.codigo_completo = e.codigo_completo
+        WHERE b.codigo_completo IS NULL
+        ORDER BY e.codigo_completo
+    """, conn)
+
+    solo_bd = pd.read_sql_query("""
+        SELECT b.codigo_completo, b.detalle_bien, b.oficina, b.fuente, b.tipo_registro
+        FROM bienes b
+        LEFT JOIN excel_claves e ON e.codigo_completo = b.codigo_completo
+        WHERE e.codigo_completo IS NULL
+        ORDER BY b.codigo_completo
+    """, conn)
+
+    cambiados = pd.read_sql_query(f"""
+        SELECT e.codigo_completo,
+               b.detalle_bien AS detalle_bd, e.detalle_bien AS detalle_excel,
+               b.oficina AS oficina_bd, e.oficina AS oficina_excel
+        FROM excel_claves e
+        INNER JOIN bienes b ON b.codigo_completo = e.codigo_completo
+        WHERE {_vacio_a_null("b.detalle_bien")} IS NOT {_vacio_a_null("e.detalle_bien")}
+           OR {_vacio_a_null("b.oficina")} IS NOT {_vacio_a_null("e.oficina")}
+        ORDER BY e.codigo_completo
+    """, conn)
+
+    cursor.execute("DROP TABLE excel_claves")
+    return {'solo_excel': solo_excel, 'solo_bd': solo_bd, 'cambiados': cambiados}
+
+
 def analizar_faltantes():
     """
     Compara los registros del Excel con los de la base de datos
@@ -20,23 +96,28 @@ def analizar_faltantes():
     sheet_name = "Hoja1"
     header = 2
     
-    df = pd.read_excel(file_path, sheet_name=sheet_name, header=header, dtype=str)
-    df.columns = [str(c).strip().lower() for c in df.columns]
+    # Leer solo las columnas que se analizan
+    try:
+        df, columnas = leer_excel_columnas(file_path, sheet_name, header, CAMPOS)
+    except ColumnaAmbiguaError as e:
+        print(f"❌ {e}")
+        return
     
     print(f"\n📁 Archivo: {file_path}")
     print(f"📄 Hoja: {sheet_name}")
     print(f"📊 Total de filas en Excel: {len(df)}")
     
-    # Detectar columnas
-    col_pat = next((c for c in df.columns if "codigo del bien" in c or "patrimonial" in c), None)
-    col_int = next((c for c in df.columns if "codigo interno" in c or "codigo inter" in c), None)
-    col_det = next((c for c in df.columns if "detalle del   bien" in c), None)
-    col_reg = next((c for c in df.columns if "unnamed: 2" in c or "tipo de registro" in c), None)
+    col_pat = columnas["codigo_patrimonial"]
+    col_int = columnas["codigo_interno"]
+    col_det = columnas["detalle_bien"]
+    col_ofi = columnas["oficina"]
+    col_reg = columnas["tipo_registro"]
     
     print(f"\n🔍 Columnas detectadas:")
     print(f"   - Código patrimonial: {col_pat}")
     print(f"   - Código interno: {col_int}")
     print(f"   - Detalle bien: {col_det}")
+    print(f"   - Oficina: {col_ofi}")
     print(f"   - Tipo registro: {col_reg}")
     
     # Análisis de registros
@@ -89,49 +170,48 @@ def analizar_faltantes():
     print(f"   - Total de registros en grupos duplicados: {len(duplicados)}")
     print(f"   - Registros que serían ignorados por duplicación: {len(duplicados_unicos)}")
     
+    # Primera fila de cada código (detalle y oficina que se insertarían)
+    df_claves = pd.DataFrame({
+        'codigo_completo': df_valid['codigo_completo'],
+        'detalle_bien': df_valid[col_det].str.strip() if col_det else None,
+        'oficina': df_valid[col_ofi].str.strip() if col_ofi else None,
+    }).drop_duplicates('codigo_completo', keep='first')
+    detalle_por_codigo = df_claves.set_index('codigo_completo')['detalle_bien']
+    
     if not duplicados.empty:
         # Agrupar duplicados
         dup_counts = df_valid.groupby('codigo_completo').size().reset_index(name='veces')
         dup_counts = dup_counts[dup_counts['veces'] > 1].sort_values('veces', ascending=False)
+        dup_counts['detalle_bien'] = dup_counts['codigo_completo'].map(detalle_por_codigo)
         
         print(f"\n   🔁 Códigos duplicados encontrados: {len(dup_counts)}")
         print("   Top 10 más repetidos:")
-        for _, row in dup_counts.head(10).iterrows():
-            codigo = row['codigo_completo']
-            veces = row['veces']
-            # Buscar detalle
-            detalle = df_valid[df_valid['codigo_completo'] == codigo][col_det].iloc[0] if col_det else "N/A"
-            detalle = str(detalle)[:50] if detalle else "N/A"
+        for codigo, veces, detalle in dup_counts.head(10).itertuples(index=False, name=None):
+            detalle = str(detalle)[:50] if col_det and detalle else "N/A"
             print(f"      {codigo}: {veces} veces - {detalle}...")
     
     # 4. Registros que pasaron los filtros (deberían insertarse)
     registros_validos = len(df_valid) - len(duplicados_unicos)
     print(f"\n4️⃣ Registros válidos esperados (sin duplicados): {registros_validos}")
     
-    # 5. Verificar en la base de datos
+    # 5. Conciliar contra la base de datos
+    conciliacion = None
     conn = create_connection()
     cursor = conn.cursor()
     cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='bienes';")
     if cursor.fetchone():
-        df_db = pd.read_sql_query("SELECT * FROM bienes", conn)
-        print(f"\n5️⃣ Registros en la base de datos: {len(df_db)}")
+        total_db = cursor.execute("SELECT COUNT(*) FROM bienes").fetchone()[0]
+        print(f"\n5️⃣ Registros en la base de datos: {total_db}")
         
-        diferencia = registros_validos - len(df_db)
+        diferencia = registros_validos - total_db
         print(f"\n📊 DIFERENCIA: {diferencia} registros")
         
-        if diferencia != 0:
-            print("\n⚠️ Hay una diferencia, analizando...")
-            
-            # Comparar códigos
-            codigos_excel = set(df_valid['codigo_completo'].unique())
-            codigos_db = set(df_db['codigo_completo'].unique())
-            
-            en_excel_no_db = codigos_excel - codigos_db
-            print(f"\n   Códigos en Excel pero NO en BD: {len(en_excel_no_db)}")
-            if en_excel_no_db:
-                for codigo in list(en_excel_no_db)[:10]:
-                    detalle = df_valid[df_valid['codigo_completo'] == codigo][col_det].iloc[0] if col_det else "N/A"
-                    print(f"      {codigo}: {str(detalle)[:50]}...")
+        conciliacion = conciliar_con_bd(conn, df_claves)
+        print(f"\n   Códigos en Excel pero NO en BD: {len(conciliacion['solo_excel'])}")
+        for codigo, detalle, _ in conciliacion['solo_excel'].head(10).itertuples(index=False, name=None):
+            print(f"      {codigo}: {str(detalle)[:50]}...")
+        print(f"\n   Códigos en BD pero NO en Excel: {len(conciliacion['solo_bd'])}")
+        print(f"   Códigos con detalle u oficina distinta: {len(conciliacion['cambiados'])}")
     else:
         print("\n⚠️ La tabla 'bienes' no existe en la base de datos")
     
@@ -163,6 +243,14 @@ def analizar_faltantes():
         # Resumen de duplicados
         if not duplicados.empty:
             dup_counts.to_excel(writer, sheet_name='Resumen_Duplicados', index=False)
+        
+        # Diferencias completas contra la base de datos
+        if conciliacion:
+            for hoja, datos in (('Solo_Excel', conciliacion['solo_excel']),
+                                ('Solo_BD', conciliacion['solo_bd']),
+                                ('Cambiados', conciliacion['cambiados'])):
+                if not datos.empty:
+                    datos.to_excel(writer, sheet_name=hoja, index=False)
     
     print(f"\n📂 Reporte detallado guardado en: reportes/analisis_faltantes.xlsx")
 
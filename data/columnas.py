@@ -0,0 +1,184 @@
+"""
+Registro único de columnas de los Excel de inventario.
+
+Cada campo lógico (codigo_patrimonial, oficina, ...) declara los patrones de
+encabezado que lo identifican, en orden de prioridad:
+- "=texto": el encabezado normalizado es exactamente `texto`
+- "texto":  el encabezado normalizado contiene `texto`
+Con el mismo patrón, un encabezado igual al texto gana a uno que solo lo
+contiene ("OFICINA" antes que "OFICINA ANTERIOR"); solo es ambiguo el empate
+entre coincidencias igual de buenas.
+
+Los patrones se compilan una sola vez en un `MatcherColumnas`, que resuelve la
+distribución de una hoja en una sola pasada sobre sus encabezados. Las
+resoluciones se guardan en caché por (archivo, hoja, firma del encabezado),
+así las cargas repetidas no vuelven a detectar nada.
+"""
+
+import re
+
+# campo -> (patrones en orden de prioridad, nombre en el Excel unificado)
+REGISTRO_COLUMNAS = {
+    "item": (("=item",), "ITEM"),
+    "codigo_patrimonial": (("=codigo_bien", "codigo del bien", "patrimonial"), "CODIGO_BIEN"),
+    "codigo_interno": (("=codigo_interno", "codigo interno", "codigo inter"), "CODIGO_INTERNO"),
+    "detalle_bien": (("=detalle_bien", "detalle del   bien"), "DETALLE_BIEN"),
+    "descripcion": (("caracteristicas", "descripcion"), "CARACTERISTICAS"),
+    "oficina": (("oficina",), "OFICINA"),
+    # En el Excel unificado 'tipo_registro' tiene prioridad sobre el formato antiguo
+    "tipo_registro": (("=tipo_registro", "tipo de registro", "=unnamed: 2", "=unnamed: 3", "=origen"), "TIPO_REGISTRO"),
+    "estado": (("=estado", "estad"), "ESTADO"),
+    "responsable": (("responsable",), "RESPONSABLE"),
+    "codigo_antiguo": (("=codigo_antiguo", "cod. ant.", "cod.  ant."), "CODIGO_ANTIGUO"),
+    "cantidad": (("=cantidad", "=cant."), "CANTIDAD"),
+    "importe": (("importe",), "IMPORTE"),
+    "observacion": (("observaci",), "OBSERVACION"),
+    "cuenta_contable": (("=cuenta_contable", "cuenta contable"), "CUENTA_CONTABLE"),
+    "num_documento": (("=num_documento", "n° de pecosa", "n° pap. asig."), "NUM_DOCUMENTO"),
+    "fecha_emision": (("=fecha_emision", "fecha de emision"), "FECHA_EMISION"),
+}
+
+
+class ColumnaAmbiguaError(ValueError):
+    """Varias columnas coinciden con el mismo campo y la misma prioridad."""
+
+
+def normalizar_encabezado(columna) -> str:
+    """Normaliza un encabezado para compararlo (sin saltos de línea, minúsculas)."""
+    return str(columna).replace("\n", "").strip().lower()
+
+
+class MatcherColumnas:
+    """Matcher precompilado para un conjunto de campos del registro."""
+
+    def __init__(self, campos=None):
+        self.campos = tuple(campos) if campos else tuple(REGISTRO_COLUMNAS)
+
+        # Coincidencias exactas: texto -> [(campo, prioridad)]
+        self._exactos = {}
+        # Coincidencias por contenido: una sola expresión con un lookahead
+        # opcional por patrón, así un solo match reporta todos los patrones
+        # presentes en el encabezado.
+        self._grupos = {}
+        lookaheads = []
+        for campo in self.campos:
+            patrones, _ = REGISTRO_COLUMNAS[campo]
+            for prioridad, patron in enumerate(patrones):
+                if patron.startswith("="):
+                    self._exactos.setdefault(patron[1:], []).append((campo, prioridad))
+                else:
+                    grupo = f"g{len(self._grupos)}"
+                    self._grupos[grupo] = (campo, prioridad, patron)
+                    lookaheads.append(f"(?=.*?(?P<{grupo}>{re.escape(patron)}))?")
+        self._regex = re.compile("".join(lookaheads), re.DOTALL)
+
+    def candidatas(self, columnas) -> dict:
+        """
+        Recorre los encabezados una vez y retorna {campo: (mejores, exactas)}:
+        las columnas empatadas en la mejor coincidencia y todas las que
+        coinciden con algún patrón "=texto" del campo.
+
+        Cada coincidencia se ordena por (prioridad del patrón, 0 si el
+        encabezado es igual al texto del patrón o 1 si solo lo contiene).
+        """
+        mejores = {}  # campo -> (rango, [columnas])
+        exactas = {}  # campo -> [columnas]
+        for columna in columnas:
+            texto = normalizar_encabezado(columna)
+
+            coincidencias = {}
+            for campo, prioridad in self._exactos.get(texto, ()):
+                coincidencias[campo] = min((prioridad, 0), coincidencias.get(campo, (prioridad, 0)))
+                exactas.setdefault(campo, []).append(columna)
+            if self._grupos:
+                for grupo, valor in self._regex.match(texto).groupdict().items():
+                    if valor is not None:
+                        campo, prioridad, patron = self._grupos[grupo]
+                        rango = (prioridad, 0 if texto == patron else 1)
+                        coincidencias[campo] = min(rango, coincidencias.get(campo, rango))
+
+            for campo, rango in coincidencias.items():
+                actual = mejores.get(campo)
+                if actual is None or rango < actual[0]:
+                    mejores[campo] = (rango, [columna])
+                elif rango == actual[0]:
+                    actual[1].append(columna)
+
+        return {campo: (mejores[campo][1], exactas.get(campo, []))
+                for campo in self.campos if campo in mejores}
+
+    def resolver(self, columnas) -> dict:
+        """
+        Resuelve {campo: columna o None} recorriendo los encabezados una vez.
+        Lanza ColumnaAmbiguaError si dos columnas empatan en la mejor coincidencia.
+        """
+        encontradas = self.candidatas(columnas)
+        resultado = {}
+        for campo in self.campos:
+            if campo not in encontradas:
+                resultado[campo] = None
+                continue
+            mejores, _ = encontradas[campo]
+            if len(mejores) > 1:
+                raise ColumnaAmbiguaError(
+                    f"Columna ambigua para '{campo}': {', '.join(map(str, mejores))}")
+            resultado[campo] = mejores[0]
+        return resultado
+
+
+_matchers = {}
+_cache_distribuciones = {}
+
+
+def obtener_matcher(campos=None) -> MatcherColumnas:
+    """Retorna (y guarda) el matcher compilado para esos campos."""
+    clave = tuple(campos) if campos else None
+    if clave not in _matchers:
+        _matchers[clave] = MatcherColumnas(campos)
+    return _matchers[clave]
+
+
+def resolver_columnas(columnas, campos=None, archivo=None, hoja=None) -> dict:
+    """
+    Resuelve las columnas de una hoja usando el registro.
+
+    Args:
+        columnas: Encabezados de la hoja
+        campos: Campos del registro a resolver (por defecto todos)
+        archivo, hoja: Identifican la hoja para la caché de distribuciones
+
+    Returns:
+        dict {campo: columna o None}
+    """
+    clave = (str(archivo) if archivo else None, hoja, tuple(map(str, columnas)),
+             tuple(campos) if campos else None)
+    if clave not in _cache_distribuciones:
+        _cache_distribuciones[clave] = obtener_matcher(campos).resolver(columnas)
+    return dict(_cache_distribuciones[clave])
+
+
+def nombres_unificados(columnas, archivo=None, hoja=None) -> dict:
+    """
+    Retorna {columna original: nombre en el Excel unificado} para renombrar.
+
+    Además de la mejor columna de cada campo se renombran todas las que
+    coinciden con un patrón exacto (p.ej. 'Unnamed: 2' y 'Unnamed: 3' a
+    TIPO_REGISTRO), como el antiguo diccionario de unificar_excel; si un
+    campo es ambiguo se toma la primera de las empatadas (ver columnas_ambiguas).
+    """
+    clave = ("unificados", str(archivo) if archivo else None, hoja, tuple(map(str, columnas)))
+    if clave not in _cache_distribuciones:
+        nombres = {}
+        for campo, (mejores, exactas) in obtener_matcher().candidatas(columnas).items():
+            nombre = REGISTRO_COLUMNAS[campo][1]
+            for columna in [mejores[0]] + exactas:
+                nombres.setdefault(columna, nombre)
+        _cache_distribuciones[clave] = nombres
+    return dict(_cache_distribuciones[clave])
+
+
+def columnas_ambiguas(columnas, campos=None) -> dict:
+    """{campo: [columnas empatadas]} de los campos que no se pueden resolver sin ambigüedad."""
+    return {campo: mejores
+            for campo, (mejores, _) in obtener_matcher(campos).candidatas(columnas).items()
+            if len(mejores) > 1}
@@ -0,0 +1,239 @@
+"""
+Sesiones de conteo físico: conciliación de lecturas de la lectora contra la BD.
+
+Cada lectura (lectora tipo teclado en la UI o volcado de archivo) se busca en
+un diccionario de `codigo_completo` cargado una vez al abrir la sesión, así
+que cuesta O(1). Si el código no está tal cual se prueban las variantes del
+sufijo de SOBRANTE: con "S" de más (etiqueta de sobrante de un bien que figura
+como SIGA) o con la "S" perdida.
+
+Los contadores por oficina se actualizan en cada lectura, sin recalcular:
+- esperados: bienes de la oficina según la BD
+- encontrados: bienes de la oficina leídos en la oficina
+- faltantes: esperados que todavía no se leyeron en ninguna parte
+- en_otra_oficina: bienes de la oficina leídos en otra oficina
+- mal_ubicados: bienes de otras oficinas leídos en esta
+- desconocidos: códigos leídos en esta oficina que no existen en la BD
+
+Las lecturas se guardan en SQLite (tablas sesiones_conteo y escaneos) por
+lotes, para aguantar ráfagas de cientos de lecturas por minuto; al reabrir
+una sesión se reproducen y los contadores quedan igual que antes.
+"""
+
+import csv
+import time
+from datetime import datetime
+
+from db.database import create_connection, create_table
+
+SIN_UBICACION = "(SIN UBICACIÓN)"
+LOTE_GUARDADO = 100      # lecturas pendientes antes de escribir en la BD
+INTERVALO_GUARDADO = 1.0  # segundos máximos sin escribir
+
+ENCONTRADO = "ENCONTRADO"
+MAL_UBICADO = "MAL UBICADO"
+DESCONOCIDO = "DESCONOCIDO"
+REPETIDO = "REPETIDO"
+
+CONTADORES = ("esperados", "encontrados", "faltantes", "en_otra_oficina", "mal_ubicados", "desconocidos")
+
+
+def normalizar_codigo(codigo):
+    """Quita espacios y pasa a mayúsculas lo que envía la lectora."""
+    return "".join(str(codigo).split()).upper()
+
+
+class SesionConteo:
+    """Sesión de conteo con contadores incrementales y guardado por lotes."""
+
+    def __init__(self, sesion_id, nombre, conn):
+        self.id = sesion_id
+        self.nombre = nombre
+        self.conn = conn
+        self.bienes = {}        # código normalizado -> (codigo_completo, oficina, detalle_bien, tipo_registro)
+        self.contadores = {}    # oficina -> {contador: n}
+        self.ubicacion_de = {}  # codigo_completo -> oficina donde se leyó por última vez
+        self.desconocidos = set()  # (código normalizado, oficina) ya contados
+        self.total_lecturas = 0
+        self._pendientes = []
+        self._ultimo_guardado = time.monotonic()
+        self._cargar_bienes()
+
+    # ======== Apertura ========
+    @classmethod
+    def nueva(cls, nombre=None):
+        create_table()
+        conn = create_connection()
+        nombre = nombre or f"Conteo {datetime.now():%Y-%m-%d %H:%M}"
+        cursor = conn.execute("INSERT INTO sesiones_conteo (nombre, inicio) VALUES (?, ?)",
+                              (nombre, datetime.now().isoformat(timespec="seconds")))
+        conn.commit()
+        return cls(cursor.lastrowid, nombre, conn)
+
+    @classmethod
+    def abrir(cls, sesion_id):
+        """Reabre una sesión guardada reproduciendo sus lecturas."""
+        create_table()
+        conn = create_connection()
+        row = conn.execute("SELECT nombre FROM sesiones_conteo WHERE id = ?", (sesion_id,)).fetchone()
+        if row is None:
+            conn.close()
+            raise ValueError(f"No existe la sesión de conteo {sesion_id}")
+        sesion = cls(sesion_id, row[0], conn)
+        for codigo_leido, ubicacion in conn.execute(
+                "SELECT codigo_leido, ubicacion FROM escaneos WHERE sesion_id = ? ORDER BY id", (sesion_id,)):
+            sesion._aplicar_lectura(codigo_leido, ubicacion)
+        return sesion
+
+    def _cargar_bienes(self):
+        for codigo, oficina, detalle, tipo in self.conn.execute(
+                "SELECT codigo_completo, oficina, detalle_bien, tipo_registro FROM bienes"):
+            if not codigo:
+                continue
+            oficina = oficina or SIN_UBICACION
+            self.bienes[normalizar_codigo(codigo)] = (codigo, oficina, detalle, tipo)
+            self._contador(oficina)["esperados"] += 1
+            self._contador(oficina)["faltantes"] += 1
+
+    def _contador(self, oficina):
+        contador = self.contadores.get(oficina)
+        if contador is None:
+            contador = self.contadores[oficina] = dict.fromkeys(CONTADORES, 0)
+        return contador
+
+    # ======== Lecturas ========
+    def resolver(self, codigo_leido):
+        """
+        Retorna (bien, variante) para un código leído: variante es None si
+        coincidió tal cual, "sin S" o "con S" si coincidió una variante de
+        SOBRANTE, y bien es None si no existe.
+        """
+        codigo = normalizar_codigo(codigo_leido)
+        bien = self.bienes.get(codigo)
+        if bien:
+            return bien, None
+        if codigo.endswith("S") and codigo[:-1] in self.bienes:
+            return self.bienes[codigo[:-1]], "sin S"
+        if codigo + "S" in self.bienes:
+            return self.bienes[codigo + "S"], "con S"
+        return None, None
+
+    def registrar(self, codigo_leido, ubicacion=None):
+        """
+        Procesa una lectura hecha en `ubicacion` (oficina donde se está
+        contando; si es None se asume la oficina del bien). Retorna un dict
+        con el resultado, el bien y las oficinas cuyos contadores cambiaron.
+        """
+        lectura = self._aplicar_lectura(codigo_leido, ubicacion)
+        self._pendientes.append((self.id, str(codigo_leido).strip(), lectura["codigo_completo"],
+                                 lectura["ubicacion"], lectura["resultado"],
+                                 datetime.now().isoformat(timespec="seconds")))
+        if (len(self._pendientes) >= LOTE_GUARDADO
+                or time.monotonic() - self._ultimo_guardado >= INTERVALO_GUARDADO):
+            self.guardar()
+        return lectura
+
+    def _aplicar_lectura(self, codigo_leido, ubicacion):
+        self.total_lecturas += 1
+        bien, variante = self.resolver(codigo_leido)
+        if bien is None:
+            ubicacion = ubicacion or SIN_UBICACION
+            clave = (normalizar_codigo(codigo_leido), ubicacion)
+            if clave in self.desconocidos:
+                return {"resultado": REPETIDO, "codigo_completo": None, "ubicacion": ubicacion,
+                        "variante": None, "bien": None, "afectadas": set()}
+            self.desconocidos.add(clave)
+            self._contador(ubicacion)["desconocidos"] += 1
+            return {"resultado": DESCONOCIDO, "codigo_completo": None, "ubicacion": ubicacion,
+                    "variante": None, "bien": None, "afectadas": {ubicacion}}
+
+        codigo, oficina = bien[0], bien[1]
+        ubicacion = ubicacion or oficina
+        previa = self.ubicacion_de.get(codigo)
+        afectadas = {oficina, ubicacion}
+        if previa == ubicacion:
+            resultado = REPETIDO
+            afectadas = set()
+        else:
+            if previa is not None:
+                # Se volvió a leer en otra oficina: se mueve, no se cuenta dos veces
+                self._mover(oficina, previa, -1)
+                afectadas.add(previa)
+            self._mover(oficina, ubicacion, +1)
+            self.ubicacion_de[codigo] = ubicacion
+            resultado = ENCONTRADO if ubicacion == oficina else MAL_UBICADO
+        return {"resultado": resultado, "codigo_completo": codigo, "ubicacion": ubicacion,
+                "variante": variante, "bien": bien, "afectadas": afectadas}
+
+    def _mover(self, oficina, ubicacion, signo):
+        """Suma (o resta) un bien de `oficina` leído en `ubicacion`."""
+        propio = self._contador(oficina)
+        propio["faltantes"] -= signo
+        if ubicacion == oficina:
+            propio["encontrados"] += signo
+        else:
+            propio["en_otra_oficina"] += signo
+            self._contador(ubicacion)["mal_ubicados"] += signo
+
+    def importar_archivo(self, ruta, ubicacion=None):
+        """
+        Carga el volcado de una lectora: un código por línea, o CSV/TSV con el
+        código en la primera columna y opcionalmente la oficina en la segunda.
+        Retorna {resultado: cantidad}.
+        """
+        resultados = {}
+        with open(ruta, encoding="utf-8-sig", newline="") as f:
+            muestra = f.read(4096)
+            f.seek(0)
+            try:
+                dialecto = csv.Sniffer().sniff(muestra, delimiters=",;\t")
+            except csv.Error:
+                dialecto = csv.excel
+            for fila in csv.reader(f, dialecto):
+                if not fila or not fila[0].strip() or fila[0].startswith("#"):
+                    continue
+                oficina = fila[1].strip() if len(fila) > 1 and fila[1].strip() else ubicacion
+                resultado = self.registrar(fila[0], oficina)["resultado"]
+                resultados[resultado] = resultados.get(resultado, 0) + 1
+        self.guardar()
+        return resultados
+
+    # ======== Persistencia ========
+    def guardar(self):
+        """Escribe en la BD las lecturas pendientes en una sola transacción."""
+        if self._pendientes:
+            with self.conn:
+                self.conn.executemany(
+                    """INSERT INTO escaneos (sesion_id, codigo_leido, codigo_completo, ubicacion, resultado, fecha)
+                       VALUES (?, ?, ?, ?, ?, ?)""", self._pendientes)
+            self._pendientes = []
+        self._ultimo_guardado = time.monotonic()
+
+    def cerrar(self):
+        self.guardar()
+        with self.conn:
+            self.conn.execute("UPDATE sesiones_conteo SET fin = ? WHERE id = ?",
+                              (datetime.now().isoformat(timespec="seconds"), self.id))
+        self.conn.close()
+
+    # ======== Reportes ========
+    def faltantes(self, oficina):
+        """Bienes de la oficina que todavía no se leyeron (se calcula a pedido)."""
+        return [bien for bien in self.bienes.values()
+                if bien[1] == oficina and bien[0] not in self.ubicacion_de]
+
+    def resumen(self):
+        """[(oficina, contadores)] ordenado por oficina."""
+        return sorted(self.contadores.items())
+
+
+def listar_sesiones():
+    """[(id, nombre, inicio, fin, lecturas)] de la más reciente a la más antigua."""
+    create_table()
+    conn = create_connection()
+    rows = conn.execute(
+        """SELECT s.id, s.nombre, s.inicio, s.fin, COUNT(e.id)
+           FROM sesiones_conteo s LEFT JOIN escaneos e ON e.sesion_id = s.id
+           GROUP BY s.id ORDER BY s.id DESC""").fetchall()
+    conn.close()
+    return rows
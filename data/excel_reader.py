@@ -0,0 +1,187 @@
+"""
+Lector de Excel con proyección de columnas.
+
+Las hojas del SIGA tienen decenas de columnas, pero los scripts de carga solo
+usan 6-8 de ellas. En lugar de convertir la hoja completa con pandas, este
+módulo lee primero la fila de encabezado, resuelve las columnas necesarias con
+el registro de `data.columnas` y luego recorre las filas en modo
+read-only de openpyxl convirtiendo únicamente esas celdas.
+
+El resultado imita a `pd.read_excel(..., dtype=str)`: nombres de columna
+normalizados (strip + minúsculas), valores como texto y NaN en celdas vacías.
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+from data.columnas import columnas_ambiguas, resolver_columnas
+
+# Valores que pandas interpreta como NaN por defecto al leer Excel
+_NA_VALUES = {
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan',
+    '1.#IND', '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a',
+    'nan', 'null',
+}
+
+
+def _convertir_celda(valor):
+    """Convierte una celda igual que pandas con dtype=str (None -> NaN)."""
+    if valor is None:
+        return np.nan
+    if isinstance(valor, bool):
+        return str(valor)
+    if isinstance(valor, float):
+        # Valores en caché como NaN o inf (p.ej. =NA() o errores): int() fallaría
+        if math.isnan(valor):
+            return np.nan
+        if not math.isfinite(valor):
+            return str(valor)
+        entero = int(valor)
+        return str(entero) if entero == valor else str(valor)
+    texto = str(valor)
+    if texto in _NA_VALUES:
+        return np.nan
+    return texto
+
+
+def _nombres_columnas(fila_encabezado):
+    """Genera los nombres de columna como pandas ('Unnamed: N', duplicados '.1')."""
+    nombres = []
+    vistos = {}
+    for i, valor in enumerate(fila_encabezado):
+        if valor is None or str(valor).strip() == "":
+            nombre = f"Unnamed: {i}"
+        elif isinstance(valor, float) and valor == int(valor):
+            nombre = str(int(valor))
+        else:
+            nombre = str(valor)
+
+        if nombre in vistos:
+            vistos[nombre] += 1
+            nombre = f"{nombre}.{vistos[nombre]}"
+        else:
+            vistos[nombre] = 0
+        nombres.append(nombre)
+
+    return [n.strip().lower() for n in nombres]
+
+
+def leer_encabezados(file_path, sheet_name, header=0):
+    """
+    Lee solo la fila de encabezado de una hoja.
+    Retorna la lista de nombres normalizados (strip + minúsculas).
+    """
+    wb = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        ws = wb[sheet_name]
+        return _leer_fila_encabezado(ws, header)
+    finally:
+        wb.close()
+
+
+def _leer_fila_encabezado(ws, header):
+    if header is None:
+        # Sin encabezado pandas numera las columnas 0..n-1
+        ancho = max((len(f) for f in ws.iter_rows(min_row=1, max_row=1, values_only=True)), default=0)
+        return [str(i) for i in range(ancho)]
+
+    fila = next(ws.iter_rows(min_row=header + 1, max_row=header + 1, values_only=True), ())
+    fila = list(fila)
+    # Quitar celdas vacías al final (igual que pandas)
+    while fila and (fila[-1] is None or fila[-1] == ""):
+        fila.pop()
+    return _nombres_columnas(fila)
+
+
+def _leer_hoja(ws, file_path, sheet_name, header, campos, opcionales=()):
+    """Lee de una hoja ya abierta las columnas resueltas para `campos` (y `opcionales`)."""
+    ws.reset_dimensions()
+
+    columnas = _leer_fila_encabezado(ws, header)
+    mapeo = resolver_columnas(columnas, campos, archivo=file_path, hoja=sheet_name)
+    if opcionales:
+        ambiguas = columnas_ambiguas(columnas, opcionales)
+        resolubles = [campo for campo in opcionales if campo not in ambiguas]
+        if resolubles:
+            mapeo.update(resolver_columnas(columnas, resolubles, archivo=file_path, hoja=sheet_name))
+        mapeo.update(dict.fromkeys(ambiguas))
+
+    # Columnas a proyectar, sin repetir y en el orden de la hoja
+    usecols = sorted({columnas.index(c) for c in mapeo.values() if c is not None})
+    nombres = [columnas[i] for i in usecols]
+
+    datos = {nombre: [] for nombre in nombres}
+    primera_fila = 1 if header is None else header + 2
+    ultima_con_datos = 0
+    total = 0
+    for fila in ws.iter_rows(min_row=primera_fila, values_only=True):
+        total += 1
+        for i, nombre in zip(usecols, nombres):
+            datos[nombre].append(_convertir_celda(fila[i]) if i < len(fila) else np.nan)
+        # Como pandas, una fila cuenta como vacía solo si lo están todas sus
+        # celdas, también las de columnas que no se leen
+        if any(valor is not None and valor != "" for valor in fila):
+            ultima_con_datos = total
+
+    # Descartar filas vacías al final de la hoja (las intermedias se
+    # conservan, igual que en pd.read_excel)
+    for nombre in nombres:
+        del datos[nombre][ultima_con_datos:]
+
+    df = pd.DataFrame(datos, columns=nombres, dtype=object)
+    return df, mapeo
+
+
+def leer_excel_columnas(file_path, sheet_name, header, campos, opcionales=()):
+    """
+    Lee de una hoja únicamente las columnas detectadas.
+
+    Args:
+        file_path: Ruta del archivo Excel
+        sheet_name: Nombre de la hoja
+        header: Fila (0-indexada) del encabezado, o None si no hay
+        campos: Campos del registro de columnas a leer
+        opcionales: Campos que se leen si se pueden resolver; si son
+            ambiguos quedan en None en lugar de lanzar el error
+
+    Returns:
+        (DataFrame con solo las columnas detectadas, dict de mapeo)
+
+    Lanza ColumnaAmbiguaError si el encabezado es ambiguo para algún campo.
+    """
+    wb = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        return _leer_hoja(wb[sheet_name], file_path, sheet_name, header, campos, opcionales)
+    finally:
+        wb.close()
+
+
+def leer_hojas_columnas(file_path, hojas, campos, opcionales=()):
+    """
+    Lee varias hojas de un mismo libro abriéndolo una sola vez.
+
+    Args:
+        file_path: Ruta del archivo Excel
+        hojas: Lista de (sheet_name, header)
+        campos: Campos del registro de columnas a leer
+        opcionales: Como en leer_excel_columnas
+
+    Yields:
+        (sheet_name, DataFrame, mapeo) o (sheet_name, None, excepción) si la
+        hoja no existe o su encabezado es ambiguo
+    """
+    wb = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        for sheet_name, header in hojas:
+            try:
+                df, mapeo = _leer_hoja(wb[sheet_name], file_path, sheet_name, header, campos,
+                                       opcionales)
+            except (KeyError, ValueError) as e:
+                yield sheet_name, None, e
+                continue
+            yield sheet_name, df, mapeo
+    finally:
+        wb.close()
@@ -0,0 +1,143 @@
+"""
+Importación por lotes de los anexos SIGA / SOBRANTES.
+
+Reemplaza las llamadas comentadas a `load_excel_to_db` de main.py: cada
+entrada del manifiesto indica archivo, hoja, fila de encabezado y tipo de
+registro. Cada libro se abre una sola vez, todas sus hojas se insertan con la
+misma conexión en una sola transacción y se genera un único reporte
+consolidado con la columna 'origen_carga' (archivo | hoja), que se escribe
+fila por fila a medida que se inserta (data/reporte_carga.py).
+
+Uso:
+    python -m data.importar_anexos                 # manifiesto ANEXOS
+    python -m data.importar_anexos manifiesto.json # lista de entradas JSON
+"""
+
+import json
+import os
+import sys
+
+import pandas as pd
+
+from db.database import create_connection, create_table
+from data.excel_reader import leer_hojas_columnas
+from data.load_excel import (CAMPOS, CAMPOS_SOLO_REPORTE, REPORTE_CONSOLIDADO, _insertar_hoja,
+                             _mostrar_mapeo, _preparar_hoja, _reportar_duplicados)
+from data.reporte_carga import HOJA_RESUMEN_ORIGEN, ReporteCarga
+
+
+# Manifiesto por defecto: anexos 01-04 del inventario 2024
+ANEXOS = [
+    # anexo 01
+    {"archivo": "ANEXOS 01 - BIENES Y MUEBLES EN USO - SIGA TOTAL 2024.xlsx",
+     "hoja": "1 MUEBLES", "header": 5, "tipo_registro": "SIGA"},
+    {"archivo": "ANEXOS 01 - BIENES Y MUEBLES EN USO - SIGA TOTAL 2024.xlsx",
+     "hoja": "2 MUEBLES OK ", "header": 3, "tipo_registro": "SIGA"},
+    # anexo 02
+    {"archivo": "ANEXOS 02 - MAQUINARIA Y EQUIPO  EN USO - SIGA TOTAL 2024.xlsx",
+     "hoja": "2 MAQ.", "header": 5, "tipo_registro": "SIGA"},
+    {"archivo": "ANEXOS 02 - MAQUINARIA Y EQUIPO  EN USO - SIGA TOTAL 2024.xlsx",
+     "hoja": "3. MAQ.", "header": 3, "tipo_registro": "SIGA"},
+    # anexo 03
+    {"archivo": "ANEXOS 03 - MUEBLES EN USO - SOBRANTES TOTAL 2024.xlsx",
+     "hoja": "TOTAL MUBLS", "header": 5, "tipo_registro": "SOBRANTE"},
+    {"archivo": "ANEXOS 03 - MUEBLES EN USO - SOBRANTES TOTAL 2024.xlsx",
+     "hoja": "MUEBLES TOT", "header": 0, "tipo_registro": "SOBRANTE"},
+    # anexo 04
+    {"archivo": "ANEXOS 04- MAQUINARIA - SOBRANTES TOTAL 2024 a.xlsx",
+     "hoja": "MAQUI.SOBRANTES", "header": 5, "tipo_registro": "SOBRANTE"},
+    {"archivo": "ANEXOS 04- MAQUINARIA - SOBRANTES TOTAL 2024 a.xlsx",
+     "hoja": "SOBRNT.", "header": 0, "tipo_registro": "SOBRANTE"},
+]
+
+
+def cargar_manifiesto(ruta):
+    """Lee un manifiesto JSON (lista de objetos archivo/hoja/header/tipo_registro)."""
+    with open(ruta, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def importar_manifiesto(manifiesto=ANEXOS, report_file_path=REPORTE_CONSOLIDADO):
+    """
+    Importa todas las hojas del manifiesto en una sola transacción.
+    `report_file_path` puede ser .xlsx, .csv o .parquet, o None para no generar reporte.
+
+    Returns:
+        DataFrame con el resumen por origen (archivo | hoja)
+    """
+    create_table()
+
+    # Agrupar hojas por archivo respetando el orden del manifiesto
+    por_archivo = {}
+    tipos = {}
+    for entrada in manifiesto:
+        archivo, hoja = entrada["archivo"], entrada["hoja"]
+        por_archivo.setdefault(archivo, []).append((hoja, entrada.get("header")))
+        tipos[(archivo, hoja)] = entrada.get("tipo_registro")
+
+    reporte = ReporteCarga(report_file_path) if report_file_path else None
+    resumen = []
+
+    conn = create_connection()
+    cursor = conn.cursor()
+    try:
+        for archivo, hojas in por_archivo.items():
+            if not os.path.exists(archivo):
+                print(f"⚠️ Archivo no encontrado: {archivo}")
+                continue
+
+            print(f"\n📁 {archivo}")
+            for hoja, df, mapeo in leer_hojas_columnas(archivo, hojas, CAMPOS, CAMPOS_SOLO_REPORTE):
+                origen = f"{archivo} | {hoja}"
+                print(f"\n📄 Hoja: {hoja}")
+                if df is None:
+                    print(f"❌ No se pudo leer la hoja: {mapeo}")
+                    continue
+
+                tipo_registro = tipos[(archivo, hoja)]
+                if not _mostrar_mapeo(mapeo, tipo_registro):
+                    print("❌ No se encontraron las columnas esperadas.")
+                    continue
+
+                filas = len(df)
+                df, dup, dup_resumen = _preparar_hoja(df, mapeo, tipo_registro)
+                extra = [("origen_carga", origen)]
+                count, ignorados, actualizados = _insertar_hoja(cursor, df, mapeo, hoja, tipo_registro,
+                                                                reporte=reporte, extra=extra)
+                print(f"✅ {count} registros insertados desde '{hoja}'"
+                      + (f", {actualizados} actualizados" if actualizados else ""))
+
+                if reporte is not None:
+                    _reportar_duplicados(reporte, dup, dup_resumen, mapeo, extra)
+                resumen.append({
+                    "origen_carga": origen,
+                    "tipo_registro": tipo_registro,
+                    "filas_leidas": filas,
+                    "insertados": count,
+                    "actualizados": actualizados,
+                    "no_considerados": ignorados,
+                    "filas_duplicadas": len(dup),
+                })
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        if reporte is not None:
+            reporte.descartar()
+        raise
+    finally:
+        conn.close()
+
+    resumen_df = pd.DataFrame(resumen)
+    if reporte is not None:
+        with reporte:
+            reporte.tabla(HOJA_RESUMEN_ORIGEN, resumen_df)
+            reporte.cerrar()
+
+    total = int(resumen_df["insertados"].sum()) if not resumen_df.empty else 0
+    print(f"\n✅ {total} registros insertados desde {len(resumen)} hojas.")
+    return resumen_df
+
+
+if __name__ == "__main__":
+    manifiesto = cargar_manifiesto(sys.argv[1]) if len(sys.argv) > 1 else ANEXOS
+    importar_manifiesto(manifiesto)
@@ -1,53 +1,92 @@
 import pandas as pd
-import os
-from db.database import create_connection, create_table
+import time
+from db.database import create_connection, create_table, huella_archivo, guardar_huella
+from data.columnas import ColumnaAmbiguaError
+from data.excel_reader import leer_excel_columnas, leer_encabezados
+from data.reporte_carga import (HOJA_DUPLICADOS, HOJA_NO_CONSIDERADOS, HOJA_RESUMEN_DUPLICADOS,
+                                HOJA_VALIDOS, ReporteCarga)
 
 
-def load_excel_to_db(file_path, sheet_name="2 MAQ.", header=None):
-    create_table()
-    conn = create_connection()
-    cursor = conn.cursor()
-
-    # Cargar Excel (fila 6 como encabezado y todo como texto)
-    df = pd.read_excel(file_path, sheet_name=sheet_name,
-                       header=header, dtype=str)
-    df.columns = [str(c).strip().lower() for c in df.columns]
-
-    print("Columnas detectadas:", df.columns.tolist())
-    print("Filas totales que pandas está leyendo:", len(df))
-
-    # Detectar columnas principales (soporta formato antiguo y Excel unificado)
-    col_pat = next(
-        (c for c in df.columns if "codigo del bien" in c or "patrimonial" in c or c == "codigo_bien"), None)
-    col_int = next(
-        (c for c in df.columns if "codigo interno" in c or "codigo inter" in c or c == "codigo_interno"), None)
-    col_det = next(
-        (c for c in df.columns if "detalle del   bien" in c or c == "detalle_bien"), None)
-    col_desc = next(
-        (c for c in df.columns if "caracteristicas" in c or "descripcion" in c), None)
-    col_ofi = next((c for c in df.columns if "oficina" in c), None)
-    # Para el Excel unificado, usamos la columna 'tipo_registro' como prioridad
-    col_reg = next((c for c in df.columns if c == "tipo_registro"), 
-              next((c for c in df.columns if "unnamed: 2" in c or "tipo de registro" in c or "unnamed: 3" in c or c == "origen"), None))
-    col_est = next((c for c in df.columns if "estad" in c), None)
-    col_resp = next((c for c in df.columns if "responsable" in c), None)
-
-    # Mostrar columnas detectadas
+# Campos que se leen del Excel (ver data/columnas.py)
+CAMPOS = ("codigo_patrimonial", "codigo_interno", "detalle_bien", "descripcion",
+          "oficina", "tipo_registro", "estado", "responsable")
+
+# Campos que solo van al reporte: con 'item' se ubica la fila en la hoja de
+# origen. Se leen si existen y no son ambiguos.
+CAMPOS_SOLO_REPORTE = ("item", "observacion")
+
+REPORTE_CONSOLIDADO = "reportes/reporte_consolidado.xlsx"
+
+# Columnas del reporte: los campos con su nombre normalizado (cada hoja de
+# origen puede tener otro encabezado) más la clave de duplicados
+CAMPOS_REPORTE = ("item",) + CAMPOS + ("observacion",)
+COLUMNAS_REPORTE = CAMPOS_REPORTE + ("key",)
+
+# Columnas que se corrigen al reimportar un bien que ya existe
+_ACTUALIZABLES = ("codigo_patrimonial", "codigo_interno", "detalle_bien", "descripcion", "oficina",
+                  "tipo_registro", "estado", "responsable")
+
+# Un bien ya cargado se actualiza solo si viene de la misma fuente (hoja) y
+# cambió algún dato; así los triggers de auditoría registran la corrección y
+# un mismo código en otra fuente sigue sin pisar al primero.
+_UPSERT = f"""
+    INSERT INTO bienes
+    (
+        codigo_patrimonial,
+        codigo_interno,
+        detalle_bien,
+        descripcion,
+        oficina,
+        codigo_completo,
+        fuente,
+        tipo_registro,
+        estado,
+        responsable
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (codigo_completo) DO UPDATE SET
+        {", ".join(f"{c} = excluded.{c}" for c in _ACTUALIZABLES)}
+    WHERE bienes.fuente IS excluded.fuente
+      AND ({" OR ".join(f"bienes.{c} IS NOT excluded.{c}" for c in _ACTUALIZABLES)})
+"""
+
+
+def _columnas_origen(columnas, extra=()):
+    return list(COLUMNAS_REPORTE) + [nombre for nombre, _ in extra]
+
+
+def _tabla_reporte(df, columnas, extra=()):
+    """Copia de `df` con las columnas del reporte (más `extra`: [(nombre, valor)])."""
+    datos = {campo: df[columnas[campo]] if columnas.get(campo) else None for campo in CAMPOS_REPORTE}
+    datos["key"] = df["key"]
+    for nombre, valor in extra:
+        datos[nombre] = valor
+    return pd.DataFrame(datos, index=df.index)
+
+
+def _mostrar_mapeo(columnas, tipo_registro=None):
+    """
+    Muestra el mapeo de columnas y verifica que estén las obligatorias.
+    Si se fija `tipo_registro`, la columna de tipo deja de ser obligatoria.
+    """
     print(f"📋 Mapeo de columnas:")
-    print(f"   codigo_patrimonial -> {col_pat}")
-    print(f"   codigo_interno     -> {col_int}")
-    print(f"   detalle_bien       -> {col_det}")
-    print(f"   descripcion        -> {col_desc}")
-    print(f"   oficina            -> {col_ofi}")
-    print(f"   tipo_registro      -> {col_reg}")
-    print(f"   estado             -> {col_est}")
-    print(f"   responsable        -> {col_resp}")
-
-    if not all([col_pat, col_int, col_det, col_desc, col_ofi, col_reg]):
-        print("❌ No se encontraron las columnas esperadas.")
-        print("Columnas detectadas:", df.columns.tolist())
-        print("Filas totales que pandas está leyendo:", len(df))
-        return
+    for campo in CAMPOS:
+        print(f"   {campo:<18} -> {columnas[campo]}")
+
+    obligatorias = ["codigo_patrimonial", "codigo_interno", "detalle_bien", "descripcion", "oficina"]
+    if not tipo_registro:
+        obligatorias.append("tipo_registro")
+    return all(columnas[campo] for campo in obligatorias)
+
+
+def _preparar_hoja(df, columnas, tipo_registro=None):
+    """
+    Limpia las filas vacías o de firma/total, normaliza el código interno y
+    detecta duplicados. Retorna (df, duplicados, resumen de duplicados).
+    """
+    col_pat = columnas["codigo_patrimonial"]
+    col_int = columnas["codigo_interno"]
+    col_reg = columnas["tipo_registro"]
 
     # Limpiar filas vacías o de firma/total
     df = df.dropna(subset=[col_pat, col_int], how="all")
@@ -61,7 +100,10 @@ def load_excel_to_db(file_path, sheet_name="2 MAQ.", header=None):
     df["key"] = df[col_pat].str.strip() + df[col_int].str.strip()
 
     # Diferenciar sobrantes en la clave de duplicados para que no se mezclen con SIGA
-    is_sobrante = df[col_reg].astype(str).str.lower().str.contains("sobrante", na=False)
+    if tipo_registro:
+        is_sobrante = pd.Series("sobrante" in tipo_registro.lower(), index=df.index)
+    else:
+        is_sobrante = df[col_reg].astype(str).str.lower().str.contains("sobrante", na=False)
     df.loc[is_sobrante, "key"] = df.loc[is_sobrante, "key"] + "S"
 
     duplicados = df[df.duplicated("key", keep=False)]
@@ -76,37 +118,65 @@ def load_excel_to_db(file_path, sheet_name="2 MAQ.", header=None):
     print("\nTotal de códigos duplicados únicos:", solo_dup.shape[0])
     print("Total de filas que están en grupos duplicados:", solo_dup["veces"].sum())
 
-    if not os.path.exists('reportes'):
-        os.makedirs('reportes')
+    return df, duplicados, solo_dup
+
+
+def _insertar_hoja(cursor, df, columnas, fuente, tipo_registro=None, reporte=None, extra=()):
+    """
+    Inserta las filas de una hoja ya preparada (sin hacer commit). Los bienes
+    que ya existen y vienen de la misma fuente se actualizan si cambió algún
+    dato (ver _UPSERT). Si se indica `reporte` (ReporteCarga), cada fila
+    insertada, actualizada o no considerada se escribe ahí en el momento,
+    con las columnas `extra` ([(nombre, valor)]).
+    Retorna (insertados, cantidad de no considerados, actualizados).
+    """
+    col_pat = columnas["codigo_patrimonial"]
+    col_int = columnas["codigo_interno"]
+    col_det = columnas["detalle_bien"]
+    col_desc = columnas["descripcion"]
+    col_ofi = columnas["oficina"]
+    col_reg = columnas["tipo_registro"]
+    col_est = columnas["estado"]
+    col_resp = columnas["responsable"]
 
-    valid_data = []
-    ignored_data = []
+    columnas_validos = _columnas_origen(columnas, extra) + ["codigo_completo_generado"]
+    columnas_ignorados = _columnas_origen(columnas, extra)
+    valores_extra = [valor for _, valor in extra]
+
+    def valores_reporte(row):
+        return ([row.get(columnas[campo]) if columnas.get(campo) else None for campo in CAMPOS_REPORTE]
+                + [row.get("key")] + valores_extra)
 
     count = 0
+    actualizados = 0
+    ignorados = 0
+    existentes = {fila[0] for fila in cursor.execute("SELECT codigo_completo FROM bienes")}
+    escritos = set()
     for _, row in df.iterrows():
         codigo_patrimonial = str(row.get(col_pat, "")).strip()
         codigo_interno = str(row.get(col_int, "")).strip()
         detalle_bien = str(row.get(col_det, "")).strip()
         descripcion = str(row.get(col_desc, "")).strip()
         oficina = str(row.get(col_ofi, "")).strip()
-        tipo_registro = str(row.get(col_reg, "")).strip()
+        # Un tipo fijo (p.ej. anexos SIGA/SOBRANTE) tiene prioridad sobre la columna
+        tipo_registro_fila = tipo_registro or str(row.get(col_reg, "")).strip()
         responsable = str(row.get(col_resp, "")).strip()
-        
+
         # Normalizar tipo_registro para Excel unificado y formato antiguo
-        tipo_raw = tipo_registro.lower()
+        tipo_raw = tipo_registro_fila.lower()
         if "sobrante" in tipo_raw:
-            tipo_registro = "SOBRANTE"
+            tipo_registro_fila = "SOBRANTE"
         elif "siga" in tipo_raw:
-            tipo_registro = "SIGA"
+            tipo_registro_fila = "SIGA"
         elif "pecosa" in tipo_raw:
-            tipo_registro = "PECOSAS"
+            tipo_registro_fila = "PECOSAS"
         elif "asignacion" in tipo_raw:
-            tipo_registro = "ASIGNACIONES"
+            tipo_registro_fila = "ASIGNACIONES"
         elif "afectacion" in tipo_raw:
-            tipo_registro = "AFECTACION"
+            tipo_registro_fila = "AFECTACION"
         else:
-            tipo_registro = tipo_registro.upper()  # Mantener como está
-        
+            tipo_registro_fila = tipo_registro_fila.upper()  # Mantener como está
+
         # Procesar estado
         raw_estado = str(row.get(col_est, "")).strip().upper()
         estado_map = {
@@ -117,7 +187,7 @@ def load_excel_to_db(file_path, sheet_name="2 MAQ.", header=None):
             'REGULAR': 'REGULAR',
             'MALO': 'MALO'
         }
-        
+
         estado = estado_map.get(raw_estado, 'BUENO')
         if not raw_estado: # Si estaba vacio
              estado = 'BUENO'
@@ -130,67 +200,118 @@ def load_excel_to_db(file_path, sheet_name="2 MAQ.", header=None):
 
         if codigo_patrimonial and codigo_interno:
             codigo_completo = f"{codigo_patrimonial}{codigo_interno}"
-            
+
             # Validación Siga vs Sobrante
-            if tipo_registro == "SOBRANTE":
+            if tipo_registro_fila == "SOBRANTE":
                 codigo_completo += "S"
 
-            cursor.execute("""
-                INSERT OR IGNORE INTO bienes
-                (
-                    codigo_patrimonial, 
-                    codigo_interno, 
-                    detalle_bien, 
-                    descripcion, 
-                    oficina, 
-                    codigo_completo, 
-                    fuente, 
-                    tipo_registro,
-                    estado,
-                    responsable
-                )
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (codigo_patrimonial,
-                  codigo_interno,
-                  detalle_bien,
-                  descripcion,
-                  oficina,
-                  codigo_completo,
-                  sheet_name,
-                  tipo_registro,
-                  estado,
-                  responsable
-                  ))
+            if codigo_completo in escritos:
+                # Repetido dentro de la misma carga: vale la primera fila, como antes
+                continue
+            escritos.add(codigo_completo)
+            cursor.execute(_UPSERT, (codigo_patrimonial,
+                                     codigo_interno,
+                                     detalle_bien,
+                                     descripcion,
+                                     oficina,
+                                     codigo_completo,
+                                     fuente,
+                                     tipo_registro_fila,
+                                     estado,
+                                     responsable
+                                     ))
             if cursor.rowcount > 0:
-                count += 1
-                # Agregar a lista de válidos (convertir row a dict para guardar)
-                row_dict = row.to_dict()
-                row_dict['codigo_completo_generado'] = codigo_completo
-                valid_data.append(row_dict)
+                if codigo_completo in existentes:
+                    actualizados += 1
+                else:
+                    count += 1
+                if reporte is not None:
+                    reporte.fila(HOJA_VALIDOS, columnas_validos, valores_reporte(row) + [codigo_completo])
         else:
-            ignored_data.append(row.to_dict())
-
-    conn.commit()
-    conn.close()
-    
-    # Consolidar reportes en un solo archivo Excel con múltiples hojas
-    report_file_path = "reportes/reporte_consolidado.xlsx"
-    with pd.ExcelWriter(report_file_path, engine='xlsxwriter') as writer:
-        if valid_data:
-            pd.DataFrame(valid_data).to_excel(writer, sheet_name="validos", index=False)
-            print("📂 Reporte de válidos generado en la hoja 'validos'.")
-        
-        if ignored_data:
-            pd.DataFrame(ignored_data).to_excel(writer, sheet_name="no considerados", index=False)
-            print("📂 Reporte de no considerados generado en la hoja 'no considerados'.")
-        
-        if not duplicados.empty:
-            duplicados.to_excel(writer, sheet_name="duplicados", index=False)
-            print("📂 Reporte de duplicados generado en la hoja 'duplicados'.")
-
-        if not solo_dup.empty:
-            solo_dup.to_excel(writer, sheet_name="resumen de duplicados", index=False)
-            print("📂 Resumen de duplicados generado en la hoja 'resumen de duplicados'.")
-            
-    print(f"✅ Reporte consolidado guardado en '{report_file_path}'")
+            ignorados += 1
+            if reporte is not None:
+                reporte.fila(HOJA_NO_CONSIDERADOS, columnas_ignorados, valores_reporte(row))
+
+    return count, ignorados, actualizados
+
+
+def _reportar_duplicados(reporte, duplicados, solo_dup, columnas, extra=()):
+    """Agrega al reporte las filas duplicadas de una hoja y su resumen por clave."""
+    if not duplicados.empty:
+        reporte.tabla(HOJA_DUPLICADOS, _tabla_reporte(duplicados, columnas, extra))
+    if not solo_dup.empty:
+        for nombre, valor in extra:
+            solo_dup = solo_dup.assign(**{nombre: valor})
+        reporte.tabla(HOJA_RESUMEN_DUPLICADOS, solo_dup)
+
+
+def load_excel_to_db(file_path, sheet_name="2 MAQ.", header=None, tipo_registro=None,
+                     reporte=REPORTE_CONSOLIDADO, diferir_reporte=False):
+    """
+    Carga una hoja de Excel en 'bienes'.
+
+    `reporte` es la ruta del reporte consolidado (.xlsx, .csv o .parquet) o
+    None para no generarlo. Con `diferir_reporte` las filas se guardan en un
+    temporal durante la carga y el reporte queda sin escribir: se retorna en
+    "reporte" y quien llama debe ejecutar su `cerrar()` cuando le convenga.
+
+    Los bienes que ya estaban cargados desde esta hoja se actualizan con los
+    valores del Excel si cambiaron.
+
+    Retorna {"insertados", "actualizados", "segundos_carga", "segundos_reporte",
+    "reporte"}, o None si la hoja no se pudo leer.
+    """
+    inicio = time.perf_counter()
+    create_table()
+    huella = huella_archivo(file_path)
+
+    # Cargar solo las columnas necesarias (todo como texto)
+    try:
+        df, columnas = leer_excel_columnas(file_path, sheet_name, header, CAMPOS, CAMPOS_SOLO_REPORTE)
+    except ColumnaAmbiguaError as e:
+        print(f"❌ {e}")
+        return
+
+    print("Columnas leídas:", df.columns.tolist())
+    print("Filas totales leídas:", len(df))
+
+    if not _mostrar_mapeo(columnas, tipo_registro):
+        print("❌ No se encontraron las columnas esperadas.")
+        print("Columnas detectadas:", leer_encabezados(file_path, sheet_name, header))
+        return
+
+    df, duplicados, solo_dup = _preparar_hoja(df, columnas, tipo_registro)
+    sink = ReporteCarga(reporte, diferido=diferir_reporte) if reporte else None
+
+    try:
+        conn = create_connection()
+        try:
+            cursor = conn.cursor()
+            count, _, actualizados = _insertar_hoja(cursor, df, columnas, sheet_name, tipo_registro,
+                                                    reporte=sink)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        guardar_huella(file_path, sheet_name, huella)
+        if sink is not None:
+            _reportar_duplicados(sink, duplicados, solo_dup, columnas)
+            if not diferir_reporte:
+                sink.cerrar()
+    except Exception:
+        # No dejar el reporte a medio escribir ni sus temporales abiertos
+        if sink is not None:
+            sink.descartar()
+        raise
+
+    segundos_reporte = sink.segundos if sink is not None else 0.0
+    segundos_carga = time.perf_counter() - inicio - segundos_reporte
     print(f"✅ {count} registros insertados correctamente (con columna Oficina).")
+    if actualizados:
+        print(f"✅ {actualizados} registros actualizados con los cambios del Excel.")
+    print(f"⏱️ Carga: {segundos_carga:.2f}s, reporte: {segundos_reporte:.2f}s"
+          + (" (pendiente de escribir)" if sink is not None and diferir_reporte else ""))
+    return {"insertados": count, "actualizados": actualizados, "segundos_carga": segundos_carga,
+            "segundos_reporte": segundos_reporte, "reporte": sink}
@@ -0,0 +1,279 @@
+"""
+Reporte consolidado de una carga de Excel, escrito fila por fila.
+
+`_insertar_hoja` manda cada fila al reporte en cuanto decide si es válida o
+no considerada, en lugar de juntar listas de dicts y armar DataFrames al
+final; así la memoria no crece con el reporte. Formatos según la extensión
+de la ruta:
+- .xlsx: xlsxwriter en modo constant_memory (una hoja por sección)
+- .csv: un archivo por sección, <ruta>_<hoja>.csv
+- .parquet: un archivo por sección, por lotes (requiere pyarrow)
+
+Con `diferido=True` las filas se guardan primero en un archivo temporal
+(pickle por fila, casi gratis) y el formato final se escribe recién en
+`cerrar()`, fuera del tiempo de la carga. `segundos` acumula todo el tiempo gastado en el reporte.
+
+Si la carga falla, `descartar()` (o salir con error de un `with ReporteCarga(...)`)
+cierra los archivos y borra el reporte a medio escribir.
+"""
+
+import csv
+import math
+import os
+import pickle
+import tempfile
+import time
+
+FORMATOS_REPORTE = ("xlsx", "csv", "parquet")
+LOTE_PARQUET = 5000
+
+# Secciones del reporte, en el orden en que suelen aparecer
+HOJA_VALIDOS = "validos"
+HOJA_NO_CONSIDERADOS = "no considerados"
+HOJA_DUPLICADOS = "duplicados"
+HOJA_RESUMEN_DUPLICADOS = "resumen de duplicados"
+HOJA_RESUMEN_ORIGEN = "resumen por origen"
+
+
+def _celda(valor):
+    """NaN y None quedan como celda vacía."""
+    if valor is None or (isinstance(valor, float) and math.isnan(valor)):
+        return None
+    return valor
+
+
+def _borrar(ruta):
+    try:
+        os.remove(ruta)
+    except OSError:
+        pass
+
+
+def _archivo_hoja(base, hoja, extension):
+    return f"{base}_{hoja.replace(' ', '_')}.{extension}"
+
+
+class _EscritorXlsx:
+    def __init__(self, ruta):
+        import xlsxwriter
+
+        self.ruta = ruta
+        self.libro = xlsxwriter.Workbook(ruta, {"constant_memory": True})
+        self.negrita = self.libro.add_format({"bold": True, "border": 1})
+        self.hojas = {}
+
+    def hoja(self, nombre, columnas):
+        hoja = self.libro.add_worksheet(nombre[:31])
+        hoja.write_row(0, 0, columnas, self.negrita)
+        self.hojas[nombre] = [hoja, 1]
+
+    def fila(self, nombre, valores):
+        destino = self.hojas[nombre]
+        destino[0].write_row(destino[1], 0, valores)
+        destino[1] += 1
+
+    def cerrar(self):
+        self.libro.close()
+        return self.ruta
+
+    def descartar(self):
+        # xlsxwriter no tiene forma de abortar: se cierra (libera sus temporales) y se borra
+        self.libro.close()
+        _borrar(self.ruta)
+
+
+class _EscritorCsv:
+    def __init__(self, ruta):
+        self.base = os.path.splitext(ruta)[0]
+        self.archivos = {}
+
+    def hoja(self, nombre, columnas):
+        ruta = _archivo_hoja(self.base, nombre, "csv")
+        archivo = open(ruta, "w", encoding="utf-8-sig", newline="")
+        escritor = csv.writer(archivo)
+        escritor.writerow(columnas)
+        self.archivos[nombre] = (archivo, escritor, ruta)
+
+    def fila(self, nombre, valores):
+        self.archivos[nombre][1].writerow(valores)
+
+    def cerrar(self):
+        for archivo, _, _ in self.archivos.values():
+            archivo.close()
+        return self.base + "_*.csv"
+
+    def descartar(self):
+        for archivo, _, ruta in self.archivos.values():
+            archivo.close()
+            _borrar(ruta)
+
+
+class _EscritorParquet:
+    def __init__(self, ruta):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("El reporte en Parquet requiere pyarrow (pip install pyarrow)") from e
+        self.pa, self.pq = pa, pq
+        self.base = os.path.splitext(ruta)[0]
+        self.hojas = {}
+
+    def hoja(self, nombre, columnas):
+        esquema = self.pa.schema([(str(c), self.pa.string()) for c in columnas])
+        escritor = self.pq.ParquetWriter(_archivo_hoja(self.base, nombre, "parquet"), esquema)
+        self.hojas[nombre] = (escritor, esquema, [])
+
+    def fila(self, nombre, valores):
+        lote = self.hojas[nombre][2]
+        lote.append([None if v is None else str(v) for v in valores])
+        if len(lote) >= LOTE_PARQUET:
+            self._vaciar(nombre)
+
+    def _vaciar(self, nombre):
+        escritor, esquema, lote = self.hojas[nombre]
+        if lote:
+            columnas = [list(c) for c in zip(*lote)]
+            escritor.write_table(self.pa.Table.from_arrays(
+                [self.pa.array(c, type=self.pa.string()) for c in columnas], schema=esquema))
+            lote.clear()
+
+    def cerrar(self):
+        for nombre, (escritor, _, _) in self.hojas.items():
+            self._vaciar(nombre)
+            escritor.close()
+        return self.base + "_*.parquet"
+
+    def descartar(self):
+        for nombre, (escritor, _, _) in self.hojas.items():
+            escritor.close()
+            _borrar(_archivo_hoja(self.base, nombre, "parquet"))
+
+
+class _EscritorTemporal:
+    """Guarda las filas tal cual en un temporal, para escribirlas después."""
+
+    def __init__(self):
+        self.archivo = tempfile.TemporaryFile(prefix="reporte_carga_")
+
+    def hoja(self, nombre, columnas):
+        pass
+
+    def fila(self, nombre, valores):
+        pickle.dump((nombre, valores), self.archivo, pickle.HIGHEST_PROTOCOL)
+
+    def filas(self):
+        self.archivo.seek(0)
+        while True:
+            try:
+                yield pickle.load(self.archivo)
+            except EOFError:
+                return
+
+    def cerrar(self):
+        self.archivo.close()
+
+    descartar = cerrar
+
+
+_ESCRITORES = {"xlsx": _EscritorXlsx, "csv": _EscritorCsv, "parquet": _EscritorParquet}
+
+
+class ReporteCarga:
+    """Destino de las filas del reporte de carga (ver docstring del módulo)."""
+
+    def __init__(self, ruta, diferido=False):
+        formato = os.path.splitext(ruta)[1].lstrip(".").lower()
+        if formato not in FORMATOS_REPORTE:
+            raise ValueError(f"Formato de reporte no soportado: '{ruta}' "
+                             f"(opciones: {', '.join(FORMATOS_REPORTE)})")
+        self.ruta = ruta
+        self.formato = formato
+        # Escribir CSV ya es casi gratis: diferirlo no ahorra nada
+        self.diferido = diferido and formato != "csv"
+        self.columnas = {}   # hoja -> encabezado (en orden de aparición)
+        self.filas = {}      # hoja -> filas escritas
+        self.segundos = 0.0
+        self._escritor = None
+        self.cerrado = False
+
+    def _abrir(self):
+        os.makedirs(os.path.dirname(self.ruta) or ".", exist_ok=True)
+        if self.diferido:
+            self._escritor = _EscritorTemporal()
+        else:
+            self._escritor = _ESCRITORES[self.formato](self.ruta)
+
+    def fila(self, hoja, columnas, valores):
+        """Agrega una fila a `hoja`; la primera fila de cada hoja fija su encabezado."""
+        inicio = time.perf_counter()
+        if hoja not in self.columnas:
+            if self._escritor is None:
+                self._abrir()
+            self.columnas[hoja] = list(columnas)
+            self.filas[hoja] = 0
+            self._escritor.hoja(hoja, self.columnas[hoja])
+        self._escritor.fila(hoja, [_celda(v) for v in valores])
+        self.filas[hoja] += 1
+        self.segundos += time.perf_counter() - inicio
+
+    def tabla(self, hoja, df):
+        """Agrega todas las filas de un DataFrame (mismas columnas en cada llamada)."""
+        columnas = [str(c) for c in df.columns]
+        for valores in df.itertuples(index=False, name=None):
+            self.fila(hoja, columnas, valores)
+
+    def cerrar(self):
+        """Termina de escribir el reporte; retorna la ruta (o el patrón de archivos)."""
+        if self.cerrado:
+            return self.ruta
+        inicio = time.perf_counter()
+        self.cerrado = True
+        if self._escritor is None:
+            self.segundos += time.perf_counter() - inicio
+            print("ℹ️ Reporte de carga vacío, no se generó archivo.")
+            return None
+        if self.diferido:
+            salida = self._volcar_temporal()
+        else:
+            salida = self._escritor.cerrar()
+        self.segundos += time.perf_counter() - inicio
+        for hoja, cantidad in self.filas.items():
+            print(f"📂 Hoja '{hoja}': {cantidad} filas.")
+        print(f"✅ Reporte consolidado guardado en '{salida}' ({self.segundos:.2f}s)")
+        return salida
+
+    def descartar(self):
+        """
+        Abandona el reporte (p.ej. si la carga falló): libera archivos y
+        temporales y borra lo que se haya escrito a medias.
+        """
+        if self.cerrado:
+            return
+        self.cerrado = True
+        if self._escritor is not None:
+            self._escritor.descartar()
+        print("⚠️ Reporte de carga descartado.")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, *exc):
+        # Solo se descarta si hubo un error; cerrar() queda a cargo de quien llama
+        if tipo is not None:
+            self.descartar()
+
+    def _volcar_temporal(self):
+        """Pasa las filas del temporal al formato final, en el mismo orden."""
+        escritor = _ESCRITORES[self.formato](self.ruta)
+        try:
+            for hoja, columnas in self.columnas.items():
+                escritor.hoja(hoja, columnas)
+            for hoja, valores in self._escritor.filas():
+                escritor.fila(hoja, valores)
+            return escritor.cerrar()
+        except Exception:
+            escritor.descartar()
+            raise
+        finally:
+            self._escritor.cerrar()
@@ -7,7 +7,24 @@ Script para verificar duplicados entre las 3 fuentes de datos:
 
 import pandas as pd
 from db.database import create_connection
+from db.instantanea import obtener_instantanea
+from data.columnas import ColumnaAmbiguaError
+from data.excel_reader import leer_excel_columnas
+import argparse
 import os
+import sys
+import time
+
+
+# Campos que se leen de cada Excel antes de la carga (ver data/columnas.py)
+CAMPOS_EXCEL = ("codigo_patrimonial", "codigo_interno", "detalle_bien", "oficina", "responsable")
+
+# (archivo, hoja, fila de encabezado) de cada fuente
+ARCHIVOS_FUENTE = [
+    ("SIGA Y SOBRANTES.xlsx", "Hoja1", 2),
+    ("AFECTACION EN USO.xlsx", "Hoja1", 0),
+    ("PECOSAS.xlsx", "Hoja1", 1),
+]
 
 def verificar_duplicados_db():
     """
@@ -33,12 +50,9 @@ def verificar_duplicados_db():
     # 1. Resumen por fuente
     print("\n📁 RESUMEN POR FUENTE:")
     print("-" * 50)
-    df_resumen = pd.read_sql_query("""
-        SELECT fuente, tipo_registro, COUNT(*) as total 
-        FROM bienes 
-        GROUP BY fuente, tipo_registro
-        ORDER BY fuente
-    """, conn)
+    inventario = obtener_instantanea()
+    df_resumen = pd.DataFrame(inventario.contar_por(("fuente", "tipo_registro")),
+                              columns=["fuente", "tipo_registro", "total"])
     print(df_resumen.to_string(index=False))
     
     # 2. Verificar duplicados de codigo_patrimonial + codigo_interno entre fuentes
@@ -171,13 +185,13 @@ def verificar_duplicados_db():
     print("📈 ESTADÍSTICAS FINALES")
     print("=" * 80)
     
-    total = pd.read_sql_query("SELECT COUNT(*) as total FROM bienes", conn).iloc[0]['total']
+    total = len(inventario)
     print(f"📊 Total de registros en la base de datos: {total}")
     
-    fuentes = pd.read_sql_query("SELECT COUNT(DISTINCT fuente) as total FROM bienes", conn).iloc[0]['total']
+    fuentes = inventario.distintos("fuente")
     print(f"📁 Número de fuentes diferentes: {fuentes}")
     
-    patrimoniales_unicos = pd.read_sql_query("SELECT COUNT(DISTINCT codigo_patrimonial) as total FROM bienes", conn).iloc[0]['total']
+    patrimoniales_unicos = inventario.distintos("codigo_patrimonial")
     print(f"🏷️  Códigos patrimoniales únicos: {patrimoniales_unicos}")
     
     conn.close()
@@ -189,115 +203,136 @@ def verificar_duplicados_db():
     }
 
 
-def verificar_duplicados_excel():
+def _normalizar_codigos(df):
+    """Agrega 'codigo_completo' con la misma normalización que la carga (código interno de 4 dígitos)."""
+    df["codigo_patrimonial"] = df["codigo_patrimonial"].astype(str).str.strip()
+    df["codigo_interno"] = df["codigo_interno"].astype(str).str.replace(".0", "", regex=False).str.zfill(4)
+    df["codigo_completo"] = df["codigo_patrimonial"] + df["codigo_interno"]
+    return df
+
+
+def _leer_fuente(file_path, sheet_name, header, campos=CAMPOS_EXCEL):
+    """
+    Lee una fuente con los campos normalizados como nombres de columna.
+    Retorna (DataFrame, campos opcionales presentes) o (None, mensaje).
+    """
+    if not os.path.exists(file_path):
+        return None, f"Archivo no encontrado: {file_path}"
+    try:
+        df, columnas = leer_excel_columnas(file_path, sheet_name, header, campos)
+    except ColumnaAmbiguaError as e:
+        return None, f"{file_path}: {e}"
+    if not (columnas["codigo_patrimonial"] and columnas["codigo_interno"]):
+        return None, f"{file_path}: No se encontraron columnas de código"
+
+    presentes = [campo for campo in campos if columnas[campo]]
+    datos = pd.DataFrame({campo: df[columnas[campo]] for campo in presentes})
+    datos = datos.dropna(subset=["codigo_patrimonial", "codigo_interno"], how="all")
+    return _normalizar_codigos(datos), presentes
+
+
+def verificar_duplicados_excel(archivos=ARCHIVOS_FUENTE):
     """
     Verifica duplicados directamente en los archivos Excel antes de cargar.
-    Retorna un DataFrame con los duplicados encontrados.
+
+    Todas las fuentes se juntan en un único DataFrame normalizado, con
+    'archivo_origen' categórico; un código está duplicado si aparece en más
+    de una fuente (pares código/fuente distintos repetidos por código).
+
+    Retorna (detalle de los registros duplicados, resumen por código).
     """
     print("=" * 80)
     print("📊 VERIFICACIÓN DE DUPLICADOS EN ARCHIVOS EXCEL (PRE-CARGA)")
     print("=" * 80)
-    
-    archivos = [
-        ("SIGA Y SOBRANTES.xlsx", "Hoja1", 2),
-        ("AFECTACION EN USO.xlsx", "Hoja1", 0),
-        ("PECOSAS.xlsx", "Hoja1", 1)
-    ]
-    
-    all_data = []
-    all_data_full = []  # Con todas las columnas para el reporte
-    
+
+    partes = []
+    columnas = ["codigo_patrimonial", "codigo_interno"]
     for file_path, sheet_name, header in archivos:
-        if not os.path.exists(file_path):
-            print(f"⚠️ Archivo no encontrado: {file_path}")
+        datos, presentes = _leer_fuente(file_path, sheet_name, header)
+        if datos is None:
+            print(f"⚠️ {presentes}")
             continue
-            
-        df = pd.read_excel(file_path, sheet_name=sheet_name, header=header, dtype=str)
-        df.columns = [str(c).strip().lower() for c in df.columns]
-        
-        # Detectar columnas
-        col_pat = next((c for c in df.columns if "codigo del bien" in c or "patrimonial" in c), None)
-        col_int = next((c for c in df.columns if "codigo interno" in c or "codigo inter" in c), None)
-        col_det = next((c for c in df.columns if "detalle del   bien" in c or "detalle" in c), None)
-        col_ofi = next((c for c in df.columns if "oficina" in c), None)
-        col_resp = next((c for c in df.columns if "responsable" in c), None)
-        
-        if col_pat and col_int:
-            # DataFrame simplificado para verificación
-            df_temp = df[[col_pat, col_int]].copy()
-            df_temp.columns = ['codigo_patrimonial', 'codigo_interno']
-            df_temp['fuente'] = file_path
-            df_temp = df_temp.dropna(subset=['codigo_patrimonial', 'codigo_interno'], how='all')
-            all_data.append(df_temp)
-            
-            # DataFrame completo para el reporte
-            cols_to_keep = [col_pat, col_int]
-            col_names = ['codigo_patrimonial', 'codigo_interno']
-            
-            if col_det:
-                cols_to_keep.append(col_det)
-                col_names.append('detalle_bien')
-            if col_ofi:
-                cols_to_keep.append(col_ofi)
-                col_names.append('oficina')
-            if col_resp:
-                cols_to_keep.append(col_resp)
-                col_names.append('responsable')
-                
-            df_full = df[cols_to_keep].copy()
-            df_full.columns = col_names
-            df_full['archivo_origen'] = file_path
-            df_full = df_full.dropna(subset=['codigo_patrimonial', 'codigo_interno'], how='all')
-            all_data_full.append(df_full)
-            
-            print(f"✅ {file_path}: {len(df_temp)} registros encontrados")
-        else:
-            print(f"⚠️ {file_path}: No se encontraron columnas de código")
-    
+        columnas += [campo for campo in presentes if campo not in columnas]
+        partes.append(datos.assign(archivo_origen=file_path))
+        print(f"✅ {file_path}: {len(datos)} registros encontrados")
+
     duplicados_df = pd.DataFrame()
     resumen_df = pd.DataFrame()
-    
-    if all_data:
-        df_all = pd.concat(all_data, ignore_index=True)
-        df_all_full = pd.concat(all_data_full, ignore_index=True)
-        
-        # Limpiar y normalizar
-        df_all['codigo_patrimonial'] = df_all['codigo_patrimonial'].astype(str).str.strip()
-        df_all['codigo_interno'] = df_all['codigo_interno'].astype(str).str.replace('.0', '', regex=False)
-        df_all['codigo_interno'] = df_all['codigo_interno'].str.zfill(4)
-        df_all['key'] = df_all['codigo_patrimonial'] + df_all['codigo_interno']
-        
-        df_all_full['codigo_patrimonial'] = df_all_full['codigo_patrimonial'].astype(str).str.strip()
-        df_all_full['codigo_interno'] = df_all_full['codigo_interno'].astype(str).str.replace('.0', '', regex=False)
-        df_all_full['codigo_interno'] = df_all_full['codigo_interno'].str.zfill(4)
-        df_all_full['codigo_completo'] = df_all_full['codigo_patrimonial'] + df_all_full['codigo_interno']
-        
-        # Buscar duplicados entre fuentes
-        duplicados = df_all.groupby('key').filter(lambda x: x['fuente'].nunique() > 1)
-        
-        if duplicados.empty:
-            print("\n✅ No hay duplicados entre las fuentes de Excel.")
-        else:
-            print(f"\n⚠️ {len(duplicados)} registros aparecen en múltiples fuentes:")
-            
-            # Resumen de duplicados
-            resumen_df = duplicados.groupby('key').agg({
-                'codigo_patrimonial': 'first',
-                'codigo_interno': 'first',
-                'fuente': lambda x: ', '.join(sorted(x.unique()))
-            }).reset_index()
-            resumen_df.columns = ['codigo_completo', 'codigo_patrimonial', 'codigo_interno', 'fuentes_duplicadas']
-            
-            print(resumen_df.to_string(index=False))
-            
-            # Obtener registros completos de los duplicados
-            keys_duplicados = duplicados['key'].unique()
-            duplicados_df = df_all_full[df_all_full['codigo_completo'].isin(keys_duplicados)].copy()
-            duplicados_df = duplicados_df.sort_values(['codigo_completo', 'archivo_origen'])
-    
+    if not partes:
+        return duplicados_df, resumen_df
+
+    df_all = pd.concat(partes, ignore_index=True)
+    df_all["archivo_origen"] = pd.Categorical(df_all["archivo_origen"],
+                                              categories=sorted(df_all["archivo_origen"].unique()))
+
+    # Códigos presentes en más de una fuente: pares (código, fuente) únicos con código repetido
+    pares = df_all[["codigo_completo", "archivo_origen"]].drop_duplicates()
+    pares = pares[pares.duplicated("codigo_completo", keep=False)]
+    if pares.empty:
+        print("\n✅ No hay duplicados entre las fuentes de Excel.")
+        return duplicados_df, resumen_df
+
+    en_varias = df_all["codigo_completo"].isin(pares["codigo_completo"])
+    print(f"\n⚠️ {int(en_varias.sum())} registros aparecen en múltiples fuentes:")
+
+    # Resumen de duplicados
+    fuentes = (pares.sort_values("archivo_origen")
+               .groupby("codigo_completo")["archivo_origen"]
+               .agg(lambda x: ", ".join(x.astype(str))))
+    primeros = (df_all.loc[en_varias, ["codigo_completo", "codigo_patrimonial", "codigo_interno"]]
+                .drop_duplicates("codigo_completo")
+                .set_index("codigo_completo"))
+    resumen_df = primeros.join(fuentes.rename("fuentes_duplicadas")).sort_index().reset_index()
+    print(resumen_df.to_string(index=False))
+
+    # Registros completos de los duplicados
+    duplicados_df = (df_all.loc[en_varias, columnas + ["archivo_origen", "codigo_completo"]]
+                     .sort_values(["codigo_completo", "archivo_origen"]))
     return duplicados_df, resumen_df
 
 
+def verificar_duplicados_rapido(archivos=ARCHIVOS_FUENTE, muestra=None, semilla=0):
+    """
+    Responde solo si hay algún código repetido entre fuentes, sin armar el
+    detalle: lee únicamente las columnas de código y se detiene en la
+    primera coincidencia, sin abrir las fuentes que faltan.
+
+    Con `muestra`, de cada fuente (salvo la primera) se comparan como mucho
+    esa cantidad de códigos al azar contra todos los anteriores; si no se
+    encuentra nada el resultado no es concluyente.
+
+    Returns:
+        dict con hay_duplicados, ejemplo (código, fuente anterior, fuente),
+        fuentes_leidas, codigos_revisados y concluyente
+    """
+    vistos = {}  # código -> primera fuente en que aparece
+    resultado = {"hay_duplicados": False, "ejemplo": None, "fuentes_leidas": 0,
+                 "codigos_revisados": 0, "concluyente": True}
+    for file_path, sheet_name, header in archivos:
+        datos, mensaje = _leer_fuente(file_path, sheet_name, header, ("codigo_patrimonial", "codigo_interno"))
+        if datos is None:
+            print(f"⚠️ {mensaje}")
+            continue
+        resultado["fuentes_leidas"] += 1
+        codigos = pd.Series(datos["codigo_completo"].unique())
+
+        revisar = codigos
+        if muestra and vistos and len(codigos) > muestra:
+            revisar = codigos.sample(n=muestra, random_state=semilla)
+            resultado["concluyente"] = False
+        resultado["codigos_revisados"] += len(revisar)
+
+        repetidos = revisar[revisar.isin(vistos.keys())]
+        if not repetidos.empty:
+            codigo = repetidos.iloc[0]
+            resultado.update(hay_duplicados=True, concluyente=True,
+                             ejemplo=(codigo, vistos[codigo], file_path))
+            return resultado
+        for codigo in codigos:
+            vistos.setdefault(codigo, file_path)
+    return resultado
+
+
 def generar_reporte_duplicados():
     """
     Genera un reporte Excel con todos los duplicados encontrados.
@@ -329,11 +364,10 @@ def generar_reporte_duplicados():
             duplicados_excel.to_excel(writer, sheet_name='Detalle Duplicados', index=False)
             print(f"  ✅ Hoja 'Detalle Duplicados': {len(duplicados_excel)} registros")
         
-        # Hoja 3: Duplicados por fuente
+        # Hoja 3: Duplicados por fuente (una sola pasada por groupby)
         if not duplicados_excel.empty:
-            for fuente in duplicados_excel['archivo_origen'].unique():
+            for fuente, df_fuente in duplicados_excel.groupby('archivo_origen', observed=True, sort=False):
                 nombre_hoja = fuente.replace('.xlsx', '').replace(' ', '_')[:31]
-                df_fuente = duplicados_excel[duplicados_excel['archivo_origen'] == fuente]
                 df_fuente.to_excel(writer, sheet_name=nombre_hoja, index=False)
                 print(f"  ✅ Hoja '{nombre_hoja}': {len(df_fuente)} registros duplicados")
     
@@ -341,7 +375,33 @@ def generar_reporte_duplicados():
     return report_path
 
 
+def main_rapido(muestra=None):
+    """Chequeo rápido: termina con código 1 si encuentra un código en dos fuentes."""
+    inicio = time.perf_counter()
+    resultado = verificar_duplicados_rapido(muestra=muestra)
+    segundos = time.perf_counter() - inicio
+    if resultado["hay_duplicados"]:
+        codigo, anterior, fuente = resultado["ejemplo"]
+        print(f"⚠️ Hay duplicados entre fuentes: {codigo} está en '{anterior}' y en '{fuente}'")
+    elif resultado["concluyente"]:
+        print("✅ No hay duplicados entre las fuentes de Excel.")
+    else:
+        print("ℹ️ No se encontraron duplicados en la muestra (no concluyente).")
+    print(f"⏱️ {resultado['codigos_revisados']} códigos revisados en {resultado['fuentes_leidas']} "
+          f"fuente(s), {segundos:.2f}s")
+    return 1 if resultado["hay_duplicados"] else 0
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verifica duplicados entre las fuentes de Excel y en la BD")
+    parser.add_argument("--rapido", action="store_true",
+                        help="solo decir si hay duplicados, deteniéndose en el primero (sin reporte)")
+    parser.add_argument("--muestra", type=int,
+                        help="con --rapido, códigos al azar a comparar por fuente")
+    args = parser.parse_args()
+    if args.rapido:
+        sys.exit(main_rapido(args.muestra))
+
     print("\n" + "🔄" * 40)
     print("INICIANDO VERIFICACIÓN DE DUPLICADOS ENTRE LAS 3 FUENTES")
     print("🔄" * 40 + "\n")
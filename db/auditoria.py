@@ -0,0 +1,145 @@
+"""
+Control de cambios de 'bienes' y reimpresión de solo lo modificado.
+
+Los triggers creados en create_table (db/database.py) mantienen en cada bien
+`version` y `actualizado`, y agregan una fila a cambios_bienes por cada
+alta, modificación o baja (con los valores antes/después en JSON). `etiqueta`
+marca los cambios que alteran lo impreso: código, detalle, tipo u oficina.
+Las correcciones llegan al reimportar el Excel: load_excel actualiza los
+bienes de la misma hoja cuyos datos cambiaron, y eso dispara el trigger.
+
+Cada impresión queda en `impresiones` con la marca del último cambio que
+existía al consultar los registros; `etiquetas_impresas` guarda, por bien,
+la marca con que se imprimió por última vez. Con eso:
+- cambios_desde(impresion_id): lo que cambió después de esa impresión
+- pendientes_reimpresion(): bienes con cambios de etiqueta sin imprimir
+- oficinas_pendientes(): cuántos hay por oficina
+
+El historial empieza cuando se crean los triggers: los bienes cargados antes
+no figuran como pendientes hasta que cambien.
+
+Uso:
+    marca = ultimo_cambio()            # antes de leer los registros
+    ... generar el PDF ...
+    registrar_impresion(records, "DIRECCIÓN", marca)
+"""
+
+from db.database import create_connection
+
+# Un bien está pendiente si tiene un cambio de etiqueta posterior a su última impresión
+_PENDIENTE = """
+    EXISTS (SELECT 1 FROM cambios_bienes c
+            WHERE c.bien_id = b.id AND c.etiqueta = 1 AND c.id > IFNULL(e.cambio, 0))
+"""
+
+
+def ultimo_cambio(conn=None):
+    """Id del último cambio registrado (0 si no hay ninguno)."""
+    propia = conn is None
+    conn = conn or create_connection()
+    try:
+        return conn.execute("SELECT IFNULL(MAX(id), 0) FROM cambios_bienes").fetchone()[0]
+    finally:
+        if propia:
+            conn.close()
+
+
+def registrar_impresion(records, descripcion=None, marca=None):
+    """
+    Registra que se imprimieron `records` (tuplas con codigo_completo
+    primero). `marca` es ultimo_cambio() tomado antes de leer los registros;
+    si se omite se usa el actual. Retorna el id de la impresión.
+    """
+    conn = create_connection()
+    try:
+        with conn:
+            if marca is None:
+                marca = ultimo_cambio(conn)
+            cursor = conn.execute(
+                "INSERT INTO impresiones (fecha, descripcion, etiquetas, ultimo_cambio) "
+                "VALUES (strftime('%Y-%m-%dT%H:%M:%S', 'now', 'localtime'), ?, ?, ?)",
+                (descripcion, len(records), marca))
+            impresion_id = cursor.lastrowid
+            conn.executemany(
+                """INSERT OR REPLACE INTO etiquetas_impresas (bien_id, impresion_id, cambio)
+                   SELECT id, ?, ? FROM bienes WHERE codigo_completo = ?""",
+                ((impresion_id, marca, record[0]) for record in records))
+    finally:
+        conn.close()
+    return impresion_id
+
+
+def cambios_desde(impresion_id, solo_etiqueta=True):
+    """
+    Cambios registrados después de la impresión indicada:
+    [(id, bien_id, codigo_completo, oficina, operacion, fecha)].
+    """
+    conn = create_connection()
+    try:
+        row = conn.execute("SELECT ultimo_cambio FROM impresiones WHERE id = ?", (impresion_id,)).fetchone()
+        if row is None:
+            raise ValueError(f"No existe la impresión {impresion_id}")
+        filtro = "AND etiqueta = 1" if solo_etiqueta else ""
+        return conn.execute(
+            f"""SELECT id, bien_id, codigo_completo, oficina, operacion, fecha
+                FROM cambios_bienes WHERE id > ? {filtro} ORDER BY id""", (row[0],)).fetchall()
+    finally:
+        conn.close()
+
+
+def codigos_cambiados_desde(impresion_id):
+    """Códigos actuales de los bienes cuya etiqueta cambió después de esa impresión."""
+    bienes = {bien_id for _, bien_id, _, _, operacion, _ in cambios_desde(impresion_id) if operacion != "DELETE"}
+    if not bienes:
+        return []
+    conn = create_connection()
+    try:
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS ids_cambiados (id INTEGER PRIMARY KEY)")
+        conn.execute("DELETE FROM ids_cambiados")
+        conn.executemany("INSERT INTO ids_cambiados VALUES (?)", ((i,) for i in bienes))
+        return [row[0] for row in conn.execute(
+            "SELECT b.codigo_completo FROM bienes b JOIN ids_cambiados t ON t.id = b.id ORDER BY b.id")]
+    finally:
+        conn.close()
+
+
+def pendientes_reimpresion(oficinas=None):
+    """Códigos de los bienes con cambios de etiqueta aún no impresos (opcionalmente de esas oficinas)."""
+    params = []
+    filtro = ""
+    if oficinas:
+        params = list(oficinas)
+        filtro = f"AND b.oficina IN ({', '.join('?' * len(params))})"
+    conn = create_connection()
+    try:
+        return [row[0] for row in conn.execute(
+            f"""SELECT b.codigo_completo FROM bienes b
+                LEFT JOIN etiquetas_impresas e ON e.bien_id = b.id
+                WHERE {_PENDIENTE} {filtro}
+                ORDER BY b.oficina, b.id""", params)]
+    finally:
+        conn.close()
+
+
+def oficinas_pendientes():
+    """[(oficina, bienes por reimprimir)] ordenado por oficina."""
+    conn = create_connection()
+    try:
+        return conn.execute(
+            f"""SELECT b.oficina, COUNT(*) FROM bienes b
+                LEFT JOIN etiquetas_impresas e ON e.bien_id = b.id
+                WHERE {_PENDIENTE}
+                GROUP BY b.oficina ORDER BY b.oficina""").fetchall()
+    finally:
+        conn.close()
+
+
+def listar_impresiones(limite=20):
+    """[(id, fecha, descripcion, etiquetas, ultimo_cambio)] de la más reciente a la más antigua."""
+    conn = create_connection()
+    try:
+        return conn.execute(
+            "SELECT id, fecha, descripcion, etiquetas, ultimo_cambio FROM impresiones ORDER BY id DESC LIMIT ?",
+            (limite,)).fetchall()
+    finally:
+        conn.close()
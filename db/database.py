@@ -1,10 +1,18 @@
 import sqlite3
 import os
+import hashlib
+from datetime import datetime
 
 # Obtener la ruta del directorio raíz del proyecto
 _BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 _DB_PATH = os.path.join(_BASE_DIR, "inventario.db")
 
+# Columnas de datos de 'bienes' que se auditan, y las que salen impresas en la etiqueta
+COLUMNAS_AUDITADAS = ("codigo_patrimonial", "codigo_interno", "detalle_bien", "descripcion", "oficina",
+                      "fuente", "tipo_registro", "codigo_completo", "estado", "responsable")
+COLUMNAS_ETIQUETA = ("codigo_completo", "detalle_bien", "tipo_registro", "oficina")
+_AHORA = "strftime('%Y-%m-%dT%H:%M:%S', 'now', 'localtime')"
+
 def create_connection():
     conn = sqlite3.connect(_DB_PATH)
     return conn
@@ -24,8 +32,208 @@ def create_table():
             tipo_registro TEXT,
             codigo_completo TEXT UNIQUE,
             estado TEXT,
-            responsable TEXT
+            responsable TEXT,
+            version INTEGER NOT NULL DEFAULT 1,
+            actualizado TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%S', 'now', 'localtime'))
+        )
+    """)
+    # BD creadas antes del control de cambios
+    existentes = {fila[1] for fila in cursor.execute("PRAGMA table_info(bienes)")}
+    if "version" not in existentes:
+        cursor.execute("ALTER TABLE bienes ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+    if "actualizado" not in existentes:
+        cursor.execute("ALTER TABLE bienes ADD COLUMN actualizado TEXT")
+    # Huella de cada Excel importado (para no recargarlo si no cambió)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS importaciones (
+            archivo TEXT,
+            hoja TEXT,
+            huella TEXT,
+            fecha TEXT,
+            PRIMARY KEY (archivo, hoja)
+        )
+    """)
+    # Sesiones de conteo físico y sus lecturas (data/conteo.py)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS sesiones_conteo (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nombre TEXT,
+            inicio TEXT,
+            fin TEXT
         )
     """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS escaneos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            sesion_id INTEGER REFERENCES sesiones_conteo (id),
+            codigo_leido TEXT,
+            codigo_completo TEXT,
+            ubicacion TEXT,
+            resultado TEXT,
+            fecha TEXT
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_escaneos_sesion ON escaneos (sesion_id)")
+    # Contador de cambios de 'bienes': lo suben los triggers en cada fila
+    # insertada, modificada o borrada (ver db/instantanea.py)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS version_bienes (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        )
+    """)
+    cursor.execute("INSERT OR IGNORE INTO version_bienes (id, version) VALUES (1, 0)")
+    for evento in ("INSERT", "UPDATE", "DELETE"):
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS bienes_version_{evento.lower()} AFTER {evento} ON bienes
+            BEGIN
+                UPDATE version_bienes SET version = version + 1 WHERE id = 1;
+            END
+        """)
+    _crear_auditoria(cursor)
     conn.commit()
     conn.close()
+
+
+def _crear_auditoria(cursor):
+    """
+    Historial de cambios de 'bienes' (solo se agrega) y registro de
+    impresiones, mantenidos por triggers. Ver db/auditoria.py.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS cambios_bienes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            bien_id INTEGER,
+            codigo_completo TEXT,
+            oficina TEXT,
+            operacion TEXT,
+            etiqueta INTEGER,
+            antes TEXT,
+            despues TEXT,
+            fecha TEXT
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_cambios_bien ON cambios_bienes (bien_id, id) WHERE etiqueta = 1")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_cambios_oficina ON cambios_bienes (oficina, id) WHERE etiqueta = 1")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS impresiones (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            fecha TEXT,
+            descripcion TEXT,
+            etiquetas INTEGER,
+            ultimo_cambio INTEGER
+        )
+    """)
+    # Último cambio ya impreso de cada bien
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS etiquetas_impresas (
+            bien_id INTEGER PRIMARY KEY,
+            impresion_id INTEGER REFERENCES impresiones (id),
+            cambio INTEGER
+        )
+    """)
+
+    def json_de(fila):
+        return "json_object(" + ", ".join(f"'{c}', {fila}.{c}" for c in COLUMNAS_AUDITADAS) + ")"
+
+    distinto = " OR ".join(f"OLD.{c} IS NOT NEW.{c}" for c in COLUMNAS_AUDITADAS)
+    etiqueta = " OR ".join(f"OLD.{c} IS NOT NEW.{c}" for c in COLUMNAS_ETIQUETA)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS bienes_auditoria_insert AFTER INSERT ON bienes
+        BEGIN
+            UPDATE bienes SET actualizado = {_AHORA} WHERE id = NEW.id AND actualizado IS NULL;
+            INSERT INTO cambios_bienes (bien_id, codigo_completo, oficina, operacion, etiqueta, antes, despues, fecha)
+            VALUES (NEW.id, NEW.codigo_completo, NEW.oficina, 'INSERT', 1, NULL, {json_de("NEW")}, {_AHORA});
+        END
+    """)
+    # Solo cambios reales de datos: tocar version/actualizado no vuelve a disparar
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS bienes_auditoria_update
+        AFTER UPDATE OF {", ".join(COLUMNAS_AUDITADAS)} ON bienes
+        WHEN {distinto}
+        BEGIN
+            UPDATE bienes SET version = OLD.version + 1, actualizado = {_AHORA} WHERE id = NEW.id;
+            INSERT INTO cambios_bienes (bien_id, codigo_completo, oficina, operacion, etiqueta, antes, despues, fecha)
+            VALUES (NEW.id, NEW.codigo_completo, NEW.oficina, 'UPDATE', {etiqueta},
+                    {json_de("OLD")}, {json_de("NEW")}, {_AHORA});
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS bienes_auditoria_delete AFTER DELETE ON bienes
+        BEGIN
+            INSERT INTO cambios_bienes (bien_id, codigo_completo, oficina, operacion, etiqueta, antes, despues, fecha)
+            VALUES (OLD.id, OLD.codigo_completo, OLD.oficina, 'DELETE', 0, {json_de("OLD")}, NULL, {_AHORA});
+        END
+    """)
+
+
+def huella_archivo(file_path):
+    """Calcula la huella SHA-256 del contenido de un archivo."""
+    sha = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for bloque in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(bloque)
+    return sha.hexdigest()
+
+
+def obtener_huella(file_path, sheet_name):
+    """Retorna la huella guardada de la última importación de esa hoja, o None."""
+    conn = create_connection()
+    try:
+        row = conn.execute(
+            "SELECT huella FROM importaciones WHERE archivo = ? AND hoja = ?",
+            (os.path.abspath(file_path), sheet_name)).fetchone()
+    except sqlite3.OperationalError:
+        # La tabla todavía no existe
+        row = None
+    conn.close()
+    return row[0] if row else None
+
+
+def guardar_huella(file_path, sheet_name, huella):
+    """Registra la huella del Excel recién importado."""
+    conn = create_connection()
+    conn.execute(
+        "INSERT OR REPLACE INTO importaciones (archivo, hoja, huella, fecha) VALUES (?, ?, ?, ?)",
+        (os.path.abspath(file_path), sheet_name, huella, datetime.now().isoformat(timespec="seconds")))
+    conn.commit()
+    conn.close()
+
+
+def importacion_vigente(file_path, sheet_name):
+    """
+    Indica si la base de datos ya tiene cargada esta versión del Excel
+    (misma huella que la última importación de esa hoja).
+    """
+    if not os.path.exists(file_path):
+        # Sin Excel no hay nada que reimportar; se usa la BD tal como está
+        return True
+    return obtener_huella(file_path, sheet_name) == huella_archivo(file_path)
+
+
+def version_bienes(conn=None):
+    """
+    Retorna el contador de cambios de 'bienes', o None si la BD todavía no
+    tiene la tabla version_bienes (create_table no se ejecutó).
+    """
+    propia = conn is None
+    conn = conn or create_connection()
+    try:
+        row = conn.execute("SELECT version FROM version_bienes WHERE id = 1").fetchone()
+    except sqlite3.OperationalError:
+        row = None
+    finally:
+        if propia:
+            conn.close()
+    return row[0] if row else None
+
+
+def buscar_bienes(texto, columnas):
+    """
+    Retorna las filas de 'bienes' (solo `columnas`) en las que alguna
+    columna contiene `texto`, sin distinguir mayúsculas.
+    """
+    from db.instantanea import obtener_instantanea
+
+    inventario = obtener_instantanea()
+    return inventario.filas(columnas, inventario.buscar(texto, columnas))
@@ -0,0 +1,211 @@
+"""
+Instantánea columnar en memoria de la tabla 'bienes'.
+
+Las vistas y los reportes leen el inventario desde aquí en lugar de volver a
+consultar SQLite y armar tuplas cada vez. Cada columna es un arreglo numpy
+(una fila por bien, en orden de id); oficina, tipo_registro, fuente y
+responsable se guardan codificadas por diccionario: los valores distintos
+ordenados en `categorias[columna]` y un int32 por fila en `codigos[columna]`
+(-1 = NULL). Así los filtros, conteos y agrupaciones son operaciones
+vectorizadas sobre enteros, y todas las vistas comparten la misma copia.
+
+La instantánea se recarga solo cuando cambia el contador de version_bienes,
+que los triggers de 'bienes' suben en cada fila modificada (db/database.py).
+
+Uso:
+    inventario = obtener_instantanea()
+    mascara = inventario.filtrar(oficina="DIRECCIÓN")
+    filas = inventario.filas(("codigo_completo", "detalle_bien"), mascara)
+    inventario.contar("oficina")                  # [(oficina, cantidad)]
+    inventario.contar_por(("fuente", "tipo_registro"))
+"""
+
+import threading
+
+import numpy as np
+
+import db.database as database
+from db.database import create_connection, version_bienes
+
+COLUMNAS = ("id", "codigo_patrimonial", "codigo_interno", "detalle_bien", "descripcion", "oficina",
+            "fuente", "tipo_registro", "codigo_completo", "estado", "responsable")
+CATEGORICAS = ("oficina", "tipo_registro", "fuente", "responsable")
+
+
+class Instantanea:
+    """Columnas de 'bienes' en arreglos numpy, con las categóricas codificadas."""
+
+    def __init__(self, filas, version=None, ruta=None):
+        self.version = version
+        self.ruta = ruta
+        self.n = len(filas)
+        self.categorias = {}
+        self.codigos = {}
+        self._valores = {}
+        self._minusculas = {}
+        self._indices = {}
+        columnas = list(zip(*filas)) if filas else [()] * len(COLUMNAS)
+        for nombre, valores in zip(COLUMNAS, columnas):
+            if nombre in CATEGORICAS:
+                categorias = sorted({v for v in valores if v is not None})
+                indice = {v: i for i, v in enumerate(categorias)}
+                self.categorias[nombre] = np.array(categorias, dtype=object)
+                self.codigos[nombre] = np.fromiter((indice.get(v, -1) for v in valores),
+                                                   dtype=np.int32, count=self.n)
+            elif nombre == "id":
+                self._valores[nombre] = np.array(valores, dtype=np.int64)
+            else:
+                arreglo = np.empty(self.n, dtype=object)
+                arreglo[:] = valores
+                self._valores[nombre] = arreglo
+
+    @classmethod
+    def cargar(cls, conn=None):
+        propia = conn is None
+        conn = conn or create_connection()
+        try:
+            version = version_bienes(conn)
+            filas = conn.execute(f"SELECT {', '.join(COLUMNAS)} FROM bienes ORDER BY id").fetchall()
+        finally:
+            if propia:
+                conn.close()
+        return cls(filas, version, database._DB_PATH)
+
+    def __len__(self):
+        return self.n
+
+    # ======== Columnas ========
+    def valores(self, columna):
+        """Arreglo con el valor de `columna` en cada fila (None = NULL)."""
+        arreglo = self._valores.get(columna)
+        if arreglo is None:
+            if columna not in self.codigos:
+                raise KeyError(f"columna desconocida: {columna}")
+            # El código -1 toma el último elemento: None
+            arreglo = self._valores[columna] = np.append(self.categorias[columna], None)[self.codigos[columna]]
+        return arreglo
+
+    def _en_minusculas(self, columna):
+        """
+        Texto en minúsculas de cada fila, como lo compara buscar_bienes
+        (str(None) = 'None'). StringDType es de ancho variable: un dtype=str
+        rellenaría cada fila hasta el largo del texto más largo de la columna.
+        """
+        arreglo = self._minusculas.get(columna)
+        if arreglo is None:
+            arreglo = self._minusculas[columna] = np.array(
+                [str(v).lower() for v in self.valores(columna).tolist()], dtype=np.dtypes.StringDType())
+        return arreglo
+
+    # ======== Filtros ========
+    def filtrar(self, mascara=None, **filtros):
+        """
+        Máscara booleana de las filas que cumplen todos los filtros
+        columna=valor (o columna=[valores]). Se combina con `mascara`.
+        """
+        resultado = np.ones(self.n, dtype=bool) if mascara is None else mascara.copy()
+        for columna, valor in filtros.items():
+            buscados = list(valor) if isinstance(valor, (list, tuple, set)) else [valor]
+            if columna in self.codigos:
+                indice = self._indice(columna)
+                codigos = [-1 if v is None else indice.get(v, -2) for v in buscados]
+                resultado &= np.isin(self.codigos[columna], codigos)
+            else:
+                resultado &= np.isin(self.valores(columna), buscados)
+        return resultado
+
+    def _indice(self, columna):
+        """{valor: código} de una columna categórica."""
+        indice = self._indices.get(columna)
+        if indice is None:
+            indice = self._indices[columna] = {v: i for i, v in enumerate(self.categorias[columna].tolist())}
+        return indice
+
+    def buscar(self, texto, columnas, mascara=None):
+        """Máscara de las filas en que alguna de `columnas` contiene `texto` (sin distinguir mayúsculas)."""
+        texto = texto.lower()
+        resultado = np.zeros(self.n, dtype=bool)
+        for columna in columnas:
+            if columna in self.codigos:
+                # Se compara cada categoría una sola vez y se expande por código
+                coincide = np.array([texto in str(v).lower() for v in self.categorias[columna].tolist()]
+                                    + [texto in "none"], dtype=bool)
+                resultado |= coincide[self.codigos[columna]]
+            else:
+                resultado |= np.strings.find(self._en_minusculas(columna), texto) != -1
+        return resultado if mascara is None else resultado & mascara
+
+    # ======== Materialización ========
+    def filas(self, columnas, mascara=None, orden=None):
+        """
+        Lista de tuplas con `columnas` para las filas de `mascara`, en orden de
+        id o, si se indica, por la columna categórica `orden` (NULL primero,
+        como ORDER BY en SQLite).
+        """
+        indices = np.arange(self.n) if mascara is None else np.flatnonzero(mascara)
+        if orden is not None:
+            if orden not in self.codigos:
+                raise ValueError(f"solo se puede ordenar por {', '.join(CATEGORICAS)}")
+            indices = indices[np.argsort(self.codigos[orden][indices], kind="stable")]
+        return list(zip(*(self.valores(columna)[indices].tolist() for columna in columnas)))
+
+    # ======== Agregaciones ========
+    def contar(self, columna, mascara=None):
+        """[(valor, cantidad)] de una columna categórica, ordenado por valor y sin NULL."""
+        codigos = self.codigos[columna] if mascara is None else self.codigos[columna][mascara]
+        cantidades = np.bincount(codigos + 1, minlength=len(self.categorias[columna]) + 1)[1:]
+        presentes = np.flatnonzero(cantidades)
+        return list(zip(self.categorias[columna][presentes].tolist(), cantidades[presentes].tolist()))
+
+    def contar_por(self, columnas, mascara=None):
+        """
+        [(valor_1, ..., valor_k, cantidad)] agrupando por varias columnas
+        categóricas (GROUP BY), ordenado por los valores con NULL primero.
+        """
+        columnas = list(columnas)
+        clave = np.zeros(self.n if mascara is None else int(np.count_nonzero(mascara)), dtype=np.int64)
+        bases = []
+        for columna in columnas:
+            base = len(self.categorias[columna]) + 1
+            codigos = self.codigos[columna] if mascara is None else self.codigos[columna][mascara]
+            clave = clave * base + (codigos + 1)
+            bases.append(base)
+        grupos, cantidades = np.unique(clave, return_counts=True)
+        partes = []
+        for columna, base in zip(reversed(columnas), reversed(bases)):
+            partes.append(np.append(None, self.categorias[columna])[grupos % base])
+            grupos = grupos // base
+        partes.reverse()
+        return list(zip(*(p.tolist() for p in partes), cantidades.tolist()))
+
+    def distintos(self, columna, mascara=None):
+        """Cantidad de valores distintos no nulos (COUNT(DISTINCT columna))."""
+        if columna in self.codigos:
+            codigos = self.codigos[columna] if mascara is None else self.codigos[columna][mascara]
+            return int(np.count_nonzero(np.bincount(codigos + 1)[1:]))
+        valores = self.valores(columna) if mascara is None else self.valores(columna)[mascara]
+        return len({v for v in valores.tolist() if v is not None})
+
+
+# Instantánea compartida por todas las vistas y scripts del proceso
+_instantanea = None
+_lock = threading.Lock()
+
+
+def obtener_instantanea(forzar=False):
+    """
+    Retorna la instantánea compartida, recargándola solo si 'bienes' cambió
+    desde la última carga, si se cambió de base de datos o, siempre, si la BD
+    no tiene contador de cambios.
+    """
+    global _instantanea
+    with _lock:
+        conn = create_connection()
+        try:
+            version = version_bienes(conn)
+            if (forzar or _instantanea is None or version is None
+                    or _instantanea.version != version or _instantanea.ruta != database._DB_PATH):
+                _instantanea = Instantanea.cargar(conn)
+        finally:
+            conn.close()
+        return _instantanea
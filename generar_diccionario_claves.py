@@ -9,9 +9,11 @@ from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
 from reportlab.lib.units import cm
 from reportlab.lib.colors import black, gray
-from utils.barcode_generator import OFFICE_KEYS
+from utils.barcode_generator import OFFICE_KEYS, reporte_colisiones
+from db.database import create_connection
 from datetime import datetime
 import os
+import sqlite3
 
 
 def generar_diccionario_pdf(output_dir="assets/generated_barcodes"):
@@ -121,6 +123,26 @@ def generar_diccionario_pdf(output_dir="assets/generated_barcodes"):
     return output_path
 
 
+def mostrar_colisiones():
+    """Muestra las oficinas de la BD sin clave propia cuya clave generada choca con otra."""
+    conn = create_connection()
+    try:
+        oficinas = [row[0] for row in conn.execute("SELECT DISTINCT oficina FROM bienes")]
+    except sqlite3.OperationalError:
+        # Sin tabla 'bienes' todavía
+        oficinas = []
+    finally:
+        conn.close()
+
+    colisiones = reporte_colisiones(oficinas)
+    if not colisiones:
+        print("✅ Sin colisiones de claves generadas")
+        return
+    print(f"⚠️ Claves generadas que no identifican a una sola oficina: {len(colisiones)}")
+    for clave, nombres in colisiones.items():
+        print(f"   {clave}: {', '.join(nombres)}")
+
+
 if __name__ == "__main__":
     print("=" * 50)
     print("  GENERADOR DE DICCIONARIO DE CLAVES")
@@ -136,4 +158,6 @@ if __name__ == "__main__":
     print(f"✅ PDF generado exitosamente:")
     print(f"   {output}")
     print()
+    mostrar_colisiones()
+    print()
     print("=" * 50)
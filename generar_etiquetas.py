@@ -0,0 +1,264 @@
+"""
+Generación de etiquetas por lotes, sin interfaz gráfica.
+
+Toma los bienes de la base de datos (mismos filtros que la UI: oficina, tipo
+de registro, búsqueda o una lista de códigos) y genera el PDF con
+`generate_barcodes_pdf`. El progreso y los tiempos se escriben en stdout como
+líneas JSON, una por evento, para poder programarlo y monitorearlo.
+
+Uso:
+    python generar_etiquetas.py --oficina "DGA-PATRIMONIO" --oficina "DIRECCIÓN"
+    python generar_etiquetas.py --tipo SOBRANTE --por-oficina --workers 4
+    python generar_etiquetas.py --oficina "DIRECCIÓN" --copias 2   # bien + acta
+    python generar_etiquetas.py --codigos codigos.txt --salida /srv/etiquetas/ --layout ROLLO_59x30
+    python generar_etiquetas.py --buscar silla --workers 4 --modo 1
+    python generar_etiquetas.py --oficina "DIRECCIÓN" --formato zpl --impresora tcp://192.168.1.50:9100
+    python generar_etiquetas.py --tipo SOBRANTE --verificar      # lee cada código del PDF generado
+    python generar_etiquetas.py --pendientes --por-oficina        # solo bienes corregidos desde su última impresión
+    python generar_etiquetas.py --desde-impresion 12              # lo que cambió después de la impresión 12
+
+Cada archivo generado queda registrado como impresión (db/auditoria.py), salvo
+con --no-registrar; su id sale en el evento "archivo".
+
+Eventos: inicio, progreso, archivo, verificacion, error, fin.
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import db.database as database
+from db.auditoria import codigos_cambiados_desde, pendientes_reimpresion, registrar_impresion, ultimo_cambio
+from db.database import buscar_bienes, create_connection
+from utils.plantillas import LAYOUT_PREDETERMINADO, LAYOUTS
+
+FORMATOS = ("pdf", "zpl", "epl")
+
+COLUMNAS = ("codigo_completo", "detalle_bien", "tipo_registro", "oficina")
+SALIDA = "assets/generated_barcodes/"
+
+
+def emitir(evento, **datos):
+    """Escribe un evento como una línea JSON en stdout."""
+    print(json.dumps({"evento": evento, "t": round(time.time(), 3), **datos}, ensure_ascii=False),
+          flush=True)
+
+
+def leer_codigos(ruta):
+    """Lee una lista de códigos completos (uno por línea; ignora vacías y # comentarios)."""
+    with open(ruta, encoding="utf-8") as f:
+        return [linea.strip() for linea in f if linea.strip() and not linea.startswith("#")]
+
+
+def consultar_registros(oficinas=None, tipos=None, buscar=None, codigos=None):
+    """
+    Retorna las tuplas (codigo, detalle, tipo, oficina) que cumplen todos los
+    filtros, ordenadas por oficina como en la UI (para que los separadores
+    queden agrupados).
+    """
+    if buscar:
+        rows = buscar_bienes(buscar, COLUMNAS)
+    else:
+        conn = create_connection()
+        rows = conn.execute(f"SELECT {', '.join(COLUMNAS)} FROM bienes").fetchall()
+        conn.close()
+
+    if oficinas:
+        oficinas = {o.strip().upper() for o in oficinas}
+        rows = [r for r in rows if str(r[3]).strip().upper() in oficinas]
+    if tipos:
+        tipos = {t.strip().upper() for t in tipos}
+        rows = [r for r in rows if str(r[2]).strip().upper() in tipos]
+    if codigos is not None:
+        orden = {codigo: i for i, codigo in enumerate(codigos)}
+        rows = [r for r in rows if r[0] in orden]
+        rows.sort(key=lambda r: orden[r[0]])
+
+    rows.sort(key=lambda r: r[3] or "")
+    return rows
+
+
+def nombre_archivo(texto):
+    """
+    Convierte un nombre de oficina o filtro en un sufijo de archivo seguro
+    (los bienes sin oficina van a SIN_OFICINA).
+    """
+    if texto is None:
+        return "SIN_OFICINA"
+    return re.sub(r"[^\w\-]+", "_", texto).strip("_") or "SIN_OFICINA"
+
+
+def _generar(records, salida, sufijo, workers, modo="L", layout=None, copias=1, formato="pdf",
+             dpi=None, impresora=None):
+    # Import diferido: reportlab/PIL solo se cargan en el proceso que renderiza
+    from utils.barcode_generator import generate_barcodes_pdf
+    from utils import termica
+
+    inicio = time.perf_counter()
+    ultimo = [0.0]
+
+    def on_progress(actual, total):
+        # Como mucho un evento por segundo, más el último
+        ahora = time.perf_counter()
+        if actual == total or ahora - ultimo[0] >= 1:
+            ultimo[0] = ahora
+            emitir("progreso", archivo=sufijo, actual=actual, total=total,
+                   segundos=round(ahora - inicio, 3))
+
+    if formato != "pdf":
+        # Impresora térmica: comandos nativos a un archivo o directo a la impresora
+        datos = termica.generar_comandos(records, formato=formato, dpi=dpi or termica.DPI_TERMICA,
+                                         copias=copias, progress_callback=on_progress)
+        ruta = impresora or os.path.join(salida, f"etiquetas_{sufijo}.{formato}")
+        if not impresora:
+            os.makedirs(salida, exist_ok=True)
+        termica.enviar(datos, ruta)
+        return ruta, time.perf_counter() - inicio
+
+    ruta = generate_barcodes_pdf(records, output_pdf=salida, progress_callback=on_progress,
+                                 selected_office=sufijo, max_workers=workers, modo=modo,
+                                 layout=layout, copias=copias)
+    return ruta, time.perf_counter() - inicio
+
+
+def _verificar(ruta, lote, nombre, copias, workers):
+    """Lee de vuelta los códigos del PDF y emite el resumen; retorna cuántas etiquetas fallaron."""
+    from utils.verificacion import resumen, verificar_pdf
+
+    inicio = time.perf_counter()
+    reporte = verificar_pdf(ruta, lote, copias=copias, workers=workers)
+    fallas = [{"casilla": f["casilla"], "esperado": f["esperado"], "leido": f["valor"], "estado": f["estado"]}
+              for f in reporte if f["estado"] != "OK"]
+    emitir("verificacion", lote=nombre, ruta=ruta, casillas=len(reporte), estados=resumen(reporte),
+           fallas=fallas, segundos=round(time.perf_counter() - inicio, 3))
+    return len(fallas)
+
+
+def _registrar(args, lote, nombre, marca):
+    """Registra el lote como impresión; retorna su id (None con --no-registrar)."""
+    if args.no_registrar:
+        return None
+    return registrar_impresion(lote, f"{args.formato} {nombre}", marca)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera PDFs de etiquetas sin interfaz gráfica")
+    parser.add_argument("--oficina", action="append", help="oficina a incluir (repetible)")
+    parser.add_argument("--tipo", action="append", help="tipo de registro: SIGA, SOBRANTE, ... (repetible)")
+    parser.add_argument("--buscar", help="texto a buscar, como el buscador de la UI")
+    parser.add_argument("--codigos", help="archivo con un código completo por línea")
+    parser.add_argument("--workers", type=int, default=1, help="procesos para renderizar")
+    parser.add_argument("--modo", choices=("L", "1"), default="L",
+                        help="render: L = grises (actual), 1 = blanco y negro de 1 bit (PDF más liviano)")
+    parser.add_argument("--layout", choices=list(LAYOUTS), default=LAYOUT_PREDETERMINADO,
+                        help="formato de hoja (ver utils/plantillas.py)")
+    parser.add_argument("--copias", type=int, default=1, help="etiquetas por bien (se renderiza una vez)")
+    parser.add_argument("--formato", choices=FORMATOS, default="pdf",
+                        help="pdf = hoja A4 (actual); zpl / epl = comandos para impresora térmica")
+    parser.add_argument("--dpi", type=int, help="resolución de la impresora térmica (por defecto 203)")
+    parser.add_argument("--impresora", help="enviar zpl/epl a la impresora (tcp://host:9100) en vez de a un archivo")
+    parser.add_argument("--verificar", action="store_true",
+                        help="leer de vuelta cada código del PDF y compararlo con el esperado")
+    parser.add_argument("--pendientes", action="store_true",
+                        help="solo bienes con cambios de etiqueta aún no reimpresos")
+    parser.add_argument("--desde-impresion", type=int, metavar="ID",
+                        help="solo bienes cuya etiqueta cambió después de esa impresión")
+    parser.add_argument("--no-registrar", action="store_true",
+                        help="no registrar los archivos generados como impresiones")
+    parser.add_argument("--salida", default=SALIDA, help="directorio de salida")
+    parser.add_argument("--por-oficina", action="store_true", help="un PDF por oficina")
+    parser.add_argument("--db", help="base de datos a usar (por defecto inventario.db)")
+    args = parser.parse_args(argv)
+    if args.db:
+        database._DB_PATH = args.db
+
+    inicio = time.perf_counter()
+    database.create_table()
+    # Marca tomada antes de leer los registros: lo que cambie durante la impresión sigue pendiente
+    marca = ultimo_cambio()
+    codigos = leer_codigos(args.codigos) if args.codigos else None
+    if args.pendientes or args.desde_impresion is not None:
+        try:
+            cambiados = (pendientes_reimpresion() if args.pendientes
+                         else codigos_cambiados_desde(args.desde_impresion))
+        except ValueError as e:
+            emitir("error", error=str(e))
+            return 1
+        if codigos is None:
+            codigos = cambiados
+        else:
+            cambiados = set(cambiados)
+            codigos = [c for c in codigos if c in cambiados]
+    records = consultar_registros(args.oficina, args.tipo, args.buscar, codigos)
+
+    faltantes = []
+    if args.codigos:
+        encontrados = {r[0] for r in records}
+        faltantes = [c for c in codigos if c not in encontrados]
+
+    emitir("inicio", registros=len(records), codigos_no_encontrados=faltantes,
+           filtros={"oficina": args.oficina, "tipo": args.tipo, "buscar": args.buscar,
+                    "codigos": args.codigos}, workers=args.workers, por_oficina=args.por_oficina,
+           modo=args.modo, layout=args.layout, copias=args.copias, formato=args.formato,
+           pendientes=args.pendientes, desde_impresion=args.desde_impresion)
+    if not records:
+        emitir("fin", archivos=0, etiquetas=0, segundos=round(time.perf_counter() - inicio, 3))
+        return 1
+
+    salida = os.path.join(args.salida, "")
+    if args.por_oficina:
+        lotes = {}
+        for record in records:
+            lotes.setdefault(record[3], []).append(record)
+    else:
+        sufijo = "_".join(args.oficina) if args.oficina and len(args.oficina) <= 3 else "LOTE"
+        lotes = {sufijo: records}
+
+    errores = fallas = 0
+    verificar = args.verificar and args.formato == "pdf"
+    if args.por_oficina and args.workers > 1:
+        # Un PDF por proceso; cada uno renderiza en serie
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            futuros = {executor.submit(_generar, lote, salida, nombre_archivo(oficina), None,
+                                       args.modo, args.layout, args.copias, args.formato,
+                                       args.dpi, args.impresora): oficina
+                       for oficina, lote in lotes.items()}
+            for futuro in as_completed(futuros):
+                oficina = futuros[futuro]
+                try:
+                    ruta, segundos = futuro.result()
+                    emitir("archivo", lote=oficina, ruta=ruta, etiquetas=len(lotes[oficina]),
+                           segundos=round(segundos, 3),
+                           impresion=_registrar(args, lotes[oficina], oficina, marca))
+                    if verificar:
+                        fallas += _verificar(ruta, lotes[oficina], oficina, args.copias, args.workers)
+                except Exception as e:
+                    errores += 1
+                    emitir("error", lote=oficina, error=str(e))
+    else:
+        for oficina, lote in lotes.items():
+            try:
+                ruta, segundos = _generar(lote, salida, nombre_archivo(oficina), args.workers,
+                                          args.modo, args.layout, args.copias, args.formato,
+                                          args.dpi, args.impresora)
+                emitir("archivo", lote=oficina, ruta=ruta, etiquetas=len(lote),
+                       segundos=round(segundos, 3), impresion=_registrar(args, lote, oficina, marca))
+                if verificar:
+                    fallas += _verificar(ruta, lote, oficina, args.copias, args.workers)
+            except Exception as e:
+                errores += 1
+                emitir("error", lote=oficina, error=str(e))
+
+    total = time.perf_counter() - inicio
+    extra = {"etiquetas_con_fallas": fallas} if verificar else {}
+    emitir("fin", archivos=len(lotes) - errores, errores=errores, etiquetas=len(records),
+           segundos=round(total, 3), etiquetas_por_segundo=round(len(records) / total, 2), **extra)
+    return 1 if errores or fallas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -11,7 +11,7 @@ from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
 from reportlab.lib.units import cm
 from reportlab.lib.colors import black, gray
-from db.database import create_connection
+from db.instantanea import obtener_instantanea
 from datetime import datetime
 import os
 import re
@@ -119,21 +119,9 @@ def obtener_responsables_limpios():
     Obtiene la lista de responsables desde la BD y los limpia.
     Retorna un diccionario con responsables únicos y cantidad de bienes asignados.
     """
-    conn = create_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        SELECT responsable, oficina, COUNT(*) as cantidad
-        FROM bienes 
-        WHERE responsable IS NOT NULL 
-          AND responsable != '' 
-          AND responsable != 'nan'
-        GROUP BY responsable, oficina
-        ORDER BY responsable, oficina
-    """)
-    
-    resultados = cursor.fetchall()
-    conn.close()
+    inventario = obtener_instantanea()
+    con_responsable = ~inventario.filtrar(responsable=[None, "", "nan"])
+    resultados = inventario.contar_por(("responsable", "oficina"), con_responsable)
     
     # Diccionario para agrupar por responsable limpio
     responsables = {}
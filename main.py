@@ -1,35 +1,64 @@
-from data.load_excel import load_excel_to_db
+import sys
+import time
+
+_INICIO = time.perf_counter()
+
+from utils import perfil
+
+from db.database import create_table, importacion_vigente
 from ui.app_ui import InventoryApp
 
+EXCEL_INVENTARIO = "excel/INVENTARIO_UNIFICADO_20251229_091703.xlsx"
+HOJA_INVENTARIO = "Inventario Completo"
+
+
+class TiemposArranque:
+    """Registra cuánto tarda cada etapa del arranque hasta ver la ventana."""
+
+    def __init__(self, inicio):
+        self.inicio = inicio
+        self.ultimo = inicio
+        self.etapas = []
+
+    def marcar(self, etapa):
+        ahora = time.perf_counter()
+        self.etapas.append((etapa, ahora - self.ultimo))
+        self.ultimo = ahora
+
+    def reporte(self):
+        print("⏱️  Tiempo de arranque:")
+        for etapa, segundos in self.etapas:
+            print(f"   {etapa:<28} {segundos:.3f}s")
+        print(f"   {'TOTAL (primera ventana)':<28} {self.ultimo - self.inicio:.3f}s")
+
+
 if __name__ == "__main__":
-    # 1️⃣ Cargar Excel a la base de datos (solo una vez)
-    # anexo 01
-    # load_excel_to_db("ANEXOS 01 - BIENES Y MUEBLES EN USO - SIGA TOTAL 2024.xlsx",
-    #                 sheet_name="1 MUEBLES", header=5, tipo_registro="SIGA")
-
-    # load_excel_to_db("ANEXOS 01 - BIENES Y MUEBLES EN USO - SIGA TOTAL 2024.xlsx",
-    #                sheet_name="2 MUEBLES OK ", header=3, tipo_registro="SIGA")
-
-    # anexo 02
-    # load_excel_to_db("ANEXOS 02 - MAQUINARIA Y EQUIPO  EN USO - SIGA TOTAL 2024.xlsx",
-    #               sheet_name="2 MAQ.", header=5, tipo_registro="SIGA")
-    # load_excel_to_db("ANEXOS 02 - MAQUINARIA Y EQUIPO  EN USO - SIGA TOTAL 2024.xlsx",
-    #              sheet_name="3. MAQ.", header=3, tipo_registro="SIGA")
-
-    # anexo 03
-    # load_excel_to_db("ANEXOS 03 - MUEBLES EN USO - SOBRANTES TOTAL 2024.xlsx",
-    #             sheet_name="TOTAL MUBLS", header=5, tipo_registro="SOBRANTE")
-    # load_excel_to_db("ANEXOS 03 - MUEBLES EN USO - SOBRANTES TOTAL 2024.xlsx",
-    #            sheet_name="MUEBLES TOT", header=0, tipo_registro="SOBRANTE")
-
-    # anexo 04
-    # load_excel_to_db("ANEXOS 04- MAQUINARIA - SOBRANTES TOTAL 2024 a.xlsx",
-    #           sheet_name="MAQUI.SOBRANTES", header=5, tipo_registro="SOBRANTE")
-    # load_excel_to_db("ANEXOS 04- MAQUINARIA - SOBRANTES TOTAL 2024 a.xlsx",
-    #          sheet_name="SOBRNT.", header=0, tipo_registro="SOBRANTE")
-
-    load_excel_to_db("excel/INVENTARIO_UNIFICADO_20251229_091703.xlsx", sheet_name="Inventario Completo", header=0)
+    tiempos = TiemposArranque(_INICIO)
+    tiempos.marcar("imports")
+
+    # --perfil: reporte por etapa de cada PDF generado (ver utils/perfil.py)
+    if "--perfil" in sys.argv:
+        perfil.activar()
+
+    # 1️⃣ Asegurar la BD; la interfaz abre directamente desde lo ya cargado
+    # Los anexos 01-04 (SIGA / SOBRANTES) se importan por lotes con:
+    #   python -m data.importar_anexos [manifiesto.json]
+    create_table()
+    tiempos.marcar("create_table")
 
     # 2️⃣ Ejecutar interfaz
-    app = InventoryApp()
+    app = InventoryApp(excel_path=EXCEL_INVENTARIO, sheet_name=HOJA_INVENTARIO, header=0)
+    tiempos.marcar("InventoryApp()")
+
+    # 3️⃣ Reimportar en segundo plano solo si el Excel cambió desde la última carga
+    vigente = importacion_vigente(EXCEL_INVENTARIO, HOJA_INVENTARIO)
+    tiempos.marcar("huella del Excel")
+    if not vigente:
+        app.reimportar_excel()
+
+    def primera_ventana():
+        tiempos.marcar("primera ventana")
+        tiempos.reporte()
+
+    app.after_idle(primera_ventana)
     app.mainloop()
@@ -0,0 +1,409 @@
+"""
+Servicio local de etiquetas para varias estaciones de trabajo.
+
+Expone por HTTP (solo localhost por defecto) una cola de trabajos de impresión
+atendida por un pool de hilos. Todas las estaciones comparten una misma caché
+de etiquetas renderizadas, así una etiqueta que ya se generó no se vuelve a
+dibujar. Dos trabajos idénticos enviados mientras el primero sigue en cola o
+en proceso se unifican en uno solo.
+
+Endpoints:
+    POST /trabajos              cuerpo JSON: oficinas, tipos, buscar, codigos, modo, layout, copias,
+                                prioridad, registrar
+                                -> 202 {"id", "estado", "duplicado"}  (400 si algún campo no tiene el
+                                tipo esperado, 503 si la cola está llena)
+    GET  /trabajos              lista de trabajos
+    GET  /trabajos/<id>         estado y progreso
+    GET  /trabajos/<id>/pdf     descarga del PDF terminado
+    GET  /salud                 cola, workers y estadísticas de la caché
+
+Los trabajos terminados (y sus PDF) se conservan hasta que haya más de
+`--retener` o pasen `--ttl` segundos; después el PDF se borra y el trabajo deja
+de figurar (GET -> 404). Al iniciar se borran los PDF del servicio que ya
+superaban el TTL.
+
+La prioridad menor se atiende primero (por defecto 5). Cada PDF terminado
+queda registrado como impresión (db/auditoria.py), salvo con "registrar": false;
+su id queda en el campo "impresion" del trabajo.
+
+Uso:
+    python servicio_etiquetas.py --puerto 8765 --workers 2 --retener 200 --ttl 86400
+    curl -X POST localhost:8765/trabajos -d '{"oficinas": ["DGA-PATRIMONIO"]}'
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import queue
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import db.database as database
+from db.auditoria import registrar_impresion, ultimo_cambio
+from generar_etiquetas import consultar_registros
+from utils.plantillas import LAYOUTS
+
+SALIDA = "assets/generated_barcodes/servicio/"
+PRIORIDAD = 5
+RETENER = 200          # trabajos terminados que se conservan
+TTL = 24 * 3600        # segundos que se conserva un trabajo terminado
+_PDF_SERVICIO = re.compile(r"codigos_barras_[0-9a-f]{12}\.pdf$")
+_TERMINADOS = ("listo", "error")
+
+
+class CacheEtiquetas:
+    """Caché LRU de PNG renderizados, compartida entre hilos."""
+
+    def __init__(self, max_items=5000):
+        self.max_items = max_items
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+        self._en_curso = {}  # clave -> threading.Event de quien la está renderizando
+        self.aciertos = 0
+        self.fallos = 0
+
+    def get(self, clave):
+        with self._lock:
+            png = self._datos.get(clave)
+            if png is None:
+                self.fallos += 1
+                return None
+            self._datos.move_to_end(clave)
+            self.aciertos += 1
+            return png
+
+    def __setitem__(self, clave, png):
+        with self._lock:
+            self._datos[clave] = png
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_items:
+                self._datos.popitem(last=False)
+
+    def obtener(self, clave, generar):
+        """
+        PNG de `clave`; si no está lo genera con `generar()`. Si otro hilo ya
+        lo está generando se espera a ese resultado en lugar de repetirlo.
+        """
+        while True:
+            with self._lock:
+                png = self._datos.get(clave)
+                if png is not None:
+                    self._datos.move_to_end(clave)
+                    self.aciertos += 1
+                    return png
+                evento = self._en_curso.get(clave)
+                if evento is None:
+                    evento = self._en_curso[clave] = threading.Event()
+                    self.fallos += 1
+                    break
+            # Si el que lo generaba falló, el siguiente reintenta
+            evento.wait()
+        try:
+            png = generar()
+            self[clave] = png
+            return png
+        finally:
+            with self._lock:
+                del self._en_curso[clave]
+            evento.set()
+
+    def estadisticas(self):
+        with self._lock:
+            return {"items": len(self._datos), "aciertos": self.aciertos, "fallos": self.fallos,
+                    "bytes": sum(len(png) for png in self._datos.values())}
+
+
+_LISTAS = ("oficinas", "tipos", "codigos")
+_ENTEROS = ("copias", "prioridad")
+
+
+def validar_spec(spec):
+    """Lanza ValueError si los campos del trabajo no tienen el tipo esperado."""
+    for campo in _LISTAS:
+        valor = spec.get(campo)
+        if valor is not None and not (isinstance(valor, list) and all(isinstance(v, str) for v in valor)):
+            raise ValueError(f"'{campo}' debe ser una lista de textos")
+    for campo in _ENTEROS:
+        valor = spec.get(campo)
+        if valor is not None and (isinstance(valor, bool) or not isinstance(valor, int)):
+            raise ValueError(f"'{campo}' debe ser un número entero")
+    if spec.get("copias") is not None and spec["copias"] < 1:
+        raise ValueError("'copias' debe ser al menos 1")
+    if spec.get("buscar") is not None and not isinstance(spec["buscar"], str):
+        raise ValueError("'buscar' debe ser un texto")
+    if spec.get("registrar") is not None and not isinstance(spec["registrar"], bool):
+        raise ValueError("'registrar' debe ser true o false")
+    if spec.get("modo", "L") not in ("L", "1"):
+        raise ValueError("modo debe ser 'L' o '1'")
+    if spec.get("layout") and spec["layout"] not in LAYOUTS:
+        raise ValueError(f"layout desconocido; opciones: {', '.join(LAYOUTS)}")
+
+
+def clave_trabajo(spec):
+    """Huella de un trabajo: mismos filtros (sin importar el orden) = mismo trabajo."""
+    normal = {
+        "oficinas": sorted(o.strip().upper() for o in spec.get("oficinas") or []),
+        "tipos": sorted(t.strip().upper() for t in spec.get("tipos") or []),
+        "buscar": (spec.get("buscar") or "").strip().lower(),
+        "codigos": spec.get("codigos") or None,
+        "modo": spec.get("modo") or "L",
+        "layout": spec.get("layout") or None,
+        "copias": int(spec.get("copias") or 1),
+        "registrar": spec.get("registrar") is not False,
+    }
+    return hashlib.sha256(json.dumps(normal, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _borrar(ruta):
+    try:
+        os.remove(ruta)
+    except OSError:
+        pass
+
+
+class ServicioEtiquetas:
+    """
+    Cola de trabajos con prioridad, deduplicación y pool de workers.
+    Los dict de `trabajos` solo se leen o modifican con `_lock` tomado.
+    """
+
+    def __init__(self, workers=2, max_cola=50, salida=SALIDA, cache=None, retener=RETENER, ttl=TTL):
+        self.salida = os.path.join(salida, "")
+        self.cache = cache if cache is not None else CacheEtiquetas()
+        self.cola = queue.PriorityQueue(maxsize=max_cola)
+        self.retener = retener
+        self.ttl = ttl
+        self.trabajos = {}   # id -> dict de estado
+        self.activos = {}    # clave -> id (trabajos en cola o en proceso)
+        self._lock = threading.Lock()
+        self._limpiar_salida()
+        self._secuencia = itertools.count()
+        self._hilos = [threading.Thread(target=self._worker, daemon=True, name=f"etiquetas-{i}")
+                       for i in range(workers)]
+        for hilo in self._hilos:
+            hilo.start()
+
+    def enviar(self, spec):
+        """
+        Encola un trabajo. Retorna (copia del estado del trabajo, duplicado).
+        Lanza ValueError si la spec no es válida y queue.Full si la cola está llena.
+        """
+        validar_spec(spec)
+        clave = clave_trabajo(spec)
+        with self._lock:
+            if clave in self.activos:
+                return dict(self.trabajos[self.activos[clave]]), True
+
+            trabajo = {"id": uuid.uuid4().hex[:12], "estado": "en_cola", "spec": spec,
+                       "prioridad": int(spec.get("prioridad", PRIORIDAD)),
+                       "creado": time.time(), "terminado": None, "actual": 0, "total": 0,
+                       "registros": None, "ruta": None, "impresion": None, "error": None,
+                       "segundos": None}
+            self.cola.put_nowait((trabajo["prioridad"], next(self._secuencia), trabajo["id"]))
+            self.trabajos[trabajo["id"]] = trabajo
+            self.activos[clave] = trabajo["id"]
+            return dict(trabajo), False
+
+    def estado(self, trabajo_id):
+        with self._lock:
+            self._podar()
+            trabajo = self.trabajos.get(trabajo_id)
+            return dict(trabajo) if trabajo else None
+
+    def listar(self):
+        """Copia del estado de todos los trabajos vigentes."""
+        with self._lock:
+            self._podar()
+            return [dict(t) for t in self.trabajos.values()]
+
+    def _actualizar(self, trabajo, **campos):
+        with self._lock:
+            trabajo.update(campos)
+
+    def _podar(self):
+        """
+        Olvida los trabajos terminados que superaron el TTL o exceden
+        `retener` (los más viejos primero) y borra sus PDF. Se llama con `_lock`.
+        """
+        terminados = sorted((t for t in self.trabajos.values() if t["estado"] in _TERMINADOS),
+                            key=lambda t: t["terminado"])
+        limite = time.time() - self.ttl
+        sobran = len(terminados) - self.retener
+        for i, trabajo in enumerate(terminados):
+            if i >= sobran and trabajo["terminado"] >= limite:
+                break
+            del self.trabajos[trabajo["id"]]
+            if trabajo["ruta"]:
+                _borrar(trabajo["ruta"])
+
+    def _limpiar_salida(self):
+        """Borra los PDF de ejecuciones anteriores del servicio que ya superaron el TTL."""
+        if not os.path.isdir(self.salida):
+            return
+        limite = time.time() - self.ttl
+        for nombre in os.listdir(self.salida):
+            ruta = os.path.join(self.salida, nombre)
+            if _PDF_SERVICIO.match(nombre) and os.path.getmtime(ruta) < limite:
+                _borrar(ruta)
+
+    def _worker(self):
+        from utils.barcode_generator import generate_barcodes_pdf
+
+        while True:
+            _, _, trabajo_id = self.cola.get()
+            with self._lock:
+                trabajo = self.trabajos[trabajo_id]
+                spec = trabajo["spec"]
+                trabajo["estado"] = "procesando"
+            inicio = time.perf_counter()
+            campos = {}
+            try:
+                # Tomada antes de leer: un cambio durante la generación queda pendiente
+                marca = ultimo_cambio()
+                records = consultar_registros(spec.get("oficinas"), spec.get("tipos"),
+                                              spec.get("buscar"), spec.get("codigos"))
+                self._actualizar(trabajo, registros=len(records))
+                if not records:
+                    raise ValueError("No hay registros para los filtros indicados")
+
+                def on_progress(actual, total):
+                    self._actualizar(trabajo, actual=actual, total=total)
+
+                campos["ruta"] = generate_barcodes_pdf(
+                    records, output_pdf=self.salida, progress_callback=on_progress,
+                    selected_office=trabajo_id, render_cache=self.cache, modo=spec.get("modo", "L"),
+                    layout=spec.get("layout"), copias=int(spec.get("copias") or 1))
+                if spec.get("registrar") is not False:
+                    campos["impresion"] = registrar_impresion(records, f"servicio {trabajo_id}", marca)
+                campos["estado"] = "listo"
+            except Exception as e:
+                campos.update(estado="error", error=str(e))
+            finally:
+                campos["segundos"] = round(time.perf_counter() - inicio, 3)
+                campos["terminado"] = time.time()
+                with self._lock:
+                    trabajo.update(campos)
+                    self.activos.pop(clave_trabajo(spec), None)
+                    self._podar()
+                self.cola.task_done()
+
+    def salud(self):
+        with self._lock:
+            self._podar()
+            estados = {}
+            for trabajo in self.trabajos.values():
+                estados[trabajo["estado"]] = estados.get(trabajo["estado"], 0) + 1
+        return {"cola": self.cola.qsize(), "max_cola": self.cola.maxsize,
+                "workers": len(self._hilos), "trabajos": estados, "cache": self.cache.estadisticas()}
+
+
+def _publico(trabajo):
+    return {k: v for k, v in trabajo.items() if k != "spec"} | {"filtros": trabajo["spec"]}
+
+
+def crear_handler(servicio):
+    class Handler(BaseHTTPRequestHandler):
+        def _json(self, codigo, datos):
+            cuerpo = json.dumps(datos, ensure_ascii=False).encode("utf-8")
+            self.send_response(codigo)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def do_POST(self):
+            if self.path.rstrip("/") != "/trabajos":
+                return self._json(404, {"error": "ruta no encontrada"})
+            try:
+                largo = int(self.headers.get("Content-Length", 0))
+                spec = json.loads(self.rfile.read(largo) or b"{}")
+                if not isinstance(spec, dict):
+                    raise ValueError("se esperaba un objeto JSON")
+                trabajo, duplicado = servicio.enviar(spec)
+            except (ValueError, TypeError) as e:
+                return self._json(400, {"error": str(e)})
+            except queue.Full:
+                return self._json(503, {"error": "cola llena, intente más tarde"})
+            self._json(202, {"id": trabajo["id"], "estado": trabajo["estado"], "duplicado": duplicado})
+
+        def do_GET(self):
+            partes = [p for p in self.path.split("?")[0].split("/") if p]
+            if partes == ["salud"]:
+                return self._json(200, servicio.salud())
+            if partes == ["trabajos"]:
+                return self._json(200, [_publico(t) for t in servicio.listar()])
+            if len(partes) in (2, 3) and partes[0] == "trabajos":
+                trabajo = servicio.estado(partes[1])
+                if not trabajo:
+                    return self._json(404, {"error": "trabajo no encontrado"})
+                if len(partes) == 2:
+                    return self._json(200, _publico(trabajo))
+                if partes[2] == "pdf":
+                    if trabajo["estado"] != "listo":
+                        return self._json(409, {"error": f"trabajo en estado '{trabajo['estado']}'"})
+                    try:
+                        with open(trabajo["ruta"], "rb") as f:
+                            contenido = f.read()
+                    except FileNotFoundError:
+                        # Se podó entre la consulta del estado y la lectura
+                        return self._json(404, {"error": "trabajo no encontrado"})
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/pdf")
+                    self.send_header("Content-Disposition",
+                                     f'attachment; filename="etiquetas_{trabajo["id"]}.pdf"')
+                    self.send_header("Content-Length", str(len(contenido)))
+                    self.end_headers()
+                    self.wfile.write(contenido)
+                    return
+            self._json(404, {"error": "ruta no encontrada"})
+
+        def log_message(self, formato, *args):
+            print(f"🌐 {self.address_string()} {formato % args}")
+
+    return Handler
+
+
+def crear_servidor(host="127.0.0.1", puerto=8765, workers=2, max_cola=50, salida=SALIDA,
+                   retener=RETENER, ttl=TTL):
+    servicio = ServicioEtiquetas(workers=workers, max_cola=max_cola, salida=salida,
+                                 retener=retener, ttl=ttl)
+    servidor = ThreadingHTTPServer((host, puerto), crear_handler(servicio))
+    servidor.servicio = servicio
+    return servidor
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servicio local de generación de etiquetas")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--max-cola", type=int, default=50)
+    parser.add_argument("--salida", default=SALIDA)
+    parser.add_argument("--retener", type=int, default=RETENER,
+                        help="trabajos terminados que se conservan (con su PDF)")
+    parser.add_argument("--ttl", type=float, default=TTL,
+                        help="segundos que se conserva un trabajo terminado")
+    parser.add_argument("--db", help="base de datos a usar (por defecto inventario.db)")
+    args = parser.parse_args(argv)
+    if args.db:
+        database._DB_PATH = args.db
+
+    servidor = crear_servidor(args.host, args.puerto, args.workers, args.max_cola, args.salida,
+                              args.retener, args.ttl)
+    print(f"✅ Servicio de etiquetas en http://{args.host}:{servidor.server_address[1]}")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        print("\n⚠️ Servicio detenido")
+    finally:
+        servidor.server_close()
+
+
+if __name__ == "__main__":
+    main()
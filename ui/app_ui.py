@@ -1,8 +1,30 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
-from db.database import create_connection
-from utils.barcode_generator import generate_barcode, generate_barcodes_pdf
+from tkinter import ttk, messagebox, filedialog, simpledialog
+from db.auditoria import oficinas_pendientes, pendientes_reimpresion, registrar_impresion, ultimo_cambio
+from db.database import buscar_bienes
+from db.instantanea import obtener_instantanea
+from data.conteo import CONTADORES, DESCONOCIDO, ENCONTRADO, MAL_UBICADO, SesionConteo, listar_sesiones
 import threading
+import time
+
+# utils.barcode_generator (reportlab, PIL, python-barcode) se importa recién
+# al generar una etiqueta o un PDF, para que la ventana abra más rápido.
+
+
+# Oficinas con su conteo de bienes, compartidas por todas las vistas
+_oficinas_cache = None
+
+
+def cargar_oficinas(forzar=False):
+    """
+    Retorna [(oficina, cantidad)] ordenado por nombre.
+    El conteo se hace una sola vez sobre la instantánea y se reutiliza hasta que se fuerce.
+    """
+    global _oficinas_cache
+    if _oficinas_cache is None or forzar:
+        _oficinas_cache = [(oficina, cantidad) for oficina, cantidad in obtener_instantanea().contar("oficina")
+                           if oficina != ""]
+    return _oficinas_cache
 
 
 class AutoCompleteEntry(tk.Frame):
@@ -231,58 +253,68 @@ class MultiOfficeGeneratorView(ttk.Frame):
         
         self.canvas.bind("<Configure>", on_canvas_configure)
 
-        # Función de scroll con rueda del mouse
-        def _on_mousewheel(event):
-            if event.num == 4:  # Linux scroll up
-                self.canvas.yview_scroll(-1, "units")
-            elif event.num == 5:  # Linux scroll down
-                self.canvas.yview_scroll(1, "units")
-            else:  # Windows/Mac
-                self.canvas.yview_scroll(int(-1*(event.delta/120)), "units")
-
         # Vincular eventos de scroll al canvas y al frame scrollable
-        self.canvas.bind("<Button-4>", _on_mousewheel)
-        self.canvas.bind("<Button-5>", _on_mousewheel)
-        self.canvas.bind("<MouseWheel>", _on_mousewheel)
-        self.scrollable_frame.bind("<Button-4>", _on_mousewheel)
-        self.scrollable_frame.bind("<Button-5>", _on_mousewheel)
-        self.scrollable_frame.bind("<MouseWheel>", _on_mousewheel)
-        
-        # Vincular a todos los widgets hijos también
-        def bind_scroll_to_children(widget):
-            widget.bind("<Button-4>", _on_mousewheel)
-            widget.bind("<Button-5>", _on_mousewheel)
-            widget.bind("<MouseWheel>", _on_mousewheel)
-            for child in widget.winfo_children():
-                bind_scroll_to_children(child)
-        
-        # Checkboxes - mostrar nombre de oficina con conteo de bienes
+        self.canvas.bind("<Button-4>", self._on_mousewheel)
+        self.canvas.bind("<Button-5>", self._on_mousewheel)
+        self.canvas.bind("<MouseWheel>", self._on_mousewheel)
+        self.scrollable_frame.bind("<Button-4>", self._on_mousewheel)
+        self.scrollable_frame.bind("<Button-5>", self._on_mousewheel)
+        self.scrollable_frame.bind("<MouseWheel>", self._on_mousewheel)
+        
+        self._crear_checkboxes()
+            
+        # Botones Generar
+        gen_frame = ttk.Frame(self)
+        gen_frame.pack(pady=10)
+        ttk.Button(gen_frame, text="Generar PDF", command=self.on_generate).pack(side=tk.LEFT, padx=5)
+        ttk.Button(gen_frame, text="Reimprimir solo cambiados",
+                   command=self.on_reprint_changed).pack(side=tk.LEFT, padx=5)
+
+    def _on_mousewheel(self, event):
+        """Scroll con rueda del mouse."""
+        if event.num == 4:  # Linux scroll up
+            self.canvas.yview_scroll(-1, "units")
+        elif event.num == 5:  # Linux scroll down
+            self.canvas.yview_scroll(1, "units")
+        else:  # Windows/Mac
+            self.canvas.yview_scroll(int(-1*(event.delta/120)), "units")
+
+    def _crear_checkboxes(self):
+        """Checkboxes - mostrar nombre de oficina con conteo de bienes."""
+        for child in self.scrollable_frame.winfo_children():
+            child.destroy()
+        self.vars = []
+        self.checks = {}
+        
         for office, count in self.all_offices:
             var = tk.BooleanVar()
-            display_text = f"{office} ({count})"
-            chk = ttk.Checkbutton(self.scrollable_frame, text=display_text, variable=var)
+            chk = ttk.Checkbutton(self.scrollable_frame, text=f"{office} ({count})", variable=var)
+            self.checks[office] = (chk, count)
             chk.pack(anchor="w", padx=5, pady=2)
             # Vincular scroll a cada checkbox
-            chk.bind("<Button-4>", _on_mousewheel)
-            chk.bind("<Button-5>", _on_mousewheel)
-            chk.bind("<MouseWheel>", _on_mousewheel)
+            chk.bind("<Button-4>", self._on_mousewheel)
+            chk.bind("<Button-5>", self._on_mousewheel)
+            chk.bind("<MouseWheel>", self._on_mousewheel)
             self.vars.append((office, var))  # Guardamos solo el nombre de oficina (sin conteo)
-            
-        # Botón Generar
-        ttk.Button(self, text="Generar PDF", command=self.on_generate).pack(pady=10)
+        self._actualizar_pendientes()
+
+    def _actualizar_pendientes(self):
+        """Muestra junto a cada oficina cuántas etiquetas cambiaron desde su última impresión."""
+        pendientes = dict(oficinas_pendientes())
+        for office, (chk, count) in self.checks.items():
+            texto = f"{office} ({count})"
+            if pendientes.get(office):
+                texto += f" - {pendientes[office]} por reimprimir"
+            chk.config(text=texto)
+
+    def refrescar(self):
+        """Recarga las oficinas tras una reimportación."""
+        self.load_offices()
+        self._crear_checkboxes()
 
     def load_offices(self):
-        """Carga las oficinas únicas desde la BD junto con el conteo de bienes."""
-        conn = create_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            """SELECT oficina, COUNT(*) as cantidad 
-               FROM bienes 
-               WHERE oficina IS NOT NULL AND oficina != '' 
-               GROUP BY oficina 
-               ORDER BY oficina ASC""")
-        self.all_offices = [(row[0], row[1]) for row in cursor.fetchall()]
-        conn.close()
+        """Carga las oficinas únicas junto con el conteo de bienes."""
+        self.all_offices = cargar_oficinas()
         
     def select_all(self):
         for _, var in self.vars:
@@ -298,20 +330,10 @@ class MultiOfficeGeneratorView(ttk.Frame):
             messagebox.showwarning("Atención", "Selecciona al menos una oficina.")
             return
         
-        conn = create_connection()
-        cursor = conn.cursor()
-        
-        placeholders = ','.join(['?'] * len(selected_offices))
-        query = f"SELECT codigo_completo, codigo_patrimonial, codigo_interno, detalle_bien, descripcion, oficina, fuente, tipo_registro FROM bienes WHERE oficina IN ({placeholders}) ORDER BY oficina"
-        
-        cursor.execute(query, selected_offices)
-        rows = cursor.fetchall()
-        conn.close()
-
-        records = []
-        for row in rows:
-            # row indices: 0=codigo, 3=detalle, 5=oficina, 7=tipo_registro
-            records.append((row[0], row[3], row[7], row[5]))
+        marca = ultimo_cambio()
+        inventario = obtener_instantanea()
+        records = inventario.filas(("codigo_completo", "detalle_bien", "tipo_registro", "oficina"),
+                                   inventario.filtrar(oficina=selected_offices), orden="oficina")
 
         if not records:
             messagebox.showwarning("Atención", "No se encontraron registros para las oficinas seleccionadas.")
@@ -323,7 +345,25 @@ class MultiOfficeGeneratorView(ttk.Frame):
         office_label = "SELECCION_MULTIPLE"
         
         thread = threading.Thread(
-            target=self._generate_pdf_thread_custom, args=(records, office_label), daemon=True
+            target=self._generate_pdf_thread_custom, args=(records, office_label, marca), daemon=True
+        )
+        thread.start()
+
+    def on_reprint_changed(self):
+        """Genera solo las etiquetas que cambiaron desde su última impresión (oficinas marcadas o todas)."""
+        selected_offices = [office for office, var in self.vars if var.get()]
+        marca = ultimo_cambio()
+        codigos = pendientes_reimpresion(selected_offices or None)
+        if not codigos:
+            messagebox.showinfo("Reimpresión", "No hay etiquetas con cambios pendientes de reimprimir.")
+            return
+
+        inventario = obtener_instantanea()
+        records = inventario.filas(("codigo_completo", "detalle_bien", "tipo_registro", "oficina"),
+                                   inventario.filtrar(codigo_completo=codigos), orden="oficina")
+        self.show_progress_window(len(records))
+        thread = threading.Thread(
+            target=self._generate_pdf_thread_custom, args=(records, "REIMPRESION_CAMBIOS", marca), daemon=True
         )
         thread.start()
 
@@ -350,7 +390,7 @@ class MultiOfficeGeneratorView(ttk.Frame):
         self.progress_win.grab_set()
         self.update_idletasks()
 
-    def _generate_pdf_thread_custom(self, records, label):
+    def _generate_pdf_thread_custom(self, records, label, marca=None):
         def on_progress(current, total_steps):
             self.progress_bar["maximum"] = total_steps
             percent = int((current / total_steps) * 100)
@@ -358,16 +398,23 @@ class MultiOfficeGeneratorView(ttk.Frame):
             self.progress_label.config(text=f"{percent}%")
             self.progress_win.update_idletasks()
 
+        from utils.barcode_generator import generate_barcodes_pdf
         path = generate_barcodes_pdf(
             records, progress_callback=on_progress, 
             selected_office=label)
+        registrar_impresion(records, label, marca)
 
+        self.after(100, self._actualizar_pendientes)
         self.after(200, self.progress_win.destroy)
         self.after(300, lambda: messagebox.showinfo(
             "Éxito", f"PDF generado correctamente:\n{path}"))
 
 
 class InventoryView(ttk.Frame):
+    # Columnas de la tabla, en el orden de la instantánea (db/instantanea.py)
+    COLUMNAS = ("codigo_completo", "codigo_patrimonial", "codigo_interno", "detalle_bien",
+                "descripcion", "oficina", "responsable", "fuente", "tipo_registro")
+
     def __init__(self, parent):
         super().__init__(parent)
         
@@ -448,13 +495,14 @@ class InventoryView(ttk.Frame):
 
     # ======== 🏢 Cargar oficinas ========
     def load_offices(self):
-        """Carga las oficinas únicas desde la BD."""
-        conn = create_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT DISTINCT oficina FROM bienes WHERE oficina IS NOT NULL AND oficina != '' ORDER BY oficina ASC")
-        self.all_offices = [row[0] for row in cursor.fetchall()]
-        conn.close()
+        """Carga las oficinas únicas."""
+        self.all_offices = [oficina for oficina, _ in cargar_oficinas()]
+
+    def refrescar(self):
+        """Recarga oficinas y registros tras una reimportación."""
+        self.load_offices()
+        self.office_filter.lista = self.all_offices
+        self.load_data()
 
     # ======== 📦 Cargar datos ========
     def load_data(self):
@@ -462,13 +510,8 @@ class InventoryView(ttk.Frame):
         for item in self.tree.get_children():
             self.tree.delete(item)
 
-        conn = create_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT codigo_completo, codigo_patrimonial, codigo_interno, detalle_bien, descripcion, oficina, responsable, fuente, tipo_registro FROM bienes ORDER BY oficina")
-        for row in cursor.fetchall():
+        for row in obtener_instantanea().filas(self.COLUMNAS, orden="oficina"):
             self.tree.insert("", tk.END, values=row)
-        conn.close()
 
     # ======== 🔍 Filtro por oficina ========
     def filter_by_office(self, event=None):
@@ -480,15 +523,9 @@ class InventoryView(ttk.Frame):
         for item in self.tree.get_children():
             self.tree.delete(item)
 
-        conn = create_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT codigo_completo, codigo_patrimonial, codigo_interno, detalle_bien, descripcion, oficina, responsable, fuente, tipo_registro FROM bienes WHERE oficina = ?",
-            (selected_office,)
-        )
-        for row in cursor.fetchall():
+        inventario = obtener_instantanea()
+        for row in inventario.filas(self.COLUMNAS, inventario.filtrar(oficina=selected_office)):
             self.tree.insert("", tk.END, values=row)
-        conn.close()
     
     # ======== 🧾 Generar código de barras ========
     def generate_selected_barcode(self):
@@ -498,6 +535,7 @@ class InventoryView(ttk.Frame):
             return
         values = self.tree.item(selected, "values")
         codigo = values[0]
+        from utils.barcode_generator import generate_barcode
         path = generate_barcode(
             codigo,
             title=f"INVENTARIO DRE HUÁNUCO - 2025",
@@ -516,6 +554,7 @@ class InventoryView(ttk.Frame):
         if not selected_office:
             selected_office = "TODAS_LAS_OFICINAS"
         
+        marca = ultimo_cambio()
         records = []
         for item in self.tree.get_children():
             values = self.tree.item(item, "values")
@@ -531,11 +570,11 @@ class InventoryView(ttk.Frame):
 
         self.show_progress_window(len(records))
         thread = threading.Thread(
-            target=self._generate_pdf_thread, args=(records,), daemon=True
+            target=self._generate_pdf_thread, args=(records, selected_office, marca), daemon=True
         )
         thread.start()
 
-    def _generate_pdf_thread(self, records):
+    def _generate_pdf_thread(self, records, label=None, marca=None):
         def on_progress(current, total_steps):
             self.progress_bar["maximum"] = total_steps
             percent = int((current / total_steps) * 100)
@@ -543,9 +582,11 @@ class InventoryView(ttk.Frame):
             self.progress_label.config(text=f"{percent}%")
             self.progress_win.update_idletasks()
 
+        from utils.barcode_generator import generate_barcodes_pdf
         path = generate_barcodes_pdf(
             records, progress_callback=on_progress, 
             selected_office=self.office_filter.get())
+        registrar_impresion(records, label, marca)
 
         self.after(200, self.progress_win.destroy)
         self.after(300, lambda: messagebox.showinfo(
@@ -553,21 +594,12 @@ class InventoryView(ttk.Frame):
 
     # ======== 🔎 Buscador global ========
     def search_records(self, *args):
-        search_text = self.search_var.get().lower()
-
         for item in self.tree.get_children():
             self.tree.delete(item)
 
-        conn = create_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT codigo_completo, codigo_patrimonial, codigo_interno, detalle_bien, descripcion, oficina, responsable, fuente, tipo_registro FROM bienes")
-        rows = cursor.fetchall()
-        conn.close()
-
+        rows = buscar_bienes(self.search_var.get(), self.COLUMNAS)
         for row in rows:
-            if any(search_text in str(value).lower() for value in row):
-                self.tree.insert("", tk.END, values=row)
+            self.tree.insert("", tk.END, values=row)
 
     # ======== BARRA DE PROGRESO ========
     def show_progress_window(self, total):
@@ -595,6 +627,8 @@ class InventoryView(ttk.Frame):
 
 
 class BarcodeGeneratorView(ttk.Frame):
+    COLUMNAS = ("codigo_completo", "detalle_bien", "oficina", "tipo_registro")
+
     def __init__(self, parent):
         super().__init__(parent)
         self.all_offices = []
@@ -604,11 +638,13 @@ class BarcodeGeneratorView(ttk.Frame):
         self.load_data()
 
     def load_offices(self):
-        conn = create_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT DISTINCT oficina FROM bienes WHERE oficina IS NOT NULL AND oficina != '' ORDER BY oficina ASC")
-        self.all_offices = [row[0] for row in cursor.fetchall()]
-        conn.close()
+        self.all_offices = [oficina for oficina, _ in cargar_oficinas()]
+
+    def refrescar(self):
+        """Recarga oficinas y registros tras una reimportación."""
+        self.load_offices()
+        self.office_filter.lista = self.all_offices
+        self.load_data()
 
     def setup_ui(self):
         # Top: Filter
@@ -682,41 +718,30 @@ class BarcodeGeneratorView(ttk.Frame):
         ttk.Button(action_frame, text="Generar PDF", command=self.generate_pdf).pack(side=tk.RIGHT)
 
     def load_data(self):
-        self.update_source_tree("SELECT codigo_completo, detalle_bien, oficina, tipo_registro FROM bienes ORDER BY oficina")
+        self.update_source_tree(orden="oficina")
 
-    def update_source_tree(self, query, params=()):
+    def update_source_tree(self, mascara=None, orden=None):
         for item in self.tree_source.get_children():
             self.tree_source.delete(item)
-            
-        conn = create_connection()
-        cursor = conn.cursor()
-        cursor.execute(query, params)
-        for row in cursor.fetchall():
+
+        for row in obtener_instantanea().filas(self.COLUMNAS, mascara, orden):
             self.tree_source.insert("", tk.END, values=row)
-        conn.close()
 
     def filter_by_office(self, event=None):
         office = self.office_filter.get()
         if not office:
             self.load_data()
             return
-        self.update_source_tree("SELECT codigo_completo, detalle_bien, oficina, tipo_registro FROM bienes WHERE oficina = ?", (office,))
+        self.update_source_tree(obtener_instantanea().filtrar(oficina=office))
 
     def search_records(self, *args):
-        search = self.search_var.get().lower()
-        
-        conn = create_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT codigo_completo, detalle_bien, oficina, tipo_registro FROM bienes")
-        rows = cursor.fetchall()
-        conn.close()
+        rows = buscar_bienes(self.search_var.get(), self.COLUMNAS)
         
         for item in self.tree_source.get_children():
             self.tree_source.delete(item)
             
         for row in rows:
-            if any(search in str(v).lower() for v in row):
-                self.tree_source.insert("", tk.END, values=row)
+            self.tree_source.insert("", tk.END, values=row)
 
     def add_items(self):
         selected = self.tree_source.selection()
@@ -748,7 +773,7 @@ class BarcodeGeneratorView(ttk.Frame):
             return
             
         self.show_progress_window(len(items))
-        thread = threading.Thread(target=self._generate_pdf_thread, args=(items,), daemon=True)
+        thread = threading.Thread(target=self._generate_pdf_thread, args=(items, ultimo_cambio()), daemon=True)
         thread.start()
 
     def show_progress_window(self, total):
@@ -774,7 +799,7 @@ class BarcodeGeneratorView(ttk.Frame):
         self.progress_win.grab_set()
         self.update_idletasks()
         
-    def _generate_pdf_thread(self, records):
+    def _generate_pdf_thread(self, records, marca=None):
         def on_progress(current, total_steps):
             self.progress_bar["maximum"] = total_steps
             percent = int((current / total_steps) * 100)
@@ -782,31 +807,307 @@ class BarcodeGeneratorView(ttk.Frame):
             self.progress_label.config(text=f"{percent}%")
             self.progress_win.update_idletasks()
             
+        from utils.barcode_generator import generate_barcodes_pdf
         path = generate_barcodes_pdf(records, progress_callback=on_progress, selected_office="SELECCION_PERSONALIZADA")
+        registrar_impresion(records, "SELECCION_PERSONALIZADA", marca)
         
         self.after(200, self.progress_win.destroy)
         self.after(300, lambda: messagebox.showinfo(
             "Éxito", f"PDF generado correctamente:\n{path}"))
 
 
+class ConteoFisicoView(ttk.Frame):
+    """
+    Conteo físico con lectora de códigos tipo teclado: cada lectura llega al
+    Entry como texto + Enter. Solo se actualizan las filas de las oficinas
+    afectadas y la lista de últimas lecturas, así las ráfagas no traban la UI.
+    """
+
+    MAX_ULTIMAS = 200
+    COLORES = {ENCONTRADO: "#198754", MAL_UBICADO: "#fd7e14", DESCONOCIDO: "#dc3545"}
+
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.sesion = None
+        self.all_offices = []
+        self.load_offices()
+
+        # ======== Sesión ========
+        sesion_frame = ttk.LabelFrame(self, text="Sesión de conteo")
+        sesion_frame.pack(fill=tk.X, padx=10, pady=5)
+
+        ttk.Button(sesion_frame, text="Nueva sesión", command=self.nueva_sesion).pack(side=tk.LEFT, padx=5, pady=5)
+        self.sesiones_combo = ttk.Combobox(sesion_frame, state="readonly", width=45)
+        self.sesiones_combo.pack(side=tk.LEFT, padx=5)
+        ttk.Button(sesion_frame, text="Abrir", command=self.abrir_sesion).pack(side=tk.LEFT, padx=5)
+        self.sesion_label = ttk.Label(sesion_frame, text="Sin sesión abierta")
+        self.sesion_label.pack(side=tk.LEFT, padx=15)
+
+        # ======== Lectura ========
+        lectura_frame = ttk.Frame(self)
+        lectura_frame.pack(fill=tk.X, padx=10, pady=5)
+
+        ttk.Label(lectura_frame, text="Oficina donde se cuenta:").pack(side=tk.LEFT)
+        self.ubicacion_combo = ttk.Combobox(lectura_frame, values=self.all_offices, state="readonly", width=30)
+        self.ubicacion_combo.pack(side=tk.LEFT, padx=5)
+
+        ttk.Label(lectura_frame, text="Código:").pack(side=tk.LEFT, padx=(15, 5))
+        self.codigo_var = tk.StringVar()
+        self.codigo_entry = ttk.Entry(lectura_frame, textvariable=self.codigo_var, width=25)
+        self.codigo_entry.pack(side=tk.LEFT)
+        self.codigo_entry.bind("<Return>", self.on_scan)
+
+        ttk.Button(lectura_frame, text="Importar archivo de lectora...",
+                   command=self.importar_archivo).pack(side=tk.LEFT, padx=10)
+
+        self.ultimo_label = tk.Label(self, text="", font=("Arial", 14, "bold"), anchor="w")
+        self.ultimo_label.pack(fill=tk.X, padx=10)
+
+        # ======== Contadores por oficina + últimas lecturas ========
+        paned = ttk.PanedWindow(self, orient=tk.HORIZONTAL)
+        paned.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+
+        tabla_frame = ttk.LabelFrame(paned, text="Conciliación por oficina")
+        paned.add(tabla_frame, weight=3)
+        columnas = ("oficina",) + CONTADORES
+        self.tree = ttk.Treeview(tabla_frame, columns=columnas, show="headings")
+        for columna in columnas:
+            self.tree.heading(columna, text=columna.replace("_", " ").capitalize())
+            self.tree.column(columna, width=200 if columna == "oficina" else 90,
+                             anchor=tk.W if columna == "oficina" else tk.CENTER)
+        scroll = ttk.Scrollbar(tabla_frame, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scroll.set)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scroll.pack(side=tk.RIGHT, fill=tk.Y)
+
+        ultimas_frame = ttk.LabelFrame(paned, text="Últimas lecturas")
+        paned.add(ultimas_frame, weight=2)
+        self.ultimas = tk.Listbox(ultimas_frame)
+        self.ultimas.pack(fill=tk.BOTH, expand=True)
+
+        self.cargar_sesiones()
+        self.bind("<Destroy>", self._on_destroy)
+        self.after(1000, self._guardar_periodico)
+
+    def load_offices(self):
+        self.all_offices = [oficina for oficina, _ in cargar_oficinas()]
+
+    def refrescar(self):
+        """Recarga las oficinas; la sesión abierta conserva los bienes con que se abrió."""
+        self.load_offices()
+        self.ubicacion_combo["values"] = self.all_offices
+
+    # ======== Sesiones ========
+    def cargar_sesiones(self):
+        self._sesiones = listar_sesiones()
+        self.sesiones_combo["values"] = [f"{sid} - {nombre} ({inicio}, {lecturas} lecturas)"
+                                         for sid, nombre, inicio, _, lecturas in self._sesiones]
+
+    def nueva_sesion(self):
+        nombre = simpledialog.askstring("Nueva sesión", "Nombre del conteo:", parent=self)
+        if nombre is None:
+            return
+        self._activar(SesionConteo.nueva(nombre.strip() or None))
+
+    def abrir_sesion(self):
+        indice = self.sesiones_combo.current()
+        if indice < 0:
+            messagebox.showwarning("Atención", "Selecciona una sesión.")
+            return
+        self._activar(SesionConteo.abrir(self._sesiones[indice][0]))
+
+    def _activar(self, sesion):
+        if self.sesion:
+            self.sesion.cerrar()
+        self.sesion = sesion
+        self.sesion_label.config(text=f"Sesión {sesion.id}: {sesion.nombre} ({sesion.total_lecturas} lecturas)")
+        self.ultimas.delete(0, tk.END)
+        self.ultimo_label.config(text="")
+
+        self.tree.delete(*self.tree.get_children())
+        for oficina, contadores in sesion.resumen():
+            self.tree.insert("", tk.END, iid=oficina, values=(oficina, *contadores.values()))
+        self.cargar_sesiones()
+        self.codigo_entry.focus_set()
+
+    # ======== Lecturas ========
+    def on_scan(self, event=None):
+        codigo = self.codigo_var.get().strip()
+        self.codigo_var.set("")
+        if not codigo:
+            return
+        if not self.sesion:
+            self._activar(SesionConteo.nueva())
+        lectura = self.sesion.registrar(codigo, self.ubicacion_combo.get() or None)
+        self._mostrar(codigo, lectura)
+
+    def _mostrar(self, codigo, lectura):
+        """Actualiza solo las filas afectadas y la lista de últimas lecturas."""
+        for oficina in lectura["afectadas"]:
+            valores = (oficina, *self.sesion.contadores[oficina].values())
+            if self.tree.exists(oficina):
+                self.tree.item(oficina, values=valores)
+            else:
+                self.tree.insert("", tk.END, iid=oficina, values=valores)
+
+        bien = lectura["bien"]
+        texto = f"{lectura['resultado']}: {codigo}"
+        if bien:
+            texto += f" - {bien[2]} ({bien[1]})"
+        if lectura["variante"]:
+            texto += f" [{lectura['variante']}]"
+        self.ultimo_label.config(text=texto, fg=self.COLORES.get(lectura["resultado"], "#6c757d"))
+        self.ultimas.insert(0, texto)
+        if self.ultimas.size() > self.MAX_ULTIMAS:
+            self.ultimas.delete(self.MAX_ULTIMAS, tk.END)
+        self.sesion_label.config(
+            text=f"Sesión {self.sesion.id}: {self.sesion.nombre} ({self.sesion.total_lecturas} lecturas)")
+
+    def importar_archivo(self):
+        ruta = filedialog.askopenfilename(
+            title="Archivo de la lectora", filetypes=[("Texto / CSV", "*.txt *.csv *.tsv"), ("Todos", "*.*")])
+        if not ruta:
+            return
+        if not self.sesion:
+            self._activar(SesionConteo.nueva())
+        try:
+            resultados = self.sesion.importar_archivo(ruta, self.ubicacion_combo.get() or None)
+        except (OSError, UnicodeDecodeError) as e:
+            messagebox.showerror("Error", f"No se pudo leer el archivo:\n{e}")
+            return
+        # Tras una importación masiva se redibuja la tabla una sola vez
+        self._refrescar_tabla()
+        messagebox.showinfo("Importación", "\n".join(f"{r}: {n}" for r, n in resultados.items()) or "Sin lecturas")
+
+    def _refrescar_tabla(self):
+        for oficina, contadores in self.sesion.resumen():
+            valores = (oficina, *contadores.values())
+            if self.tree.exists(oficina):
+                self.tree.item(oficina, values=valores)
+            else:
+                self.tree.insert("", tk.END, iid=oficina, values=valores)
+        self.sesion_label.config(
+            text=f"Sesión {self.sesion.id}: {self.sesion.nombre} ({self.sesion.total_lecturas} lecturas)")
+
+    def _guardar_periodico(self):
+        if self.sesion:
+            self.sesion.guardar()
+        self.after(1000, self._guardar_periodico)
+
+    def _on_destroy(self, event):
+        if event.widget is self and self.sesion:
+            self.sesion.cerrar()
+            self.sesion = None
+
+
 class InventoryApp(tk.Tk):
-    def __init__(self):
+    def __init__(self, excel_path=None, sheet_name=None, header=0):
         super().__init__()
         self.title("Gestión de Inventario - Códigos de Barra")
         self.geometry("1000x700")
         self.configure(bg="#f8f9fa")
         
+        # Excel de origen para reimportar a pedido
+        self.excel_path = excel_path
+        self.sheet_name = sheet_name
+        self.header = header
+        self._importando = False
+        
         # Estilo
         style = ttk.Style()
         style.theme_use('clam')
         
-        notebook = ttk.Notebook(self)
-        notebook.pack(fill=tk.BOTH, expand=True)
+        if excel_path:
+            menubar = tk.Menu(self)
+            menu_datos = tk.Menu(menubar, tearoff=0)
+            menu_datos.add_command(label="Reimportar Excel", command=self.reimportar_excel)
+            menubar.add_cascade(label="Datos", menu=menu_datos)
+            self.config(menu=menubar)
+        
+        # Las pestañas se construyen recién la primera vez que se seleccionan
+        self.notebook = ttk.Notebook(self)
+        self.notebook.pack(fill=tk.BOTH, expand=True)
         
-        self.tab1 = InventoryView(notebook)
-        self.tab2 = BarcodeGeneratorView(notebook)
-        self.tab3 = MultiOfficeGeneratorView(notebook)
+        self._vistas = [
+            ("Inventario General", InventoryView),
+            ("Generador Personalizado", BarcodeGeneratorView),
+            ("Generador por Oficinas", MultiOfficeGeneratorView),
+            ("Conteo Físico", ConteoFisicoView),
+        ]
+        self._contenedores = []
+        self.tabs = [None] * len(self._vistas)
+        for texto, _ in self._vistas:
+            contenedor = ttk.Frame(self.notebook)
+            self.notebook.add(contenedor, text=texto)
+            self._contenedores.append(contenedor)
         
-        notebook.add(self.tab1, text="Inventario General")
-        notebook.add(self.tab2, text="Generador Personalizado")
-        notebook.add(self.tab3, text="Generador por Oficinas")
\ No newline at end of file
+        self.notebook.bind("<<NotebookTabChanged>>", self._on_tab_changed)
+
+    def _on_tab_changed(self, event=None):
+        indice = self.notebook.index(self.notebook.select())
+        self._construir_tab(indice)
+
+    def _construir_tab(self, indice):
+        """Crea la vista de la pestaña si todavía no existe."""
+        if self.tabs[indice] is not None:
+            return self.tabs[indice]
+        texto, clase = self._vistas[indice]
+        inicio = time.perf_counter()
+        vista = clase(self._contenedores[indice])
+        vista.pack(fill=tk.BOTH, expand=True)
+        self.tabs[indice] = vista
+        print(f"⏱️  Pestaña '{texto}' construida en {time.perf_counter() - inicio:.3f}s")
+        return vista
+
+    # ======== 🔄 Reimportación en segundo plano ========
+    def reimportar_excel(self):
+        """Reimporta el Excel de origen en un hilo y refresca las vistas al terminar."""
+        if self._importando or not self.excel_path:
+            return
+        self._importando = True
+        self._titulo = self.title()
+        self.title(f"{self._titulo} (importando Excel...)")
+        thread = threading.Thread(target=self._reimportar_thread, daemon=True)
+        thread.start()
+
+    def _reimportar_thread(self):
+        from data.load_excel import load_excel_to_db  # pandas solo al reimportar
+        error = None
+        resultado = None
+        try:
+            # El reporte consolidado se escribe después de refrescar las vistas
+            resultado = load_excel_to_db(self.excel_path, sheet_name=self.sheet_name, header=self.header,
+                                         diferir_reporte=True)
+            if resultado is None:
+                error = "No se encontraron las columnas esperadas en la hoja (ver detalle en la consola)."
+        except Exception as e:
+            error = e
+        actualizados = resultado["actualizados"] if resultado else 0
+        self.after(0, lambda: self._fin_reimportacion(error, actualizados))
+        if resultado and resultado["reporte"] is not None:
+            try:
+                resultado["reporte"].cerrar()
+            except Exception as e:
+                print(f"⚠️ No se pudo escribir el reporte consolidado: {e}")
+
+    def _fin_reimportacion(self, error, actualizados=0):
+        self._importando = False
+        self.title(self._titulo)
+        if error:
+            messagebox.showerror("Error", f"No se pudo importar el Excel:\n{error}")
+            return
+        self.refrescar_vistas()
+        if actualizados:
+            pendientes = sum(cantidad for _, cantidad in oficinas_pendientes())
+            messagebox.showinfo(
+                "Reimportación",
+                f"Se actualizaron {actualizados} bienes con los cambios del Excel.\n"
+                f"{pendientes} etiquetas quedan por reimprimir (\"Reimprimir solo cambiados\" "
+                f"en \"Generador por Oficinas\").")
+
+    def refrescar_vistas(self):
+        """Vuelve a cargar los datos de las pestañas ya construidas."""
+        cargar_oficinas(forzar=True)
+        for tab in self.tabs:
+            if tab is not None:
+                tab.refrescar()
@@ -8,45 +8,38 @@ Combina:
 """
 
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from datetime import datetime
+import time
 
+from data.columnas import columnas_ambiguas, nombres_unificados
 
-def limpiar_columnas(df: pd.DataFrame) -> pd.DataFrame:
+
+def limpiar_columnas(df: pd.DataFrame, ruta: Path = None, hoja: str = None) -> pd.DataFrame:
     """Limpia y normaliza los nombres de las columnas."""
-    # Renombrar columnas para estandarizar
-    columnas_rename = {
-        'ITEM ': 'ITEM',
-        'CODIGO DEL BIEN': 'CODIGO_BIEN',
-        'CODIG\nO DEL BIEN': 'CODIGO_BIEN',
-        'CODIGO INTERNO': 'CODIGO_INTERNO',
-        'CODIGO INTER. ': 'CODIGO_INTERNO',
-        'DETALLE DEL   BIEN': 'DETALLE_BIEN',
-        'CARACTERISTICAS': 'CARACTERISTICAS',
-        'OFICINA': 'OFICINA',
-        'ESTAD.': 'ESTADO',
-        'COD. ANT.': 'CODIGO_ANTIGUO',
-        'COD.  ANT.': 'CODIGO_ANTIGUO',
-        'CANT.': 'CANTIDAD',
-        'IMPORTE': 'IMPORTE',
-        'RESPONSABLE': 'RESPONSABLE',
-        'RESPONSABLE ': 'RESPONSABLE',
-        'OBSERVACIÒN ': 'OBSERVACION',
-        'OBSERVACIONES ': 'OBSERVACION',
-        'CUENTA CONTABLE': 'CUENTA_CONTABLE',
-        'N° DE PECOSA': 'NUM_DOCUMENTO',
-        'FECHA DE EMISION DE PECOSA': 'FECHA_EMISION',
-        'N° PAP. ASIG.': 'NUM_DOCUMENTO',
-        'FECHA DE EMISION DE PAP. ASIG.': 'FECHA_EMISION',
-        'Unnamed: 2': 'TIPO_REGISTRO',
-        'Unnamed: 3': 'TIPO_REGISTRO',
-    }
+    # Un campo ambiguo no descarta el libro: se usa la primera columna empatada
+    for campo, candidatas in columnas_ambiguas(df.columns).items():
+        print(f"⚠️  {ruta or ''} {hoja or ''}: columna ambigua para '{campo}' "
+              f"({', '.join(map(str, candidatas))}); se usa '{candidatas[0]}'")
+
+    # Renombrar columnas para estandarizar (ver data/columnas.py)
+    columnas_rename = nombres_unificados(df.columns, archivo=ruta, hoja=hoja)
     
     # Aplicar renombrado
     df = df.rename(columns=columnas_rename)
     
+    # Columnas renombradas al mismo nombre (p.ej. Unnamed: 2 y Unnamed: 3):
+    # se combinan tomando el primer valor no vacío de cada fila
+    if df.columns.duplicated().any():
+        combinadas = {}
+        for nombre in dict.fromkeys(df.columns):
+            datos = df.loc[:, df.columns == nombre]
+            combinadas[nombre] = datos.bfill(axis=1).iloc[:, 0] if datos.shape[1] > 1 else datos.iloc[:, 0]
+        df = pd.DataFrame(combinadas, index=df.index)
+    
     # Eliminar columnas sin nombre (Unnamed) excepto las que renombramos o necesitamos
-    columnas_validas = [col for col in df.columns if not col.startswith('Unnamed')]
+    columnas_validas = [col for col in df.columns if not str(col).startswith('Unnamed')]
     df = df[columnas_validas]
     
     return df
@@ -55,7 +48,7 @@ def limpiar_columnas(df: pd.DataFrame) -> pd.DataFrame:
 def cargar_siga_sobrantes(ruta: Path) -> pd.DataFrame:
     """Carga y procesa el archivo SIGA Y SOBRANTES."""
     df = pd.read_excel(ruta, sheet_name='Hoja1', header=2)
-    df = limpiar_columnas(df)
+    df = limpiar_columnas(df, ruta, 'Hoja1')
     df['ORIGEN'] = 'SIGA_SOBRANTES'
     df['NUM_DOCUMENTO'] = None
     df['FECHA_EMISION'] = None
@@ -65,7 +58,7 @@ def cargar_siga_sobrantes(ruta: Path) -> pd.DataFrame:
 def cargar_afectacion(ruta: Path) -> pd.DataFrame:
     """Carga y procesa el archivo AFECTACION EN USO."""
     df = pd.read_excel(ruta, sheet_name='Hoja1', header=0)
-    df = limpiar_columnas(df)
+    df = limpiar_columnas(df, ruta, 'Hoja1')
     df['ORIGEN'] = 'AFECTACION_EN_USO'
     df['NUM_DOCUMENTO'] = None
     df['FECHA_EMISION'] = None
@@ -76,7 +69,7 @@ def cargar_afectacion(ruta: Path) -> pd.DataFrame:
 def cargar_pecosas(ruta: Path) -> pd.DataFrame:
     """Carga y procesa el archivo PECOSAS."""
     df = pd.read_excel(ruta, sheet_name='Hoja1', header=1)
-    df = limpiar_columnas(df)
+    df = limpiar_columnas(df, ruta, 'Hoja1')
     df['ORIGEN'] = 'PECOSAS'
     return df
 
@@ -84,18 +77,80 @@ def cargar_pecosas(ruta: Path) -> pd.DataFrame:
 def cargar_asignaciones(ruta: Path) -> pd.DataFrame:
     """Carga y procesa el archivo ASIGNACIONES."""
     df = pd.read_excel(ruta, sheet_name='Hoja1', header=1)
-    df = limpiar_columnas(df)
+    df = limpiar_columnas(df, ruta, 'Hoja1')
     df['ORIGEN'] = 'ASIGNACIONES'
     return df
 
 
-def unificar_excel(directorio: str = '.', salida: str = None) -> str:
+def _cargar_archivo(funcion_carga, ruta: Path):
+    """
+    Ejecuta un cargador dentro de un proceso del pool.
+    
+    Retorna (DataFrame o None, segundos, mensaje de error o None) para que un
+    archivo dañado no cancele la carga de los demás.
+    """
+    inicio = time.perf_counter()
+    try:
+        df = funcion_carga(ruta)
+        return df, time.perf_counter() - inicio, None
+    except Exception as e:
+        return None, time.perf_counter() - inicio, str(e)
+
+
+def cargar_archivos_en_paralelo(directorio: Path, archivos: dict, max_workers: int = None) -> list:
+    """
+    Carga los archivos Excel de forma concurrente en un pool de procesos.
+    
+    El orden de la lista resultante sigue siempre el orden de `archivos`,
+    sin importar cuál termine primero, para que la concatenación sea
+    determinista. Los archivos inexistentes o con error se omiten.
+    """
+    pendientes = []
+    for archivo, funcion_carga in archivos.items():
+        ruta = directorio / archivo
+        if ruta.exists():
+            print(f"✅ Cargando: {archivo}")
+            pendientes.append((archivo, funcion_carga, ruta))
+        else:
+            print(f"⚠️  Archivo no encontrado: {archivo}")
+    
+    if not pendientes:
+        return []
+    
+    inicio = time.perf_counter()
+    workers = max_workers or len(pendientes)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futuros = [
+            (archivo, executor.submit(_cargar_archivo, funcion_carga, ruta))
+            for archivo, funcion_carga, ruta in pendientes
+        ]
+        
+        dataframes = []
+        for archivo, futuro in futuros:
+            try:
+                df, segundos, error = futuro.result()
+            except Exception as e:
+                # El proceso del pool murió (p.ej. sin memoria)
+                df, segundos, error = None, 0.0, str(e)
+            
+            if error is not None:
+                print(f"❌ Error al cargar {archivo}: {error}")
+                continue
+            print(f"   → {archivo}: {len(df)} registros encontrados ({segundos:.2f}s)")
+            dataframes.append(df)
+    
+    print(f"⏱️  Carga total: {time.perf_counter() - inicio:.2f}s")
+    return dataframes
+
+
+def unificar_excel(directorio: str = '.', salida: str = None, max_workers: int = None) -> str:
     """
     Unifica todos los archivos Excel en un solo archivo.
     
     Args:
         directorio: Directorio donde están los archivos Excel
         salida: Nombre del archivo de salida (opcional)
+        max_workers: Número de procesos para la carga (por defecto uno por archivo)
     
     Returns:
         Ruta del archivo generado
@@ -110,20 +165,8 @@ def unificar_excel(directorio: str = '.', salida: str = None) -> str:
         'ASIGNACIONES.xlsx': cargar_asignaciones,
     }
     
-    # Cargar todos los DataFrames
-    dataframes = []
-    for archivo, funcion_carga in archivos.items():
-        ruta = directorio / archivo
-        if ruta.exists():
-            print(f"✅ Cargando: {archivo}")
-            try:
-                df = funcion_carga(ruta)
-                print(f"   → {len(df)} registros encontrados")
-                dataframes.append(df)
-            except Exception as e:
-                print(f"❌ Error al cargar {archivo}: {e}")
-        else:
-            print(f"⚠️  Archivo no encontrado: {archivo}")
+    # Cargar todos los DataFrames en paralelo (un proceso por archivo)
+    dataframes = cargar_archivos_en_paralelo(directorio, archivos, max_workers=max_workers)
     
     if not dataframes:
         print("❌ No se encontraron archivos para procesar")
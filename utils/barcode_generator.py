@@ -7,8 +7,17 @@ from barcode import Code128
 from barcode.writer import ImageWriter
 from PIL import Image, ImageDraw, ImageFont
 from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4, landscape
 import platform
+import unicodedata
+import zlib
+import hashlib
+import functools
+import threading
+from collections import OrderedDict
+from reportlab.pdfbase import pdfdoc
+from concurrent.futures import ProcessPoolExecutor
+from utils.perfil import etapa, trabajo
+from utils.plantillas import cargar_plantilla_etiqueta, obtener_plantilla
 
 OUTPUT_DIR = "assets/generated_barcodes"
 
@@ -26,8 +35,6 @@ BORDER_COLOR = "black"
 MARGIN = 6
 MAX_WIDTH_RATIO = 0.9
 MAX_HEIGHT_RATIO = 0.6
-LOGO_RATIO_W = 0.15
-LOGO_RATIO_H = 0.22
 
 # ================================================================
 # ESPECIFICACIONES DE CÓDIGOS DE BARRAS EAN-13/Code128
@@ -54,6 +61,12 @@ MIN_BARCODE_WIDTH_PX = int(MIN_BARCODE_WIDTH_MM / 10 * CM_TO_INCH * DPI)
 MIN_BARCODE_HEIGHT_PX = int(MIN_BARCODE_HEIGHT_MM / 10 * CM_TO_INCH * DPI)
 # ================================================================
 
+# Modos de render: "L" (grises, 8 bits por píxel) o "1" (blanco y negro puro,
+# 1 bit por píxel: ~8 veces menos memoria y PDF más liviano)
+MODOS = ("L", "1")
+
+TITULO_INVENTARIO = "INVENTARIO DRE HUÁNUCO - 2025"
+
 # Diccionario de claves de 4 letras para cada área/oficina
 OFFICE_KEYS = {
     # Áreas de la DGA (Dirección General de Administración)
@@ -114,33 +127,109 @@ OFFICE_KEYS = {
 }
 
 
+def _plegar(texto: str) -> str:
+    """Mayúsculas, sin tildes y con espacios simples (para comparar nombres de oficina)."""
+    sin_tildes = unicodedata.normalize("NFD", texto.strip().upper())
+    sin_tildes = "".join(c for c in sin_tildes if not unicodedata.combining(c))
+    return " ".join(sin_tildes.split())
+
+
+class ResolvedorClaves:
+    """
+    Resuelve la clave de 4 letras de una oficina a partir de OFFICE_KEYS.
+
+    Se construye una sola vez:
+    - mapa exacto con los nombres sin tildes ("DGA-ALMACEN" = "DGA-ALMACÉN")
+    - nombres ordenados de más largo a más corto, así la coincidencia parcial
+      siempre elige el nombre más largo contenido en la oficina
+      ("DGI-DIRECCIÓN" gana a "DIRECCIÓN") sin depender del orden del dict
+    - memo por texto de oficina: cada oficina distinta se resuelve una vez
+    """
+
+    def __init__(self, claves):
+        self.exactos = {_plegar(nombre): clave for nombre, clave in claves.items()}
+        self.por_largo = sorted(self.exactos.items(), key=lambda item: (-len(item[0]), item[0]))
+        self.por_corto = sorted(self.exactos.items(), key=lambda item: (len(item[0]), item[0]))
+        self.claves_definidas = set(claves.values())
+        self.memo = {}
+        self.generadas = {}  # oficina -> clave generada (sin coincidencia en OFFICE_KEYS)
+
+    def resolver(self, office_name: str) -> str:
+        clave = self.memo.get(office_name)
+        if clave is None:
+            clave = self.memo[office_name] = self._resolver(office_name)
+        return clave
+
+    def _resolver(self, office_name):
+        if not office_name or not office_name.strip():
+            return "XXXX"
+
+        # Coincidencia exacta primero
+        oficina = _plegar(office_name)
+        if oficina in self.exactos:
+            return self.exactos[oficina]
+
+        # Coincidencia parcial: el nombre conocido más largo contenido en la oficina
+        for nombre, clave in self.por_largo:
+            if nombre in oficina:
+                return clave
+        # ... o el nombre conocido más corto que contiene a la oficina
+        for nombre, clave in self.por_corto:
+            if oficina in nombre:
+                return clave
+
+        # Si no se encuentra, generar una clave genérica basada en las primeras letras
+        words = office_name.strip().split()
+        if len(words) >= 2:
+            # Tomar las primeras 2 letras de las primeras 2 palabras
+            clave = (words[0][:2] + words[1][:2]).upper()[:4].ljust(4, 'X')
+        else:
+            # Tomar las primeras 4 letras
+            clave = office_name.strip().upper()[:4].ljust(4, 'X')
+        self.generadas[office_name.strip()] = clave
+        return clave
+
+    def colisiones(self):
+        """
+        Claves generadas que no identifican a una sola oficina: las que
+        coinciden con una clave de OFFICE_KEYS o se repiten entre oficinas.
+        Retorna {clave: [oficinas]}.
+        """
+        por_clave = {}
+        for oficina, clave in self.generadas.items():
+            por_clave.setdefault(clave, set()).add(oficina)
+        return {clave: sorted(oficinas) for clave, oficinas in sorted(por_clave.items())
+                if clave in self.claves_definidas or len(oficinas) > 1}
+
+
+_resolvedor = None
+
+
+def _obtener_resolvedor() -> ResolvedorClaves:
+    global _resolvedor
+    if _resolvedor is None:
+        _resolvedor = ResolvedorClaves(OFFICE_KEYS)
+    return _resolvedor
+
+
 def get_office_key(office_name: str) -> str:
     """Obtiene la clave de 4 letras para una oficina dada."""
-    if not office_name:
-        return "XXXX"
-    
-    # Buscar coincidencia exacta primero
-    office_upper = office_name.strip().upper()
-    if office_upper in OFFICE_KEYS:
-        return OFFICE_KEYS[office_upper]
-    
-    # Buscar coincidencia parcial (por si el nombre tiene variaciones)
-    for key, code in OFFICE_KEYS.items():
-        if key in office_upper or office_upper in key:
-            return code
-    
-    # Si no se encuentra, generar una clave genérica basada en las primeras letras
-    words = office_name.strip().split()
-    if len(words) >= 2:
-        # Tomar las primeras 2 letras de las primeras 2 palabras
-        return (words[0][:2] + words[1][:2]).upper()[:4].ljust(4, 'X')
-    else:
-        # Tomar las primeras 4 letras
-        return office_name.strip().upper()[:4].ljust(4, 'X')
+    return _obtener_resolvedor().resolver(office_name)
+
+
+def reporte_colisiones(oficinas=()) -> dict:
+    """
+    Resuelve `oficinas` (además de las ya vistas) y retorna las claves
+    generadas que colisionan: {clave: [oficinas]}.
+    """
+    resolvedor = _obtener_resolvedor()
+    for oficina in oficinas:
+        resolvedor.resolver(oficina)
+    return resolvedor.colisiones()
 
 
-def _create_canvas() -> Tuple[Image.Image, ImageDraw.ImageDraw]:
-    img = Image.new("L", (TARGET_WIDTH, TARGET_HEIGHT), "white")
+def _create_canvas(modo: str = "L") -> Tuple[Image.Image, ImageDraw.ImageDraw]:
+    img = Image.new(modo, (TARGET_WIDTH, TARGET_HEIGHT), "white")
     draw = ImageDraw.Draw(img)
 
     # Sin borde para evitar interferencia con otros elementos
@@ -148,13 +237,6 @@ def _create_canvas() -> Tuple[Image.Image, ImageDraw.ImageDraw]:
 
 
 def _generate_base_barcode(codigo: str) -> Image.Image:
-    # Ensure output directory exists
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
-    
-    # Sanitize codigo to avoid path issues - replace problematic characters
-    sanitized = codigo.replace('/', '_').replace('\\', '_')
-    tmp_path = os.path.join(OUTPUT_DIR, f"{sanitized}_temp")
-    
     writer = ImageWriter()
     writer.dpi = 600
     # Especificaciones basadas en diagrama técnico:
@@ -167,11 +249,13 @@ def _generate_base_barcode(codigo: str) -> Image.Image:
     # Zona silenciosa: ~5mm a cada lado (aprox 12 módulos de 0.4mm)
     writer.quiet_zone = 12
     
-    # Guardar sin texto debajo
-    Code128(codigo, writer=writer).save(tmp_path, options={"write_text": False})
-
-    img = Image.open(tmp_path + ".png").convert("L")
-    os.remove(tmp_path + ".png")
+    # Sin texto debajo; en memoria para que hilos que rendericen el mismo
+    # código a la vez no compartan (ni borren) un archivo temporal
+    with etapa("barcode_png"):
+        buffer = BytesIO()
+        Code128(codigo, writer=writer).write(buffer, options={"write_text": False})
+        buffer.seek(0)
+        img = Image.open(buffer).convert("L")
     return img
 
 
@@ -196,23 +280,35 @@ def _resize_barcode(img: Image.Image) -> Image.Image:
     
     # Redimensionar si es necesario
     if new_w != img.width or new_h != img.height:
-        img = img.resize((new_w, new_h), Image.Resampling.LANCZOS)
+        with etapa("barcode_resize_lanczos"):
+            img = img.resize((new_w, new_h), Image.Resampling.LANCZOS)
     
     return img
 
 
 def _draw_centered_text(draw, text, y, font) -> int:
-    text_w = draw.textlength(text, font=font)
+    text_w = ancho_texto(draw, text, font)
     draw.text(((TARGET_WIDTH - text_w) / 2, y), text, fill="black", font=font)
     return y + int(font.size * 1.2)
 
 
-def _add_logo(canvas: Image.Image, logo_path: str):
+def _a_modo(img: Image.Image, modo: str) -> Image.Image:
+    """Convierte al modo del lienzo; en "1" usa umbral (sin tramado) para no ensuciar barras."""
+    if img.mode == modo:
+        return img
+    if modo == "1":
+        return img.convert("1", dither=Image.Dither.NONE)
+    return img.convert(modo)
+
+
+def _preparar_logo(logo_path: str, spec: dict):
+    """Carga el logo en NEGRO PURO, ya redimensionado; None si no existe."""
     if not os.path.exists(logo_path):
-        return
+        return None
 
     # Convertir logo a NEGRO PURO (sin grises) para impresión óptima
-    logo = Image.open(logo_path).convert("RGBA")
+    with etapa("logo_carga"):
+        logo = Image.open(logo_path).convert("RGBA")
     
     # Crear fondo blanco para aplanar transparencias
     background = Image.new("L", logo.size, 255)  # 255 = blanco
@@ -226,13 +322,14 @@ def _add_logo(canvas: Image.Image, logo_path: str):
         logo = logo.convert("L")
     
     # Aplicar umbral para convertir a NEGRO PURO (0) y BLANCO PURO (255)
-    # Cualquier píxel más oscuro que 180 se vuelve negro, el resto blanco
-    threshold = 180
-    logo = logo.point(lambda p: 0 if p < threshold else 255)
+    # Cualquier píxel más oscuro que el umbral se vuelve negro, el resto blanco
+    threshold = spec["umbral"]
+    with etapa("logo_umbral"):
+        logo = logo.point(lambda p: 0 if p < threshold else 255)
 
     # Tamaño máximo deseado basado en porcentaje del sticker
-    max_w = int(TARGET_WIDTH * LOGO_RATIO_W)
-    max_h = int(TARGET_HEIGHT * LOGO_RATIO_H)
+    max_w = int(TARGET_WIDTH * spec["ratio_ancho"])
+    max_h = int(TARGET_HEIGHT * spec["ratio_alto"])
 
     # Obtener proporción original
     w, h = logo.size
@@ -243,114 +340,196 @@ def _add_logo(canvas: Image.Image, logo_path: str):
     new_w = int(w * scale)
     new_h = int(h * scale)
 
-    logo = logo.resize((new_w, new_h), Image.Resampling.LANCZOS)
+    with etapa("logo_resize_lanczos"):
+        return logo.resize((new_w, new_h), Image.Resampling.LANCZOS)
 
-    # Posición (esquina inferior izquierda con pequeño margen)
-    x = 10  # Margen izquierdo pequeño
-    y = TARGET_HEIGHT - logo.height - 10  # Margen inferior pequeño
 
-    canvas.paste(logo, (x, y))
+class PlantillaEtiqueta:
+    """
+    Renderizador de stickers compilado a partir de PLANTILLA_ETIQUETA.
 
+    Las capas fijas (clave de oficina, título, línea de área, logo y tipo de
+    registro) se dibujan una vez por (título, oficina, tipo de registro,
+    líneas de denominación, logo, modo) y se guardan en una caché LRU. Cada
+    etiqueta cuesta una copia de esa base más las partes variables:
+    denominación, código de barras y número.
+    """
 
-def generate_barcode(codigo: str, title: str = "", logo_path: str = "utils/logo.png", detalle_bien: str = "", save_file: bool = False, tipo_registro: str = "", oficina: str = ""):
+    def __init__(self, spec=None, max_bases=64):
+        self.spec = spec if spec is not None else cargar_plantilla_etiqueta()
+        self.max_bases = max_bases
+        self._bases = OrderedDict()
+        self._logos = {}  # (logo_path, modo) -> (imagen, (x, y)) o None
+        self._lock = threading.Lock()
+
+    def _fuente(self, seccion):
+        s = self.spec[seccion]
+        return get_font(size=s["tamano"], bold=s.get("negrita", False))
+
+    def clave(self, oficina, fontmode="L"):
+        """Clave de oficina, su posición, su recuadro y el ancho que queda para la denominación."""
+        s = self.spec["clave"]
+        font = self._fuente("clave")
+        office_key = get_office_key(oficina)
+        key_width = _ancho(font, fontmode, office_key)
+        key_x = TARGET_WIDTH - key_width - self.spec["margen_izquierdo"] - s["padding"]
+        rect = [key_x - s["padding"], s["y"] - s["padding_y"],
+                key_x + key_width + s["padding"], s["y"] + font.size + s["padding_y"]]
+        max_text_width = rect[0] - self.spec["margen_izquierdo"] - s["separacion_texto"]
+        return office_key, key_x, rect, max_text_width
+
+    def lineas_denominacion(self, detalle_bien, oficina, fontmode="L"):
+        """Denominación truncada y partida en líneas en el ancho que deja la clave."""
+        s = self.spec["denominacion"]
+        limite = s["max_caracteres"]
+        detalle_truncado = detalle_bien[:limite - 3] + "..." if len(detalle_bien) > limite else detalle_bien
+        max_text_width = self.clave(oficina, fontmode)[3]
+        return _partir_lineas(self._fuente("denominacion"), fontmode, detalle_truncado,
+                              max_text_width)[:s["max_lineas"]]
+
+    def textos_fijos(self, title, n_lineas):
+        """Retorna ([(sección, texto, y)] del título y la línea de área, y del código de barras)."""
+        s = self.spec["denominacion"]
+        y = s["y"] + n_lineas * int(self._fuente("denominacion").size * s["interlineado"])
+        textos = []
+        for seccion, texto in (("titulo", title.upper() if title else ""),
+                               ("area", self.spec["area"]["texto"])):
+            textos.append((seccion, texto, y))
+            y += int(self._fuente(seccion).size * self.spec[seccion]["interlineado"])
+        return textos, y
+
+    def _logo(self, logo_path, modo):
+        clave = (logo_path, modo)
+        if clave not in self._logos:
+            logo = _preparar_logo(logo_path, self.spec["logo"])
+            if logo is not None:
+                # Posición (esquina inferior izquierda con pequeño margen)
+                posicion = (self.spec["logo"]["x"],
+                            TARGET_HEIGHT - logo.height - self.spec["logo"]["margen_inferior"])
+                logo = (_a_modo(logo, modo), posicion)
+            self._logos[clave] = logo
+        return self._logos[clave]
+
+    def base(self, title, oficina, tipo_registro, n_lineas, logo_path, modo):
+        """Retorna (lienzo base, y donde va el código de barras, logo) desde la caché."""
+        clave = (title, oficina, tipo_registro, n_lineas, logo_path, modo)
+        with self._lock:
+            base = self._bases.get(clave)
+            if base is not None:
+                self._bases.move_to_end(clave)
+                return base
+
+        with etapa("plantilla_base"):
+            base = self._componer(title, oficina, tipo_registro, n_lineas, logo_path, modo)
+        with self._lock:
+            self._bases[clave] = base
+            while len(self._bases) > self.max_bases:
+                self._bases.popitem(last=False)
+        return base
+
+    def _componer(self, title, oficina, tipo_registro, n_lineas, logo_path, modo):
+        spec = self.spec
+        img, draw = _create_canvas(modo)
+        margin_left = spec["margen_izquierdo"]
+
+        # 🔑 Clave de oficina en un recuadro (esquina superior derecha)
+        office_key, key_x, rect, _ = self.clave(oficina, draw.fontmode)
+        draw.rectangle(rect, outline="black", width=spec["clave"]["grosor"])
+        draw.text((key_x, spec["clave"]["y"]), office_key, fill="black", font=self._fuente("clave"))
+
+        # Título del inventario y línea de área, debajo de las líneas de denominación
+        textos, y = self.textos_fijos(title, n_lineas)
+        for seccion, texto, y_texto in textos:
+            draw.text((margin_left, y_texto), texto, fill="black", font=self._fuente(seccion))
+
+        # Logo (esquina inferior izquierda)
+        logo = self._logo(logo_path, modo)
+        if logo:
+            img.paste(*logo)
+
+        # Tipo de registro en la esquina inferior derecha
+        if tipo_registro:
+            s = spec["tipo_registro"]
+            font = self._fuente("tipo_registro")
+            x_tipo = TARGET_WIDTH - _ancho(font, draw.fontmode, tipo_registro) - s["margen_derecho"]
+            y_tipo = TARGET_HEIGHT - font.size - s["margen_inferior"]
+            draw.text((x_tipo, y_tipo), tipo_registro, fill="black", font=font)
+
+        return img, y, logo
+
+    def renderizar(self, codigo, title="", logo_path="utils/logo.png", detalle_bien="",
+                   tipo_registro="", oficina="", modo="L") -> Image.Image:
+        spec = self.spec
+        fontmode = "1" if modo == "1" else "L"
+        barcode_img = _resize_barcode(_generate_base_barcode(codigo))
+
+        # Denominación: se parte antes de elegir la base, que depende de cuántas líneas ocupa
+        s = spec["denominacion"]
+        font_title = self._fuente("denominacion")
+        denominacion_lines = self.lineas_denominacion(detalle_bien, oficina, fontmode)
+
+        with etapa("lienzo"):
+            base, y, logo = self.base(title, oficina, tipo_registro, len(denominacion_lines),
+                                      logo_path, modo)
+            canvas_img = base.copy()
+        draw = ImageDraw.Draw(canvas_img)
+
+        y_linea = s["y"]
+        for line in denominacion_lines:
+            draw.text((spec["margen_izquierdo"], y_linea), line, fill="black", font=font_title)
+            y_linea += int(font_title.size * s["interlineado"])
+
+        # Pegar barcode centrado; si es muy alto, redimensionarlo para que quepa
+        espacio_disponible = TARGET_HEIGHT - y - spec["barcode"]["espacio_inferior"]
+        if barcode_img.height > espacio_disponible:
+            scale = espacio_disponible / barcode_img.height
+            new_w = int(barcode_img.width * scale)
+            new_h = int(barcode_img.height * scale)
+            with etapa("barcode_resize_lanczos"):
+                barcode_img = barcode_img.resize((new_w, new_h), Image.Resampling.LANCZOS)
+
+        x = (TARGET_WIDTH - barcode_img.width) // 2
+        canvas_img.paste(_a_modo(barcode_img, modo), (x, y))
+
+        # El logo va por encima del código de barras: volver a pegarlo si la zona blanca lo tapó
+        if logo:
+            (logo_img, (logo_x, logo_y)) = logo
+            if x < logo_x + logo_img.width and y + barcode_img.height > logo_y:
+                canvas_img.paste(logo_img, (logo_x, logo_y))
+        y += barcode_img.height + spec["barcode"]["separacion"]
+
+        # Número del código debajo del barcode (centrado)
+        font_codigo = self._fuente("codigo")
+        codigo_width = _ancho(font_codigo, fontmode, codigo)
+        draw.text(((TARGET_WIDTH - codigo_width) / 2, y), codigo, fill="black", font=font_codigo)
+        return canvas_img
+
+
+_plantilla_etiqueta = None
+
+
+def _obtener_plantilla_etiqueta() -> PlantillaEtiqueta:
+    global _plantilla_etiqueta
+    if _plantilla_etiqueta is None:
+        _plantilla_etiqueta = PlantillaEtiqueta()
+    return _plantilla_etiqueta
+
+
+def generate_barcode(codigo: str, title: str = "", logo_path: str = "utils/logo.png", detalle_bien: str = "", save_file: bool = False, tipo_registro: str = "", oficina: str = "",
+                     modo: str = "L"):
     os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-    # 1️⃣ Lienzo base
-    canvas_img, draw = _create_canvas()
-
-    # 2️⃣ Generar barcode
-    barcode_img = _resize_barcode(_generate_base_barcode(codigo))
+    # Capas fijas desde la plantilla compilada + denominación, barcode y número
+    canvas_img = _obtener_plantilla_etiqueta().renderizar(
+        codigo, title=title, logo_path=logo_path, detalle_bien=detalle_bien,
+        tipo_registro=tipo_registro, oficina=oficina, modo=modo)
 
-    # 3️⃣ Fuentes más grandes para mejor legibilidad
-    font_title = get_font(size=42, bold=True)  # Denominación del bien
-    font_detalle = get_font(size=34)  # Título inventario
-    font_area = get_font(size=38)  # Área / Oficina
-    font_office_key = get_font(size=48, bold=True)  # Clave de oficina (GRANDE)
-
-    # Margen izquierdo para alineación
-    margin_left = 25
-    
-    # 🔑 CLAVE DE OFICINA (esquina superior derecha)
-    office_key = get_office_key(oficina)
-    key_width = draw.textlength(office_key, font=font_office_key)
-    
-    # Dibujar un rectángulo de fondo para destacar la clave
-    key_padding = 8
-    key_x = TARGET_WIDTH - key_width - margin_left - key_padding
-    key_y = 8
-    
-    # Rectángulo con borde negro para la clave
-    rect_x1 = key_x - key_padding
-    rect_y1 = key_y - 4
-    rect_x2 = key_x + key_width + key_padding
-    rect_y2 = key_y + font_office_key.size + 4
-    draw.rectangle([rect_x1, rect_y1, rect_x2, rect_y2], outline="black", width=3)
-    
-    # Texto de la clave
-    draw.text((key_x, key_y), office_key, fill="black", font=font_office_key)
-    
-    # Ancho disponible para texto (dejando espacio para la clave)
-    max_text_width = rect_x1 - margin_left - 15
-    
-    # 4️⃣ Dibujar textos alineados a la izquierda
-    y = 10
-    
-    # Limitar denominación a 40 caracteres totales (37 + "...")
-    detalle_truncado = detalle_bien[:37] + "..." if len(detalle_bien) > 40 else detalle_bien
-    
-    # Denominación del bien (compacta, hasta 2 líneas)
-    denominacion_lines = wrap_text(draw, detalle_truncado, font_title, max_text_width)[:2]
-    for line in denominacion_lines:
-        draw.text((margin_left, y), line, fill="black", font=font_title)
-        y += int(font_title.size * 1.1)
-    
-    # Título Inventario (NEGRO PURO - antes era gris)
-    detalle_linea = title.upper() if title else ""
-    draw.text((margin_left, y), detalle_linea, fill="black", font=font_detalle)
-    y += int(font_detalle.size * 1.15)
-    
-    # ÁREA / OFICINA (visible y claro)
-    draw.text((margin_left, y), "ÁREA / OFICINA: __________________________________", fill="black", font=font_area)
-    y += int(font_area.size * 1.2)
-
-
-    # 5️⃣ Pegar barcode centrado
-    # Espacio reservado para: código numérico (35px) + logo/tipo registro (50px)
-    espacio_inferior = 85
-    espacio_disponible = TARGET_HEIGHT - y - espacio_inferior
-    
-    # Si el barcode es muy alto, redimensionarlo para que quepa
-    if barcode_img.height > espacio_disponible:
-        scale = espacio_disponible / barcode_img.height
-        new_w = int(barcode_img.width * scale)
-        new_h = int(barcode_img.height * scale)
-        barcode_img = barcode_img.resize((new_w, new_h), Image.Resampling.LANCZOS)
-    
-    x = (TARGET_WIDTH - barcode_img.width) // 2
-    canvas_img.paste(barcode_img, (x, y))
-    y += barcode_img.height + 5
-    
-    # 6️⃣ Número del código debajo del barcode (centrado)
-    font_codigo = get_font(size=38, bold=True)
-    codigo_width = draw.textlength(codigo, font=font_codigo)
-    draw.text(((TARGET_WIDTH - codigo_width) / 2, y), codigo, fill="black", font=font_codigo)
-
-    # 7️⃣ Agregar logo (esquina inferior izquierda)
-    _add_logo(canvas_img, logo_path)
-
-    # Tipo de registro en la esquina inferior derecha
-    if tipo_registro:
-        font_tipo = get_font(size=40, bold=True)
-        text_w = draw.textlength(tipo_registro, font=font_tipo)
-        x_tipo = TARGET_WIDTH - text_w - 20
-        y_tipo = TARGET_HEIGHT - font_tipo.size - 15
-        draw.text((x_tipo, y_tipo), tipo_registro, fill="black", font=font_tipo)
-
-    # 7️⃣ Guardar en memoria, NO en disco
+    # Guardar en memoria, NO en disco
     if not save_file:
-        buffer = BytesIO()
-        canvas_img.save(buffer, format="PNG", dpi=(DPI, DPI))
-        buffer.seek(0)
+        with etapa("png_encode"):
+            buffer = BytesIO()
+            canvas_img.save(buffer, format="PNG", dpi=(DPI, DPI))
+            buffer.seek(0)
         return ImageReader(buffer)
 
     os.makedirs(OUTPUT_DIR, exist_ok=True)
@@ -359,10 +538,12 @@ def generate_barcode(codigo: str, title: str = "", logo_path: str = "utils/logo.
     return file_path
 
 
+@functools.lru_cache(maxsize=None)
 def get_font(size: int = 25, bold: bool = False) -> ImageFont.FreeTypeFont:
     """
     Retorna una fuente TrueType compatible según el sistema operativo.
     Si no encuentra ninguna, devuelve una fuente por defecto.
+    La fuente se carga una sola vez por (tamaño, negrita) y se reutiliza.
     """
 
     system = platform.system()
@@ -394,8 +575,8 @@ def get_font(size: int = 25, bold: bool = False) -> ImageFont.FreeTypeFont:
         return ImageFont.load_default()
 
 
-def _generate_separator_image(office_name: str):
-    img, draw = _create_canvas()
+def _generate_separator_image(office_name: str, modo: str = "L"):
+    img, draw = _create_canvas(modo)
     
     # Obtener la clave de 4 letras
     office_key = get_office_key(office_name)
@@ -407,11 +588,12 @@ def _generate_separator_image(office_name: str):
         width=20
     )
     
-    font_office = get_font(size=70, bold=True)
-    font_key = get_font(size=100, bold=True)
+    with etapa("fuentes"):
+        font_office = get_font(size=70, bold=True)
+        font_key = get_font(size=100, bold=True)
     
     # Dibujar la clave grande primero
-    key_width = draw.textlength(office_key, font=font_key)
+    key_width = ancho_texto(draw, office_key, font_key)
     key_x = (TARGET_WIDTH - key_width) / 2
     key_y = TARGET_HEIGHT * 0.15
     draw.text((key_x, key_y), office_key, fill="black", font=font_key)
@@ -430,94 +612,28 @@ def _generate_separator_image(office_name: str):
     for line in lines:
         y = _draw_centered_text(draw, line, y, font_office)
         
-    buffer = BytesIO()
-    img.save(buffer, format="PNG", dpi=(DPI, DPI))
-    buffer.seek(0)
+    with etapa("separador_png_encode"):
+        buffer = BytesIO()
+        img.save(buffer, format="PNG", dpi=(DPI, DPI))
+        buffer.seek(0)
     return ImageReader(buffer)
 
 
-def generate_barcodes_pdf(records, output_pdf="assets/generated_barcodes/", progress_callback=None, selected_office=""):
-
-    output_pdf += "codigos_barras_"+selected_office+".pdf"
-
-    os.makedirs(os.path.dirname(output_pdf), exist_ok=True)
-
-    pdf = canvas.Canvas(output_pdf, pagesize=landscape(A4))
-    page_width, page_height = landscape(A4)
-
-    cm = 28.35
-    label_width = page_width / 5
-    label_height = page_height / 7
-
-    cols = 5
-    rows = 7
-
-    # 🟡 MARGEN SEGURO DE IMPRESIÓN (ajusta si hace falta)
-    PAGE_MARGIN_X = cm * 0.5  # 0.5 cm a los lados
-    PAGE_MARGIN_Y = cm * 0.5  # 0.5 cm arriba/abajo
-
-    # 🟡 ESPACIADO ENTRE ETIQUETAS
-    GAP_X = 6  # espacio horizontal en puntos (≈ 2mm)
-    GAP_Y = 6  # espacio vertical en puntos  (≈ 2mm)
-
-    # Área imprimible quitando márgenes externos
-    usable_w = page_width - (PAGE_MARGIN_X * 2)
-    usable_h = page_height - (PAGE_MARGIN_Y * 2)
-
-    # Ajustar tamaño de cada etiqueta considerando los gaps
-    label_width = (usable_w - (GAP_X * (cols - 1))) / cols
-    label_height = (usable_h - (GAP_Y * (rows - 1))) / rows
-
-    # Inicio de coordenadas con margen
-    x_start = PAGE_MARGIN_X
-    y_start = page_height - PAGE_MARGIN_Y - label_height
-    x, y = x_start, y_start
-
-    pdf.setStrokeGray(0.6)
-    pdf.setLineWidth(0.8)
-    pdf.setDash(3, 2)
-
-    def draw_border_cut_lines():
-        """Dibuja las líneas de corte en los bordes de la página."""
-        # Configurar estilo de línea punteada
-        pdf.setStrokeGray(0.6)
-        pdf.setLineWidth(0.8)
-        pdf.setDash(3, 2)
-        
-        # Línea SUPERIOR (borde superior de la primera fila)
-        top_y = page_height - PAGE_MARGIN_Y
-        pdf.line(PAGE_MARGIN_X, top_y, page_width - PAGE_MARGIN_X, top_y)
-        
-        # Línea INFERIOR (borde inferior de la última fila)
-        bottom_y = PAGE_MARGIN_Y
-        pdf.line(PAGE_MARGIN_X, bottom_y, page_width - PAGE_MARGIN_X, bottom_y)
-        
-        # Línea IZQUIERDA (borde izquierdo de la primera columna)
-        pdf.line(PAGE_MARGIN_X, PAGE_MARGIN_Y, PAGE_MARGIN_X, page_height - PAGE_MARGIN_Y)
-        
-        # Línea DERECHA (borde derecho de la última columna)
-        pdf.line(page_width - PAGE_MARGIN_X, PAGE_MARGIN_Y, page_width - PAGE_MARGIN_X, page_height - PAGE_MARGIN_Y)
-        
-        # Líneas HORIZONTALES entre todas las filas
-        for row in range(1, rows):
-            line_y = page_height - PAGE_MARGIN_Y - (row * (label_height + GAP_Y)) + GAP_Y / 2
-            pdf.line(PAGE_MARGIN_X, line_y, page_width - PAGE_MARGIN_X, line_y)
-        
-        # Líneas VERTICALES entre todas las columnas
-        for col in range(1, cols):
-            line_x = PAGE_MARGIN_X + (col * (label_width + GAP_X)) - GAP_X / 2
-            pdf.line(line_x, PAGE_MARGIN_Y, line_x, page_height - PAGE_MARGIN_Y)
-
-    # Dibujar líneas de corte en la primera página
-    draw_border_cut_lines()
-
+def preparar_items(records, modo="L", copias=1):
+    """
+    Convierte los records en la lista de items a imprimir, con un separador
+    antes de cada cambio de oficina. Lo usan el PDF y la salida térmica.
+    """
     # Pre-process records to insert separators
     processed_items = []
     last_office = None
     
     for record in records:
         # Unpack record
-        if len(record) == 4:
+        copias_item = copias
+        if len(record) == 5:
+             codigo, detalle_bien, tipo_registro, oficina, copias_item = record
+        elif len(record) == 4:
              codigo, detalle_bien, tipo_registro, oficina = record
         else:
              # Fallback
@@ -526,70 +642,240 @@ def generate_barcodes_pdf(records, output_pdf="assets/generated_barcodes/", prog
 
         # Insert separator if office changes or it's the first one
         if last_office != oficina:
-            processed_items.append({"type": "separator", "office": oficina})
+            processed_items.append({"type": "separator", "office": oficina, "modo": modo, "copias": 1})
         
         processed_items.append({
             "type": "barcode",
             "codigo": codigo,
             "detalle_bien": detalle_bien,
             "tipo_registro": tipo_registro,
-            "oficina": oficina
+            "oficina": oficina,
+            "modo": modo,
+            "copias": max(1, int(copias_item or 1))
         })
         last_office = oficina
 
-    for i, item in enumerate(processed_items, 1):
-        if item["type"] == "separator":
-            img = _generate_separator_image(item["office"])
-        else:
-            img = generate_barcode(
-                f"{item['codigo']}",
-                title="INVENTARIO DRE HUÁNUCO - 2025",
-                detalle_bien=item['detalle_bien'],
-                logo_path="utils/logo.png",
-                tipo_registro=item['tipo_registro'],
-                oficina=item['oficina']
-            )
-
-        # Dibujar la etiqueta
-        pdf.drawImage(img, x, y, width=label_width, height=label_height)
-
-        if progress_callback:
-            progress_callback(i, len(processed_items))
-
-        # Avance de columna
-        x += label_width + GAP_X
-
-        # Salto de fila
-        if i % cols == 0:
-            x = x_start
-            y -= label_height + GAP_Y
-
-        # Nueva página
-        if i % (cols * rows) == 0 and i < len(processed_items):
-            pdf.showPage()
-            draw_border_cut_lines()
-            x, y = x_start, page_height - PAGE_MARGIN_Y - label_height
-
-    pdf.save()
+    return processed_items
+
+
+@trabajo("generate_barcodes_pdf")
+def generate_barcodes_pdf(records, output_pdf="assets/generated_barcodes/", progress_callback=None, selected_office="",
+                          max_workers=None, render_cache=None, modo="L", layout=None, copias=1):
+    """
+    Genera el PDF de etiquetas con un separador por cada cambio de oficina.
+
+    `records` son tuplas (codigo, detalle_bien, tipo_registro, oficina) y
+    opcionalmente un quinto valor con la cantidad de copias de ese bien
+    (si no, se usa `copias`). Cada etiqueta se renderiza una sola vez y se
+    coloca tantas veces como copias tenga. `progress_callback(actual, total)`
+    cuenta casillas colocadas.
+    """
+
+    output_pdf += "codigos_barras_"+selected_office+".pdf"
+
+    os.makedirs(os.path.dirname(output_pdf), exist_ok=True)
+
+    plantilla = obtener_plantilla(layout)
+    pdf = canvas.Canvas(output_pdf, pagesize=plantilla.pagesize)
+    label_width, label_height = plantilla.label_width, plantilla.label_height
+    casillas = plantilla.casillas
+
+    # Líneas de corte: se definen una vez y cada página las referencia
+    plantilla.registrar(pdf)
+    plantilla.iniciar_pagina(pdf)
+    imagenes_pdf = _ImagenesPDF(pdf)
+
+    processed_items = preparar_items(records, modo=modo, copias=copias)
+
+    if max_workers and max_workers > 1:
+        # Renderizar en paralelo; el PDF se arma en orden en este proceso
+        executor = ProcessPoolExecutor(max_workers=max_workers)
+        pngs = executor.map(_render_item_png, processed_items, chunksize=8)
+        imagenes = (ImageReader(BytesIO(png)) for png in pngs)
+    elif render_cache is not None:
+        # Caché compartida (p.ej. el servicio de etiquetas): solo se renderiza lo nuevo
+        executor = None
+        imagenes = (_render_item_cache(item, render_cache) for item in processed_items)
+    else:
+        executor = None
+        imagenes = (_render_item(item) for item in processed_items)
+
+    try:
+        total = sum(item["copias"] for item in processed_items)
+        colocadas = 0
+        for item, img in zip(processed_items, imagenes):
+            # Renderizada una vez, colocada una vez por copia
+            for _ in range(item["copias"]):
+                # Nueva página
+                if colocadas and colocadas % plantilla.por_pagina == 0:
+                    pdf.showPage()
+                    plantilla.iniciar_pagina(pdf)
+                x, y = casillas[colocadas % plantilla.por_pagina]
+
+                # Dibujar la etiqueta
+                with etapa("pdf_imagen"):
+                    imagenes_pdf.dibujar(img, x, y, label_width, label_height)
+                colocadas += 1
+
+                if progress_callback:
+                    progress_callback(colocadas, total)
+    finally:
+        if executor:
+            executor.shutdown(cancel_futures=True)
+
+    with etapa("pdf_save"):
+        pdf.save()
     return output_pdf
 
 
+def _render_item(item):
+    """Renderiza un separador o una etiqueta y retorna su ImageReader."""
+    if item["type"] == "separator":
+        with etapa("separador"):
+            return _generate_separator_image(item["office"], modo=item.get("modo", "L"))
+    with etapa("etiqueta"):
+        return generate_barcode(
+            f"{item['codigo']}",
+            title=TITULO_INVENTARIO,
+            detalle_bien=item['detalle_bien'],
+            logo_path="utils/logo.png",
+            tipo_registro=item['tipo_registro'],
+            oficina=item['oficina'],
+            modo=item.get("modo", "L")
+        )
+
+
+def _render_item_png(item) -> bytes:
+    """Versión para procesos hijos: retorna los bytes PNG (pesan menos que el ImageReader)."""
+    return _render_item(item).fp.getvalue()
+
+
+def _render_item_cache(item, cache):
+    """
+    Igual que _render_item, pero reutiliza los PNG guardados en `cache`
+    (`obtener(clave, generar)`, que renderiza una sola vez cada clave aunque
+    varios hilos la pidan a la vez).
+    """
+    if item["type"] == "separator":
+        clave = ("separator", item["office"], item.get("modo", "L"))
+    else:
+        clave = ("barcode", item["codigo"], item["detalle_bien"], item["tipo_registro"], item["oficina"],
+                 item.get("modo", "L"))
+    png = cache.obtener(clave, lambda: _render_item_png(item))
+    return ImageReader(BytesIO(png))
+
+
+class _ImagenesPDF:
+    """
+    Registro de las etiquetas ya incrustadas en un PDF.
+
+    Cada imagen se identifica por la huella de su PNG: la primera vez se
+    incrusta como XObject y las siguientes (separadores repetidos,
+    reimpresiones, copias) solo se referencian, sin volver a decodificar ni
+    comprimir nada. Las imágenes "1" se guardan con 1 bit por píxel
+    (`pdf.drawImage` las convertiría a RGB); las "L" en escala de grises.
+    El XObject se arma igual que lo hace ReportLab dentro de drawImage.
+    """
+
+    def __init__(self, pdf):
+        self.pdf = pdf
+        self.nombres = {}  # huella del PNG -> nombre del XObject
+        self.reutilizadas = 0
+
+    def dibujar(self, img, x, y, width, height):
+        png = img.fp.getvalue()
+        huella = hashlib.md5(png).hexdigest()
+        nombre = self.nombres.get(huella)
+        if nombre is None:
+            nombre = self.nombres[huella] = self._registrar(huella, png)
+        else:
+            self.reutilizadas += 1
+
+        pdf = self.pdf
+        pdf.saveState()
+        pdf.translate(x, y)
+        pdf.scale(width, height)
+        pdf._code.append(f"/{pdf._doc.getXObjectName(nombre)} Do")
+        pdf.restoreState()
+        pdf._currentPageHasImages = 1
+        pdf._formsinuse.append(nombre)
+
+    def _registrar(self, huella, png):
+        im = Image.open(BytesIO(png))
+        if im.mode == "1":
+            bits = 1  # PIL "1": bit 1 = blanco, igual que DeviceGray
+        else:
+            im = im.convert("L")
+            bits = 8
+        xobj = pdfdoc.PDFImageXObject(huella)
+        xobj.name = huella
+        xobj.width, xobj.height = im.size
+        xobj.bitsPerComponent = bits
+        xobj.colorSpace = "DeviceGray"
+        xobj._filters = ("FlateDecode",)
+        xobj.streamContent = zlib.compress(im.tobytes())
+        xobj.mask = None
+
+        doc = self.pdf._doc
+        self.pdf._setXObjects(xobj)
+        doc.Reference(xobj, doc.getXObjectName(huella))
+        doc.addForm(huella, xobj)
+        return huella
+
+
+def diferencia_pixeles(img_a: Image.Image, img_b: Image.Image) -> float:
+    """
+    Fracción de píxeles que difieren entre dos etiquetas, comparadas en blanco
+    y negro (umbral 128). Sirve para acotar el cambio visual del modo "1".
+    """
+    from PIL import ImageChops
+
+    a = _a_modo(img_a.convert("L"), "1")
+    b = _a_modo(img_b.convert("L"), "1")
+    if a.size != b.size:
+        return 1.0
+    distintos = ImageChops.logical_xor(a, b).convert("L").histogram()[255]
+    return distintos / (a.width * a.height)
+
+
+def ancho_texto(draw, text, font) -> float:
+    """Igual que draw.textlength, pero memoizado por (fuente, modo de fuente, texto)."""
+    return _ancho(font, draw.fontmode, text)
+
+
+@functools.lru_cache(maxsize=20000)
+def _ancho(font, fontmode, text):
+    return font.getlength(text, mode=fontmode)
+
+
 def wrap_text(draw, text, font, max_width):
     """Divide el texto en múltiples líneas sin que exceda el ancho máximo."""
-    words = text.split()
+    return list(_partir_lineas(font, draw.fontmode, text, max_width))
+
+
+@functools.lru_cache(maxsize=4096)
+def _partir_lineas(font, fontmode, text, max_width):
+    # Misma regla que antes (agregar palabras mientras la línea quepa), pero el
+    # ancho de la línea candidata se obtiene sumando anchos de palabra
+    # memoizados en vez de volver a medir el prefijo completo en cada paso.
+    # Las descripciones repetidas ("SILLA FIJA DE METAL") salen directo de la caché.
+    espacio = _ancho(font, fontmode, " ")
     lines = []
-    current = ""
+    current = []
+    current_w = 0.0
 
-    for word in words:
-        test_line = f"{current} {word}".strip()
-        width = draw.textlength(test_line, font=font)
+    for word in text.split():
+        word_w = _ancho(font, fontmode, word)
+        width = current_w + espacio + word_w if current else word_w
         if width <= max_width:
-            current = test_line
+            current.append(word)
+            current_w = width
         else:
             if current:
-                lines.append(current)
-            current = word
+                lines.append(" ".join(current))
+            current = [word]
+            current_w = word_w
     if current:
-        lines.append(current)
+        lines.append(" ".join(current))
 
-    return lines
+    return tuple(lines)
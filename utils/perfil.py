@@ -0,0 +1,173 @@
+"""
+Instrumentación ligera del pipeline de etiquetas.
+
+Cada etapa costosa (PNG de python-barcode, redimensionados
+LANCZOS, carga de fuentes, codificación PNG, drawImage de ReportLab, ...) se
+envuelve en `etapa("nombre")`. Mientras el perfil está apagado `etapa` retorna
+un contexto vacío, así el costo en producción es despreciable.
+
+Se activa con:
+- la variable de entorno INVENTARIO_PERFIL=1 (o `activar()` / flag --perfil)
+- INVENTARIO_PERFIL_CPROFILE=ruta.prof para volcar además un perfil cProfile
+- INVENTARIO_PERFIL_MEMORIA=1 para mostrar las líneas que más memoria asignan (tracemalloc)
+
+Al terminar cada trabajo envuelto en `trabajo("nombre")` se imprime el
+reporte agregado por etapa (cantidad, total, p50, p95). Cada trabajo lleva sus
+propios contadores (por hilo), así dos trabajos simultáneos (p.ej. en el
+servicio) no mezclan ni reinician los tiempos del otro; `resumen()` sin
+argumentos agrega todas las etapas medidas desde el último `reiniciar()`.
+"""
+
+import contextlib
+import os
+import threading
+import time
+
+_activo = os.environ.get("INVENTARIO_PERFIL", "") not in ("", "0")
+_ruta_cprofile = os.environ.get("INVENTARIO_PERFIL_CPROFILE") or None
+_memoria = os.environ.get("INVENTARIO_PERFIL_MEMORIA", "") not in ("", "0")
+
+_tiempos = {}  # etapa -> [segundos], de todos los hilos
+_ultimos = {}  # trabajo -> tiempos de su última ejecución
+_lock = threading.Lock()
+_local = threading.local()  # .trabajos: tiempos de los trabajos abiertos en este hilo
+_herramientas_en_uso = False  # cProfile / tracemalloc son del proceso entero
+_NULO = contextlib.nullcontext()
+
+
+def activar(cprofile=None, memoria=False):
+    """Activa la instrumentación (equivale a INVENTARIO_PERFIL=1)."""
+    global _activo, _ruta_cprofile, _memoria
+    _activo = True
+    _ruta_cprofile = cprofile or _ruta_cprofile
+    _memoria = memoria or _memoria
+
+
+def activo():
+    return _activo
+
+
+@contextlib.contextmanager
+def _medir(nombre):
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        duracion = time.perf_counter() - inicio
+        for propios in getattr(_local, "trabajos", ()):
+            propios.setdefault(nombre, []).append(duracion)
+        with _lock:
+            _tiempos.setdefault(nombre, []).append(duracion)
+
+
+def etapa(nombre):
+    """Context manager que mide una etapa; no hace nada si el perfil está apagado."""
+    return _medir(nombre) if _activo else _NULO
+
+
+def reiniciar():
+    with _lock:
+        _tiempos.clear()
+        _ultimos.clear()
+
+
+def ultimo_trabajo(nombre):
+    """Tiempos por etapa de la última ejecución terminada de `trabajo(nombre)`."""
+    with _lock:
+        return {nombre_etapa: list(valores) for nombre_etapa, valores in _ultimos.get(nombre, {}).items()}
+
+
+def _percentil(ordenados, p):
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+def resumen(tiempos=None):
+    """
+    Retorna {etapa: {cantidad, total, p50, p95}} ordenado por tiempo total,
+    de `tiempos` (p.ej. `ultimo_trabajo(...)`) o del agregado global.
+    """
+    if tiempos is None:
+        with _lock:
+            copia = {nombre: sorted(valores) for nombre, valores in _tiempos.items()}
+    else:
+        copia = {nombre: sorted(valores) for nombre, valores in tiempos.items()}
+    datos = {
+        nombre: {
+            "cantidad": len(valores),
+            "total": sum(valores),
+            "p50": _percentil(valores, 50),
+            "p95": _percentil(valores, 95),
+        }
+        for nombre, valores in copia.items()
+    }
+    return dict(sorted(datos.items(), key=lambda item: item[1]["total"], reverse=True))
+
+
+def imprimir_reporte(titulo="Perfil por etapa", tiempos=None):
+    datos = resumen(tiempos)
+    if not datos:
+        return
+    print(f"⏱️  {titulo}:")
+    print(f"   {'etapa':<26} {'n':>6} {'total':>9} {'p50 ms':>9} {'p95 ms':>9}")
+    for nombre, d in datos.items():
+        print(f"   {nombre:<26} {d['cantidad']:>6} {d['total']:>8.3f}s "
+              f"{d['p50'] * 1000:>9.2f} {d['p95'] * 1000:>9.2f}")
+
+
+@contextlib.contextmanager
+def trabajo(nombre):
+    """
+    Envuelve un trabajo completo (p.ej. un PDF). Si el perfil está activo
+    mide sus etapas en contadores propios, opcionalmente corre cProfile /
+    tracemalloc y al final imprime el reporte del trabajo.
+
+    cProfile y tracemalloc son globales al proceso: si ya los usa otro trabajo
+    en curso, este solo mide sus etapas.
+    """
+    global _herramientas_en_uso
+    if not _activo:
+        yield
+        return
+
+    with _lock:
+        herramientas = bool(_ruta_cprofile or _memoria) and not _herramientas_en_uso
+        if herramientas:
+            _herramientas_en_uso = True
+    perfilador = None
+    memoria = herramientas and _memoria
+    if herramientas and _ruta_cprofile:
+        import cProfile
+        perfilador = cProfile.Profile()
+        perfilador.enable()
+    if memoria:
+        import tracemalloc
+        tracemalloc.start()
+
+    propios = {}
+    if not hasattr(_local, "trabajos"):
+        _local.trabajos = []
+    _local.trabajos.append(propios)
+    try:
+        with _medir(nombre):
+            yield
+    finally:
+        _local.trabajos.pop()
+        with _lock:
+            _ultimos[nombre] = propios
+        if perfilador:
+            perfilador.disable()
+            perfilador.dump_stats(_ruta_cprofile)
+        imprimir_reporte(f"Perfil de '{nombre}'", propios)
+        if perfilador:
+            print(f"📂 Perfil cProfile guardado en '{_ruta_cprofile}'")
+        if memoria:
+            import tracemalloc
+            actual, pico = tracemalloc.get_traced_memory()
+            top = tracemalloc.take_snapshot().statistics("lineno")[:10]
+            tracemalloc.stop()
+            print(f"🧠 Memoria: actual {actual / 1e6:.1f} MB, pico {pico / 1e6:.1f} MB")
+            for stat in top:
+                print(f"   {stat}")
+        if herramientas:
+            with _lock:
+                _herramientas_en_uso = False
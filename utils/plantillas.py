@@ -0,0 +1,150 @@
+"""
+Plantillas de página para los PDF de etiquetas.
+
+La geometría de cada formato (grilla de casillas, márgenes, separación y
+líneas de corte) se calcula una sola vez al definir la plantilla. Las líneas
+de corte se dibujan en un Form XObject de ReportLab que cada página solo
+referencia, así el bucle de `generate_barcodes_pdf` únicamente toma la
+siguiente casilla y dibuja la etiqueta.
+
+Para agregar otro formato de hoja basta con sumar una entrada a LAYOUTS.
+
+La disposición de cada sticker también es un dato (PLANTILLA_ETIQUETA): mover
+un texto o cambiar un tamaño de fuente no requiere tocar el renderizador.
+"""
+
+import copy
+import json
+import os
+
+from reportlab.lib.pagesizes import A4, landscape, portrait
+
+CM = 28.35  # puntos por centímetro
+
+
+class PlantillaPagina:
+    """Geometría precalculada de una hoja de etiquetas."""
+
+    def __init__(self, nombre, pagesize, cols, rows, margen_x=CM * 0.5, margen_y=CM * 0.5,
+                 gap_x=6, gap_y=6, lineas_corte=True):
+        self.nombre = nombre
+        self.pagesize = pagesize
+        self.cols = cols
+        self.rows = rows
+        self.por_pagina = cols * rows
+        self.lineas_corte = lineas_corte
+
+        page_width, page_height = pagesize
+
+        # Ajustar tamaño de cada etiqueta al área imprimible considerando los gaps
+        usable_w = page_width - (margen_x * 2)
+        usable_h = page_height - (margen_y * 2)
+        self.label_width = (usable_w - (gap_x * (cols - 1))) / cols
+        self.label_height = (usable_h - (gap_y * (rows - 1))) / rows
+
+        # Casillas (x, y) de izquierda a derecha y de arriba hacia abajo
+        self.casillas = [
+            (margen_x + col * (self.label_width + gap_x),
+             page_height - margen_y - self.label_height - row * (self.label_height + gap_y))
+            for row in range(rows) for col in range(cols)
+        ]
+
+        # Líneas de corte: bordes de la grilla + una línea en medio de cada gap
+        left, right = margen_x, page_width - margen_x
+        bottom, top = margen_y, page_height - margen_y
+        self.lineas = [
+            (left, top, right, top),
+            (left, bottom, right, bottom),
+            (left, bottom, left, top),
+            (right, bottom, right, top),
+        ]
+        for row in range(1, rows):
+            line_y = top - (row * (self.label_height + gap_y)) + gap_y / 2
+            self.lineas.append((left, line_y, right, line_y))
+        for col in range(1, cols):
+            line_x = left + (col * (self.label_width + gap_x)) - gap_x / 2
+            self.lineas.append((line_x, bottom, line_x, top))
+
+        self._form = f"lineas_corte_{nombre}"
+
+    def registrar(self, pdf):
+        """Define el Form XObject con las líneas de corte en este PDF (una vez)."""
+        if not self.lineas_corte or pdf.hasForm(self._form):
+            return
+        pdf.beginForm(self._form)
+        pdf.setStrokeGray(0.6)
+        pdf.setLineWidth(0.8)
+        pdf.setDash(3, 2)
+        pdf.lines(self.lineas)
+        pdf.endForm()
+
+    def iniciar_pagina(self, pdf):
+        """Coloca las líneas de corte en la página actual."""
+        if self.lineas_corte:
+            pdf.doForm(self._form)
+
+
+LAYOUTS = {
+    # Hoja actual: A4 horizontal, 5 x 7 etiquetas, márgenes de 0.5 cm y gaps de ~2 mm
+    "A4_HORIZONTAL_5x7": PlantillaPagina("A4_HORIZONTAL_5x7", landscape(A4), 5, 7),
+    "A4_VERTICAL_3x9": PlantillaPagina("A4_VERTICAL_3x9", portrait(A4), 3, 9),
+    # Rollo continuo de la etiquetadora: una etiqueta de 5.94 x 3 cm por página
+    "ROLLO_59x30": PlantillaPagina("ROLLO_59x30", (5.94 * CM, 3 * CM), 1, 1,
+                                   margen_x=0, margen_y=0, gap_x=0, gap_y=0, lineas_corte=False),
+}
+LAYOUT_PREDETERMINADO = "A4_HORIZONTAL_5x7"
+
+
+def obtener_plantilla(layout=None):
+    """Retorna la plantilla por nombre (o la misma si ya es una PlantillaPagina)."""
+    if isinstance(layout, PlantillaPagina):
+        return layout
+    nombre = layout or LAYOUT_PREDETERMINADO
+    if nombre not in LAYOUTS:
+        raise ValueError(f"Layout desconocido: {nombre}. Opciones: {', '.join(LAYOUTS)}")
+    return LAYOUTS[nombre]
+
+
+# ----------------- PLANTILLA DEL STICKER -----------------
+# Medidas en píxeles sobre el lienzo de 5.94 x 3 cm a 600 DPI. Las fuentes se
+# indican con tamaño y negrita; los interlineados son factores del tamaño.
+# `generate_barcode` compila la plantilla: las capas fijas (clave de oficina,
+# título, línea de área, logo y tipo de registro) se dibujan una vez por
+# combinación y cada etiqueta solo agrega denominación, código de barras y número.
+PLANTILLA_ETIQUETA = {
+    "margen_izquierdo": 25,
+    # Clave de 4 letras en un recuadro (esquina superior derecha)
+    "clave": {"tamano": 48, "negrita": True, "y": 8, "padding": 8, "padding_y": 4,
+              "grosor": 3, "separacion_texto": 15},
+    # Denominación del bien: se trunca a max_caracteres (con "...") y ocupa hasta max_lineas
+    "denominacion": {"tamano": 42, "negrita": True, "y": 10, "max_lineas": 2,
+                     "max_caracteres": 40, "interlineado": 1.1},
+    # Título del inventario (en mayúsculas) y línea para escribir el área a mano
+    "titulo": {"tamano": 34, "negrita": False, "interlineado": 1.15},
+    "area": {"texto": "ÁREA / OFICINA: __________________________________",
+             "tamano": 38, "negrita": False, "interlineado": 1.2},
+    # Espacio reservado bajo el código de barras: número (35px) + logo/tipo de registro (50px)
+    "barcode": {"espacio_inferior": 85, "separacion": 5},
+    "codigo": {"tamano": 38, "negrita": True},
+    # Logo en negro puro (umbral) en la esquina inferior izquierda
+    "logo": {"ratio_ancho": 0.15, "ratio_alto": 0.22, "umbral": 180, "x": 10, "margen_inferior": 10},
+    "tipo_registro": {"tamano": 40, "negrita": True, "margen_derecho": 20, "margen_inferior": 15},
+}
+
+
+def cargar_plantilla_etiqueta(ruta=None):
+    """
+    Retorna la plantilla del sticker. Si se indica un JSON (o la variable de
+    entorno INVENTARIO_PLANTILLA_ETIQUETA) sus valores reemplazan a los de
+    PLANTILLA_ETIQUETA sección por sección.
+    """
+    plantilla = copy.deepcopy(PLANTILLA_ETIQUETA)
+    ruta = ruta or os.environ.get("INVENTARIO_PLANTILLA_ETIQUETA")
+    if ruta:
+        with open(ruta, encoding="utf-8") as f:
+            for seccion, valores in json.load(f).items():
+                if isinstance(valores, dict):
+                    plantilla.setdefault(seccion, {}).update(valores)
+                else:
+                    plantilla[seccion] = valores
+    return plantilla
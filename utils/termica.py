@@ -0,0 +1,400 @@
+"""
+Salida directa para impresoras térmicas de etiquetas (ZPL de Zebra y EPL2).
+
+En lugar de rasterizar cada sticker a 600 DPI y armar un PDF, describe la
+misma etiqueta de PLANTILLA_ETIQUETA con comandos nativos de la impresora:
+Code128 con ^BC (ZPL) o B (EPL), textos con las fuentes residentes, el
+recuadro de la clave de oficina y el logo. El logo se convierte una sola vez
+y se descarga a la memoria de la impresora al inicio del flujo (~DG en ZPL,
+GM en EPL); cada etiqueta solo lo recupera, así ocupa unos cientos de bytes.
+
+Los textos y la partición de la denominación salen de la misma plantilla
+compilada que usa `generate_barcode`, escalados de 600 DPI al DPI de la
+impresora (203 por defecto).
+
+Destinos: un archivo (.zpl / .epl) o una impresora en red (tcp://host:9100).
+`ImpresoraSimulada` escucha en localhost y guarda lo recibido, para probar
+el envío por red sin una impresora.
+"""
+
+import functools
+import socket
+import threading
+from io import BytesIO
+
+from barcode import Code128
+from barcode.charsets import code128
+from PIL import Image, ImageOps
+
+from utils.barcode_generator import (DPI, MIN_BARCODE_HEIGHT_PX, TARGET_HEIGHT, TARGET_WIDTH,
+                                     TITULO_INVENTARIO, _obtener_plantilla_etiqueta,
+                                     _preparar_logo, get_office_key, preparar_items)
+
+FORMATOS = ("zpl", "epl")
+DPI_TERMICA = 203
+PUERTO_IMPRESORA = 9100
+GAP_EPL = 24  # separación entre etiquetas del rollo, en puntos (~3 mm a 203 DPI)
+
+# Fuentes residentes de EPL2 a 203 DPI: número -> (ancho de celda, alto) en puntos
+FUENTES_EPL = {1: (10, 12), 2: (12, 16), 3: (14, 20), 4: (16, 24), 5: (36, 48)}
+
+
+class EtiquetaTermica:
+    """Escala la plantilla del sticker al DPI de la impresora."""
+
+    def __init__(self, dpi=DPI_TERMICA, logo_path="utils/logo.png", title=TITULO_INVENTARIO):
+        self.dpi = dpi
+        self.factor = dpi / DPI
+        self.plantilla = _obtener_plantilla_etiqueta()
+        self.spec = self.plantilla.spec
+        self.ancho = self.p(TARGET_WIDTH)
+        self.alto = self.p(TARGET_HEIGHT)
+        self.logo = _logo_termico(logo_path, dpi) if logo_path else None
+        self.title = title
+
+    def p(self, valor):
+        """Convierte píxeles de la plantilla (600 DPI) a puntos de la impresora."""
+        return max(0, int(round(valor * self.factor)))
+
+    def alto_fuente(self, seccion):
+        return self.p(self.spec[seccion]["tamano"])
+
+    def disposicion(self, item):
+        """
+        Posiciones de la etiqueta en puntos de impresora: la clave con su
+        recuadro, las líneas de denominación, título, área, código de barras,
+        número y tipo de registro.
+        """
+        spec = self.spec
+        office_key, _, rect, _ = self.plantilla.clave(item["oficina"])
+        lineas = self.plantilla.lineas_denominacion(item["detalle_bien"], item["oficina"])
+        textos, y_barcode = self.plantilla.textos_fijos(self.title, len(lineas))
+
+        interlineado = int(spec["denominacion"]["tamano"] * spec["denominacion"]["interlineado"])
+        denominacion = [(spec["denominacion"]["y"] + i * interlineado, linea) for i, linea in enumerate(lineas)]
+
+        # Misma altura que el código de barras rasterizado: lo que queda sobre el número y el logo
+        alto_barcode = min(MIN_BARCODE_HEIGHT_PX, TARGET_HEIGHT - y_barcode - spec["barcode"]["espacio_inferior"])
+        s = spec["tipo_registro"]
+        return {
+            "clave": (office_key, [self.p(v) for v in rect]),
+            "denominacion": [(self.p(y), linea) for y, linea in denominacion],
+            "textos": [(seccion, texto, self.p(y)) for seccion, texto, y in textos],
+            "barcode": (self.p(y_barcode), self.p(alto_barcode)),
+            "codigo": self.p(y_barcode + alto_barcode + spec["barcode"]["separacion"]),
+            "tipo_registro": self.alto - self.alto_fuente("tipo_registro") - self.p(s["margen_inferior"]),
+        }
+
+    def modulo_barcode(self, codigo):
+        """
+        Ancho del módulo (^BY / B) para que el Code128 ocupe a lo más el 80% de
+        la etiqueta. Se cuenta con la codificación de python-barcode, la misma
+        que se envía en ZPL (ver _datos_code128_zpl).
+        """
+        modulos = len(Code128(codigo).build()[0])
+        return max(1, int(self.ancho * 0.80) // modulos), modulos
+
+    def posicion_logo(self):
+        logo = self.logo
+        s = self.spec["logo"]
+        return self.p(s["x"]), self.alto - logo.height - self.p(s["margen_inferior"])
+
+
+@functools.lru_cache(maxsize=8)
+def _logo_termico(logo_path, dpi):
+    """Logo en 1 bit al tamaño de la impresora (negro = punto impreso); None si no existe."""
+    logo = _preparar_logo(logo_path, _obtener_plantilla_etiqueta().spec["logo"])
+    if logo is None:
+        return None
+    factor = dpi / DPI
+    logo = logo.resize((max(1, int(logo.width * factor)), max(1, int(logo.height * factor))),
+                       Image.Resampling.LANCZOS)
+    return logo.convert("1", dither=Image.Dither.NONE)
+
+
+# ----------------- ZPL -----------------
+
+def _campo_zpl(texto):
+    """
+    ^FD con el texto. Si trae prefijos de comando (^ ~) se usa ^FH y se
+    escapan en hexadecimal junto con el indicador (_); si no, va tal cual.
+    """
+    if "^" not in texto and "~" not in texto:
+        return f"^FD{texto}"
+    return "^FH^FD" + texto.replace("_", "_5F").replace("^", "_5E").replace("~", "_7E")
+
+
+# Code 128: valores de cambio de subconjunto según el subconjunto actual
+_CAMBIOS_CODE128 = {"A": {99: "C", 100: "B"}, "B": {99: "C", 101: "A"}, "C": {100: "B", 101: "A"}}
+# Invocaciones de ^BC (modo N): inicio y cambio a cada subconjunto
+_INICIO_ZPL = {103: ("A", ">9"), 104: ("B", ">:"), 105: ("C", ">;")}
+_CAMBIO_ZPL = {"A": ">7", "B": ">6", "C": ">5"}
+
+
+@functools.lru_cache(maxsize=4096)
+def _datos_code128_zpl(codigo):
+    """
+    Datos de ^BC con los mismos subconjuntos que elige python-barcode: la
+    impresora, sin indicaciones, codifica todo en el subconjunto B y un
+    código numérico sale casi el doble de ancho de lo calculado.
+    """
+    valores = Code128(codigo).encoded
+    subconjunto, datos = _INICIO_ZPL[valores[0]]
+    partes = [datos]
+    caracteres = {"A": {v: c for c, v in code128.A.items()}, "B": {v: c for c, v in code128.B.items()}}
+    for valor in valores[1:]:
+        nuevo = _CAMBIOS_CODE128[subconjunto].get(valor)
+        if nuevo:
+            subconjunto = nuevo
+            partes.append(_CAMBIO_ZPL[nuevo])
+        elif subconjunto == "C":
+            partes.append(f"{valor:02d}")
+        else:
+            # En ^BC el ">" inicia códigos de control: se escribe "><"
+            partes.append(caracteres[subconjunto][valor].replace(">", "><"))
+    return "".join(partes)
+
+
+def _logo_zpl(logo):
+    # ~DG: bits en 1 = punto negro; PIL usa 1 = blanco, por eso se invierte
+    datos = ImageOps.invert(logo.convert("L")).convert("1").tobytes()
+    por_fila = (logo.width + 7) // 8
+    return f"~DGR:LOGO.GRF,{len(datos)},{por_fila},{datos.hex().upper()}\n"
+
+
+def _texto_zpl(x, y, alto, texto, ancho_bloque=None, alineacion="L"):
+    bloque = f"^FB{ancho_bloque},1,0,{alineacion}" if ancho_bloque else ""
+    return f"^FO{x},{y}^A0N,{alto}{bloque}{_campo_zpl(texto)}^FS"
+
+
+def etiqueta_zpl(etiqueta, item):
+    """Comandos ZPL de una etiqueta de bien."""
+    d = etiqueta.disposicion(item)
+    p = etiqueta.p
+    margen = p(etiqueta.spec["margen_izquierdo"])
+    office_key, (x1, y1, x2, y2) = d["clave"]
+    partes = [f"^XA^PW{etiqueta.ancho}^LL{etiqueta.alto}^CI28",
+              f"^FO{x1},{y1}^GB{x2 - x1},{y2 - y1},{max(1, p(etiqueta.spec['clave']['grosor']))}^FS",
+              _texto_zpl(x1, p(etiqueta.spec["clave"]["y"]), etiqueta.alto_fuente("clave"), office_key,
+                         x2 - x1, "C")]
+    for y, linea in d["denominacion"]:
+        partes.append(_texto_zpl(margen, y, etiqueta.alto_fuente("denominacion"), linea))
+    for seccion, texto, y in d["textos"]:
+        if texto:
+            partes.append(_texto_zpl(margen, y, etiqueta.alto_fuente(seccion), texto))
+
+    codigo = str(item["codigo"])
+    y_barcode, alto_barcode = d["barcode"]
+    modulo, modulos = etiqueta.modulo_barcode(codigo)
+    x_barcode = max(0, (etiqueta.ancho - modulo * modulos) // 2)
+    partes.append(f"^FO{x_barcode},{y_barcode}^BY{modulo}^BCN,{alto_barcode},N,N,N"
+                  f"{_campo_zpl(_datos_code128_zpl(codigo))}^FS")
+    partes.append(_texto_zpl(0, d["codigo"], etiqueta.alto_fuente("codigo"), codigo, etiqueta.ancho, "C"))
+
+    if etiqueta.logo:
+        x, y = etiqueta.posicion_logo()
+        partes.append(f"^FO{x},{y}^XGR:LOGO.GRF,1,1^FS")
+    if item["tipo_registro"]:
+        ancho = etiqueta.ancho - p(etiqueta.spec["tipo_registro"]["margen_derecho"])
+        partes.append(_texto_zpl(0, d["tipo_registro"], etiqueta.alto_fuente("tipo_registro"),
+                                 item["tipo_registro"], ancho, "R"))
+    partes.append(f"^PQ{item['copias']}^XZ")
+    return "".join(partes) + "\n"
+
+
+def separador_zpl(etiqueta, item):
+    """Separador de oficina, con las proporciones de _generate_separator_image."""
+    p = etiqueta.p
+    margen = p(6)
+    y_clave = p(TARGET_HEIGHT * 0.15)
+    y_linea = y_clave + p(100 + 20)
+    area = f"ÁREA: {item['office']}"
+    return "".join([
+        f"^XA^PW{etiqueta.ancho}^LL{etiqueta.alto}^CI28",
+        f"^FO{margen},{margen}^GB{etiqueta.ancho - 2 * margen},{etiqueta.alto - 2 * margen},{p(20)}^FS",
+        _texto_zpl(0, y_clave, p(100), get_office_key(item["office"]), etiqueta.ancho, "C"),
+        f"^FO{margen + p(50)},{y_linea}^GB{etiqueta.ancho - 2 * (margen + p(50))},0,{max(1, p(3))}^FS",
+        f"^FO{p(TARGET_WIDTH * 0.1)},{y_linea + p(20)}^A0N,{p(70)}"
+        f"^FB{p(TARGET_WIDTH * 0.8)},3,0,C{_campo_zpl(area)}^FS",
+        "^PQ1^XZ\n",
+    ])
+
+
+# ----------------- EPL2 -----------------
+
+def _fuente_epl(alto):
+    """Fuente residente y multiplicador cuyo alto se acerca más a `alto` sin pasarse."""
+    mejor = (1, 1, FUENTES_EPL[1][1])
+    for fuente, (_, alto_fuente) in FUENTES_EPL.items():
+        multiplicador = max(1, min(6, alto // alto_fuente))
+        if mejor[2] < alto_fuente * multiplicador <= max(alto, FUENTES_EPL[1][1]):
+            mejor = (fuente, multiplicador, alto_fuente * multiplicador)
+    return mejor[:2]
+
+
+def _texto_epl(x, y, alto, texto, ancho_bloque=None, alineacion="L"):
+    """Comando A; las fuentes de EPL son de ancho fijo, así se puede centrar o alinear a la derecha."""
+    fuente, multiplicador = _fuente_epl(alto)
+    if ancho_bloque:
+        ancho = FUENTES_EPL[fuente][0] * multiplicador * len(texto)
+        libre = max(0, ancho_bloque - ancho)
+        x += libre // 2 if alineacion == "C" else libre if alineacion == "R" else 0
+    texto = texto.replace("\\", "\\\\").replace('"', '\\"')
+    return f'A{x},{y},0,{fuente},{multiplicador},{multiplicador},N,"{texto}"\n'
+
+
+def _logo_epl(logo):
+    # GM guarda un PCX en la memoria de la impresora; GK borra una versión anterior
+    buffer = BytesIO()
+    logo.save(buffer, format="PCX")
+    datos = buffer.getvalue()
+    return b'GK"LOGO"\nGK"LOGO"\nGM"LOGO"' + str(len(datos)).encode() + b"\n" + datos + b"\n"
+
+
+def _inicio_epl(etiqueta):
+    return f"\nN\nI8,A,001\nq{etiqueta.ancho}\nQ{etiqueta.alto},{GAP_EPL}\n"
+
+
+def etiqueta_epl(etiqueta, item):
+    """Comandos EPL2 de una etiqueta de bien."""
+    d = etiqueta.disposicion(item)
+    p = etiqueta.p
+    margen = p(etiqueta.spec["margen_izquierdo"])
+    office_key, (x1, y1, x2, y2) = d["clave"]
+    partes = [_inicio_epl(etiqueta),
+              f"X{x1},{y1},{max(1, p(etiqueta.spec['clave']['grosor']))},{x2},{y2}\n",
+              _texto_epl(x1, p(etiqueta.spec["clave"]["y"]), etiqueta.alto_fuente("clave"), office_key,
+                         x2 - x1, "C")]
+    for y, linea in d["denominacion"]:
+        partes.append(_texto_epl(margen, y, etiqueta.alto_fuente("denominacion"), linea))
+    for seccion, texto, y in d["textos"]:
+        if texto:
+            partes.append(_texto_epl(margen, y, etiqueta.alto_fuente(seccion), texto))
+
+    codigo = str(item["codigo"])
+    y_barcode, alto_barcode = d["barcode"]
+    modulo, modulos = etiqueta.modulo_barcode(codigo)
+    x_barcode = max(0, (etiqueta.ancho - modulo * modulos) // 2)
+    codigo_epl = codigo.replace("\\", "\\\\").replace('"', '\\"')
+    partes.append(f'B{x_barcode},{y_barcode},0,1,{modulo},{modulo},{alto_barcode},N,"{codigo_epl}"\n')
+    partes.append(_texto_epl(0, d["codigo"], etiqueta.alto_fuente("codigo"), codigo, etiqueta.ancho, "C"))
+
+    if etiqueta.logo:
+        x, y = etiqueta.posicion_logo()
+        partes.append(f'GG{x},{y},"LOGO"\n')
+    if item["tipo_registro"]:
+        ancho = etiqueta.ancho - p(etiqueta.spec["tipo_registro"]["margen_derecho"])
+        partes.append(_texto_epl(0, d["tipo_registro"], etiqueta.alto_fuente("tipo_registro"),
+                                 item["tipo_registro"], ancho, "R"))
+    partes.append(f"P{item['copias']}\n")
+    return "".join(partes)
+
+
+def separador_epl(etiqueta, item):
+    """Separador de oficina, con las proporciones de _generate_separator_image."""
+    p = etiqueta.p
+    margen = p(6)
+    y_clave = p(TARGET_HEIGHT * 0.15)
+    y_linea = y_clave + p(100 + 20)
+    return "".join([
+        _inicio_epl(etiqueta),
+        f"X{margen},{margen},{p(20)},{etiqueta.ancho - margen},{etiqueta.alto - margen}\n",
+        _texto_epl(0, y_clave, p(100), get_office_key(item["office"]), etiqueta.ancho, "C"),
+        f"LO{margen + p(50)},{y_linea},{etiqueta.ancho - 2 * (margen + p(50))},{max(1, p(3))}\n",
+        _texto_epl(0, y_linea + p(20), p(70), f"ÁREA: {item['office']}", etiqueta.ancho, "C"),
+        "P1\n",
+    ])
+
+
+# ----------------- FLUJO COMPLETO Y DESTINOS -----------------
+
+def generar_comandos(records, formato="zpl", dpi=DPI_TERMICA, copias=1, logo_path="utils/logo.png",
+                     progress_callback=None) -> bytes:
+    """
+    Retorna el flujo de comandos listo para la impresora: el logo se descarga
+    una vez al inicio y luego va un separador por oficina y una etiqueta por
+    bien (las copias las repite la impresora con ^PQ / P).
+    """
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato desconocido: {formato}. Opciones: {', '.join(FORMATOS)}")
+
+    etiqueta = EtiquetaTermica(dpi=dpi, logo_path=logo_path)
+    items = preparar_items(records, copias=copias)
+    if formato == "zpl":
+        salida = [(_logo_zpl(etiqueta.logo) if etiqueta.logo else "").encode("utf-8")]
+        codificacion, separador, bien = "utf-8", separador_zpl, etiqueta_zpl
+    else:
+        salida = [_logo_epl(etiqueta.logo) if etiqueta.logo else b""]
+        codificacion, separador, bien = "cp1252", separador_epl, etiqueta_epl
+
+    for i, item in enumerate(items, 1):
+        comandos = separador(etiqueta, item) if item["type"] == "separator" else bien(etiqueta, item)
+        salida.append(comandos.encode(codificacion, errors="replace"))
+        if progress_callback:
+            progress_callback(i, len(items))
+    return b"".join(salida)
+
+
+def enviar(datos: bytes, destino: str, timeout=10) -> int:
+    """
+    Envía el flujo a `destino`: "tcp://host[:puerto]" para una impresora en red
+    (puerto 9100 por defecto) o la ruta de un archivo. Retorna los bytes escritos.
+    """
+    if destino.startswith("tcp://"):
+        host, _, puerto = destino[len("tcp://"):].partition(":")
+        with socket.create_connection((host, int(puerto or PUERTO_IMPRESORA)), timeout=timeout) as conexion:
+            conexion.sendall(datos)
+        return len(datos)
+
+    with open(destino, "wb") as f:
+        f.write(datos)
+    return len(datos)
+
+
+class ImpresoraSimulada:
+    """
+    Servidor TCP en localhost que acepta conexiones como una impresora en el
+    puerto 9100 y acumula los bytes recibidos.
+
+        with ImpresoraSimulada() as impresora:
+            enviar(datos, impresora.destino)
+            assert impresora.recibido(len(datos)) == datos
+    """
+
+    def __init__(self, host="127.0.0.1"):
+        self._servidor = socket.create_server((host, 0))
+        self.destino = f"tcp://{host}:{self._servidor.getsockname()[1]}"
+        self._datos = bytearray()
+        self._condicion = threading.Condition()
+        self._hilo = threading.Thread(target=self._escuchar, daemon=True, name="impresora-simulada")
+        self._hilo.start()
+
+    def _escuchar(self):
+        while True:
+            try:
+                conexion, _ = self._servidor.accept()
+            except OSError:
+                return  # servidor cerrado
+            with conexion:
+                while True:
+                    bloque = conexion.recv(65536)
+                    if not bloque:
+                        break
+                    with self._condicion:
+                        self._datos += bloque
+                        self._condicion.notify_all()
+
+    def recibido(self, esperados=0, timeout=5):
+        """Bytes recibidos hasta ahora, esperando a que lleguen al menos `esperados`."""
+        with self._condicion:
+            self._condicion.wait_for(lambda: len(self._datos) >= esperados, timeout)
+            return bytes(self._datos)
+
+    def cerrar(self):
+        self._servidor.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
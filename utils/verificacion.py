@@ -0,0 +1,314 @@
+"""
+Verificación por lectura de los códigos de barras impresos.
+
+Decodifica cada sticker de un PDF ya generado con un lector Code128 de
+líneas de barrido (numpy, sin dependencias externas) y compara el valor leído
+con el código esperado. Además mide lo que suele arruinar la lectura en campo:
+- ancho del módulo (px y mm a 600 DPI)
+- zonas silenciosas izquierda y derecha, en módulos (mínimo 10)
+- desviación máxima de los anchos de barra respecto del ideal, en módulos
+- fracción de líneas de barrido que leen el código (robustez)
+
+Solo entiende los PDF de `generate_barcodes_pdf` (XObjects en DeviceGray con
+FlateDecode, 1 u 8 bits). Cada imagen distinta se decodifica una vez, en
+paralelo, aunque esté colocada varias veces (copias, separadores).
+"""
+
+import base64
+import re
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from barcode.charsets.code128 import CODES
+
+from utils.barcode_generator import DPI, preparar_items
+
+ZONA_SILENCIOSA_MIN = 10  # módulos a cada lado (ISO/IEC 15417)
+LINEAS_BARRIDO = 40
+ERROR_MAX = 0.5  # error máximo por elemento, en módulos, para aceptar un símbolo
+
+
+def _anchos(bits):
+    """'11011001100' -> [2, 1, 2, 2, 1, 2] (barra, espacio, barra, ...)."""
+    return [len(m.group()) for m in re.finditer(r"1+|0+", bits)]
+
+
+_PATRONES = np.array([_anchos(bits) for bits in CODES], dtype=float)  # 106 x 6
+_STOP = np.array([2, 3, 3, 1, 1, 1, 2], dtype=float)
+_START_A, _START_B, _START_C = 103, 104, 105
+
+
+# ----------------- LECTOR CODE128 -----------------
+
+def _corridas(fila):
+    """Longitudes y colores (True = negro) de las corridas de una fila de píxeles."""
+    cambios = np.flatnonzero(np.diff(fila.view(np.int8))) + 1
+    bordes = np.concatenate(([0], cambios, [fila.size]))
+    return np.diff(bordes), fila[bordes[:-1]]
+
+
+def _simbolo(anchos):
+    """(valor, error en módulos) del patrón de 6 elementos más parecido."""
+    normal = anchos * 11 / anchos.sum()
+    errores = np.abs(_PATRONES - normal).max(axis=1)
+    valor = int(errores.argmin())
+    return valor, float(errores[valor])
+
+
+def _texto(valores):
+    """Traduce los valores de datos a texto siguiendo los cambios de juego A/B/C."""
+    juego = {_START_A: "A", _START_B: "B", _START_C: "C"}[valores[0]]
+    texto = []
+    shift = False
+    for valor in valores[1:]:
+        actual = ("B" if juego == "A" else "A") if shift else juego
+        shift = False
+        if actual == "C":
+            if valor < 100:
+                texto.append(f"{valor:02d}")
+            elif valor in (100, 101):
+                juego = "B" if valor == 100 else "A"
+            continue
+        if valor < 64 or (actual == "B" and valor < 96):
+            texto.append(chr(valor + 32))
+        elif actual == "A" and valor < 96:
+            texto.append(chr(valor - 64))
+        elif valor == 98:
+            shift = True
+        elif valor == 99:
+            juego = "C"
+        elif (actual, valor) in (("A", 100), ("B", 101)):
+            juego = "B" if actual == "A" else "A"
+        # 96, 97, 102 (FNC1-3) y FNC4 no se usan en las etiquetas: se ignoran
+    return "".join(texto)
+
+
+def leer_fila(fila):
+    """
+    Decodifica una fila booleana (True = negro). Retorna dict con el valor y
+    las métricas de esa línea, o None si no contiene un Code128 válido.
+    """
+    largos, colores = _corridas(fila)
+    largos = largos.astype(float)
+    n = largos.size
+    for i in np.flatnonzero(colores):
+        if i + 6 + 7 > n:
+            break
+        # El inicio debe estar precedido por espacio blanco (al menos unos módulos)
+        inicio, error = _simbolo(largos[i:i + 6])
+        if inicio not in (_START_A, _START_B, _START_C) or error > ERROR_MAX:
+            continue
+        modulo = largos[i:i + 6].sum() / 11
+        if i > 0 and largos[i - 1] < 5 * modulo:
+            continue
+
+        valores, errores, j = [inicio], [error], i + 6
+        while j + 7 <= n:
+            tramo = largos[j:j + 7]
+            if np.abs(tramo * 13 / tramo.sum() - _STOP).max() <= ERROR_MAX:
+                break
+            valor, error = _simbolo(largos[j:j + 6])
+            if error > ERROR_MAX or valor >= _START_A:
+                valores = None
+                break
+            valores.append(valor)
+            errores.append(error)
+            j += 6
+        else:
+            valores = None
+        if not valores or len(valores) < 2:
+            continue
+
+        # Dígito verificador: (inicio + suma de posición * valor) módulo 103
+        *datos, verificador = valores
+        if (datos[0] + sum(k * v for k, v in enumerate(datos[1:], 1))) % 103 != verificador:
+            continue
+
+        ancho_total = largos[i:j + 7].sum()
+        modulos = 11 * len(valores) + 13
+        modulo = ancho_total / modulos
+        return {
+            "valor": _texto(datos),
+            "modulo_px": modulo,
+            "zona_izq": (largos[i - 1] if i > 0 else 0) / modulo,
+            "zona_der": (largos[j + 7] if j + 7 < n else 0) / modulo,
+            "desviacion": max(errores),
+        }
+    return None
+
+
+def leer_imagen(pixeles):
+    """
+    Barre LINEAS_BARRIDO filas de la imagen (array booleano, True = negro) y
+    retorna el valor más leído con la mediana de sus métricas.
+    """
+    alto = pixeles.shape[0]
+    filas = np.linspace(0, alto - 1, LINEAS_BARRIDO).astype(int)
+    lecturas = [r for r in (leer_fila(pixeles[f]) for f in filas) if r]
+    if not lecturas:
+        return {"valor": None, "lineas_ok": 0.0}
+
+    valores = [r["valor"] for r in lecturas]
+    valor = max(set(valores), key=valores.count)
+    buenas = [r for r in lecturas if r["valor"] == valor]
+    resultado = {"valor": valor, "lineas_ok": len(buenas) / len(filas)}
+    for metrica in ("modulo_px", "zona_izq", "zona_der", "desviacion"):
+        resultado[metrica] = float(np.median([r[metrica] for r in buenas]))
+    resultado["modulo_mm"] = resultado["modulo_px"] / DPI * 25.4
+    return resultado
+
+
+# ----------------- IMÁGENES DEL PDF -----------------
+
+def _decodificar(datos, filtros):
+    for filtro in filtros:
+        if filtro == "FlateDecode":
+            datos = zlib.decompress(datos)
+        elif filtro == "ASCII85Decode":
+            datos = base64.a85decode(datos.strip().removesuffix(b"~>").removeprefix(b"<~"))
+        else:
+            raise ValueError(f"Filtro no soportado: {filtro}")
+    return datos
+
+
+def _objetos(contenido):
+    """{número: (diccionario en bytes, stream o None)} de un PDF sin compresión de objetos."""
+    objetos = {}
+    cabecera = re.compile(rb"(\d+) 0 obj\s*")
+    posicion = 0
+    while True:
+        m = cabecera.search(contenido, posicion)
+        if not m:
+            return objetos
+        fin = contenido.find(b"endobj", m.end())
+        inicio_stream = contenido.find(b"stream", m.end(), fin)
+        if inicio_stream == -1:
+            objetos[int(m.group(1))] = (contenido[m.end():fin], None)
+            posicion = fin
+            continue
+        # Los datos binarios se saltan por /Length (podrían contener "endobj")
+        dic = contenido[m.end():inicio_stream]
+        largo = int(re.search(rb"/Length (\d+)", dic).group(1))
+        datos_inicio = inicio_stream + len(b"stream")
+        datos_inicio += 2 if contenido[datos_inicio:datos_inicio + 2] == b"\r\n" else 1
+        objetos[int(m.group(1))] = (dic, contenido[datos_inicio:datos_inicio + largo])
+        posicion = datos_inicio + largo
+
+
+def _filtros(dic):
+    m = re.search(rb"/Filter\s*(\[[^\]]*\]|/\w+)", dic)
+    return re.findall(r"/(\w+)", m.group(1).decode()) if m else []
+
+
+def imagenes_pdf(ruta_pdf):
+    """
+    Retorna (imagenes, colocaciones): imagenes = {número de objeto: (ancho,
+    alto, bits, datos comprimidos, filtros)} y colocaciones = números de objeto
+    en el orden en que aparecen en las páginas.
+    """
+    with open(ruta_pdf, "rb") as f:
+        objetos = _objetos(f.read())
+
+    imagenes = {}
+    for numero, (dic, datos) in objetos.items():
+        if datos is not None and b"/Subtype /Image" in dic:
+            ancho, alto, bits = (int(re.search(rb"/" + clave + rb" (\d+)", dic).group(1))
+                                 for clave in (b"Width", b"Height", b"BitsPerComponent"))
+            imagenes[numero] = (ancho, alto, bits, datos, _filtros(dic))
+
+    # Nombre de recurso -> objeto (p.ej. /FormXob.<huella> 12 0 R)
+    nombres = {nombre.decode(): int(numero)
+               for nombre, numero in re.findall(rb"/([\w.]+) (\d+) 0 R", b" ".join(d for d, _ in objetos.values()))
+               if int(numero) in imagenes}
+
+    # Las páginas se recorren en el orden de /Kids
+    paginas = next(re.search(rb"/Kids \[([^\]]*)\]", dic).group(1) for dic, _ in objetos.values()
+                   if b"/Type /Pages" in dic)
+    colocaciones = []
+    for numero in re.findall(rb"(\d+) 0 R", paginas):
+        dic_pagina = objetos[int(numero)][0]
+        for contenido in re.findall(rb"/Contents (\d+) 0 R", dic_pagina):
+            dic, datos = objetos[int(contenido)]
+            flujo = _decodificar(datos, _filtros(dic)).decode("latin-1")
+            colocaciones.extend(nombres[n] for n in re.findall(r"/([\w.]+) Do", flujo) if n in nombres)
+    return imagenes, colocaciones
+
+
+def _pixeles(imagen):
+    """Array booleano (True = negro) de una imagen extraída del PDF."""
+    ancho, alto, bits, datos, filtros = imagen
+    crudo = np.frombuffer(_decodificar(datos, filtros), dtype=np.uint8)
+    if bits == 1:
+        # DeviceGray de 1 bit: 0 = negro; cada fila ocupa bytes completos
+        return np.unpackbits(crudo.reshape(alto, -1), axis=1)[:, :ancho] == 0
+    return crudo.reshape(alto, ancho) < 128
+
+
+def _leer(imagen):
+    return leer_imagen(_pixeles(imagen))
+
+
+# ----------------- VERIFICACIÓN DE UN TRABAJO -----------------
+
+def esperados(records, copias=1):
+    """Código esperado en cada casilla (None en los separadores), como los coloca el PDF."""
+    secuencia = []
+    for item in preparar_items(records, copias=copias):
+        esperado = None if item["type"] == "separator" else str(item["codigo"])
+        secuencia.extend([esperado] * item["copias"])
+    return secuencia
+
+
+def _estado(lectura, esperado):
+    if esperado is None:
+        return "OK" if lectura["valor"] is None else "SEPARADOR CON CÓDIGO"
+    if lectura["valor"] is None:
+        return "ILEGIBLE"
+    if lectura["valor"] != esperado:
+        return "NO COINCIDE"
+    if min(lectura["zona_izq"], lectura["zona_der"]) < ZONA_SILENCIOSA_MIN:
+        return "ZONA SILENCIOSA"
+    return "OK"
+
+
+def verificar_pdf(ruta_pdf, records=None, copias=1, workers=None):
+    """
+    Lee todas las etiquetas de un PDF terminado. Con `records` (los mismos del
+    trabajo) compara cada casilla con su código; sin ellos solo reporta lo
+    leído. Retorna una lista de dicts por casilla con estado y métricas.
+    """
+    imagenes, colocaciones = imagenes_pdf(ruta_pdf)
+
+    # Cada imagen distinta se lee una sola vez
+    unicas = list(dict.fromkeys(colocaciones))
+    if workers and workers > 1 and len(unicas) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            lecturas = dict(zip(unicas, executor.map(_leer, (imagenes[n] for n in unicas), chunksize=4)))
+    else:
+        lecturas = {n: _leer(imagenes[n]) for n in unicas}
+
+    secuencia = esperados(records, copias) if records is not None else None
+    if secuencia is not None and len(secuencia) != len(colocaciones):
+        raise ValueError(f"El PDF tiene {len(colocaciones)} casillas y se esperaban {len(secuencia)}")
+
+    reporte = []
+    for casilla, numero in enumerate(colocaciones):
+        lectura = lecturas[numero]
+        fila = {"casilla": casilla + 1, "esperado": secuencia[casilla] if secuencia else None, **lectura}
+        if secuencia is not None:
+            fila["estado"] = _estado(lectura, fila["esperado"])
+        elif lectura["valor"] is None:
+            fila["estado"] = "SIN CÓDIGO"
+        else:
+            fila["estado"] = _estado(lectura, lectura["valor"])
+        reporte.append(fila)
+    return reporte
+
+
+def resumen(reporte):
+    """Cantidad de casillas por estado."""
+    estados = {}
+    for fila in reporte:
+        estados[fila["estado"]] = estados.get(fila["estado"], 0) + 1
+    return estados
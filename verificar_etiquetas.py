@@ -0,0 +1,87 @@
+"""
+Verifica por lectura un PDF de etiquetas ya generado.
+
+Decodifica el código de barras de cada casilla (utils/verificacion.py) y,
+si se indican los mismos filtros con que se generó el PDF, lo compara con el
+código esperado. Guarda un reporte Excel con el estado y las métricas de cada
+etiqueta (módulo, zonas silenciosas, desviación, líneas leídas).
+
+Uso:
+    python verificar_etiquetas.py assets/generated_barcodes/codigos_barras_LOTE.pdf
+    python verificar_etiquetas.py codigos_barras_DIRECCIÓN.pdf --oficina "DIRECCIÓN" --copias 2 --workers 4
+
+Termina con código 1 si alguna etiqueta no pasa.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+import db.database as database
+from generar_etiquetas import consultar_registros, leer_codigos
+from utils.verificacion import ZONA_SILENCIOSA_MIN, resumen, verificar_pdf
+
+COLUMNAS_REPORTE = ["casilla", "estado", "esperado", "valor", "modulo_px", "modulo_mm",
+                    "zona_izq", "zona_der", "desviacion", "lineas_ok"]
+
+
+def guardar_reporte(reporte, ruta):
+    os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+    df = pd.DataFrame(reporte).reindex(columns=COLUMNAS_REPORTE)
+    with pd.ExcelWriter(ruta, engine="openpyxl") as writer:
+        df[df["estado"] != "OK"].to_excel(writer, sheet_name="Fallas", index=False)
+        df.to_excel(writer, sheet_name="Todas", index=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Verifica por lectura los códigos de un PDF de etiquetas")
+    parser.add_argument("pdf", help="PDF generado por generate_barcodes_pdf")
+    parser.add_argument("--oficina", action="append", help="mismos filtros que generar_etiquetas.py")
+    parser.add_argument("--tipo", action="append")
+    parser.add_argument("--buscar")
+    parser.add_argument("--codigos")
+    parser.add_argument("--copias", type=int, default=1)
+    parser.add_argument("--sin-esperados", action="store_true",
+                        help="solo leer, sin comparar con la base de datos")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--reporte", help="Excel de salida (por defecto reportes/verificacion_<pdf>.xlsx)")
+    parser.add_argument("--db", help="base de datos a usar (por defecto inventario.db)")
+    args = parser.parse_args(argv)
+    if args.db:
+        database._DB_PATH = args.db
+
+    inicio = time.perf_counter()
+    records = None
+    if not args.sin_esperados:
+        codigos = leer_codigos(args.codigos) if args.codigos else None
+        records = consultar_registros(args.oficina, args.tipo, args.buscar, codigos)
+
+    try:
+        reporte = verificar_pdf(args.pdf, records, copias=args.copias, workers=args.workers)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+
+    ruta = args.reporte or os.path.join(
+        "reportes", f"verificacion_{os.path.splitext(os.path.basename(args.pdf))[0]}.xlsx")
+    guardar_reporte(reporte, ruta)
+
+    estados = resumen(reporte)
+    fallas = sum(n for estado, n in estados.items() if estado not in ("OK", "SIN CÓDIGO"))
+    leidas = [fila for fila in reporte if fila["valor"]]
+    print(f"📊 {len(reporte)} casillas verificadas en {time.perf_counter() - inicio:.2f}s")
+    for estado, cantidad in estados.items():
+        print(f"   {'✅' if estado == 'OK' else '⚠️' if estado == 'SIN CÓDIGO' else '❌'} {estado}: {cantidad}")
+    if leidas:
+        print(f"   Módulo: {min(f['modulo_mm'] for f in leidas):.3f} - {max(f['modulo_mm'] for f in leidas):.3f} mm, "
+              f"zona silenciosa mínima: {min(min(f['zona_izq'], f['zona_der']) for f in leidas):.1f} "
+              f"módulos (mínimo {ZONA_SILENCIOSA_MIN})")
+    print(f"📂 Reporte guardado en '{ruta}'")
+    return 1 if fallas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())